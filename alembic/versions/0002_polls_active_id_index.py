@@ -0,0 +1,27 @@
+"""Add composite index for active poll lookup
+
+Revision ID: 0002_polls_active_id_index
+Revises: 0001_remove_poll_dates
+Create Date: 2026-10-18 00:00:00.000000
+"""
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = "0002_polls_active_id_index"
+down_revision = "0001_remove_poll_dates"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # (is_active, id) serves "WHERE is_active = 1 ORDER BY id DESC LIMIT 1"
+    # straight from the index; it also covers the old is_active-only lookups.
+    op.create_index("idx_polls_active_id", "polls", ["is_active", "id"])
+    op.drop_index("idx_polls_active", table_name="polls")
+
+
+def downgrade() -> None:
+    op.create_index("idx_polls_active", "polls", ["is_active"])
+    op.drop_index("idx_polls_active_id", table_name="polls")
@@ -0,0 +1,51 @@
+"""Add poll_option_counts table
+
+Revision ID: 0003_poll_option_counts
+Revises: 0002_polls_active_id_index
+Create Date: 2026-10-18 00:00:00.000000
+"""
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import mysql
+
+
+# revision identifiers, used by Alembic.
+revision = "0003_poll_option_counts"
+down_revision = "0002_polls_active_id_index"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "poll_option_counts",
+        sa.Column(
+            "option_id",
+            mysql.BIGINT(unsigned=True),
+            sa.ForeignKey("poll_options.id", ondelete="CASCADE"),
+            primary_key=True,
+        ),
+        sa.Column(
+            "poll_id",
+            mysql.BIGINT(unsigned=True),
+            sa.ForeignKey("polls.id", ondelete="CASCADE"),
+            nullable=False,
+        ),
+        sa.Column("vote_count", mysql.BIGINT(), nullable=False, server_default="0"),
+        mysql_engine="InnoDB",
+        mysql_charset="utf8mb4",
+    )
+    op.create_index("idx_poll_option_counts_poll", "poll_option_counts", ["poll_id"])
+
+    # Backfill from existing votes; options without votes start at 0.
+    op.execute(
+        "INSERT INTO poll_option_counts (option_id, poll_id, vote_count) "
+        "SELECT o.id, o.poll_id, COUNT(v.id) "
+        "FROM poll_options o LEFT JOIN votes v ON v.option_id = o.id "
+        "GROUP BY o.id, o.poll_id"
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("poll_option_counts")
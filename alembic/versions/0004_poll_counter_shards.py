@@ -0,0 +1,33 @@
+"""Add per-poll Redis counter shard count
+
+Revision ID: 0004_poll_counter_shards
+Revises: 0003_poll_option_counts
+Create Date: 2026-10-18 00:00:00.000000
+"""
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import mysql
+
+
+# revision identifiers, used by Alembic.
+revision = "0004_poll_counter_shards"
+down_revision = "0003_poll_option_counts"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column(
+        "polls",
+        sa.Column(
+            "counter_shards",
+            mysql.SMALLINT(),
+            server_default=sa.text("1"),
+            nullable=False,
+        ),
+    )
+
+
+def downgrade() -> None:
+    op.drop_column("polls", "counter_shards")
@@ -0,0 +1,85 @@
+"""Partition votes by poll and add vote archive tables
+
+Revision ID: 0005_partition_votes
+Revises: 0004_poll_counter_shards
+Create Date: 2026-10-18 00:00:00.000000
+"""
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import mysql
+
+
+# revision identifiers, used by Alembic.
+revision = "0005_partition_votes"
+down_revision = "0004_poll_counter_shards"
+branch_labels = None
+depends_on = None
+
+VOTE_PARTITIONS = 16
+
+
+def upgrade() -> None:
+    op.create_table(
+        "poll_archives",
+        sa.Column(
+            "poll_id",
+            mysql.BIGINT(unsigned=True),
+            sa.ForeignKey("polls.id", ondelete="CASCADE"),
+            primary_key=True,
+        ),
+        sa.Column("total_votes", mysql.BIGINT(), nullable=False, server_default="0"),
+        sa.Column(
+            "archived_at",
+            mysql.DATETIME(),
+            nullable=False,
+            server_default=sa.text("CURRENT_TIMESTAMP"),
+        ),
+        mysql_engine="InnoDB",
+        mysql_charset="utf8mb4",
+    )
+    op.create_table(
+        "votes_archive",
+        sa.Column("poll_id", mysql.BIGINT(unsigned=True), nullable=False),
+        sa.Column("id", mysql.BIGINT(unsigned=True), nullable=False),
+        sa.Column("option_id", mysql.BIGINT(unsigned=True), nullable=False),
+        sa.Column("voter_token", sa.VARCHAR(length=36), nullable=False),
+        sa.Column("created_at", mysql.DATETIME(), nullable=False),
+        sa.PrimaryKeyConstraint("poll_id", "id"),
+        mysql_engine="InnoDB",
+        mysql_charset="utf8mb4",
+        mysql_row_format="COMPRESSED",
+    )
+
+    # InnoDB cannot partition a table that has foreign keys, and every unique
+    # key (the primary key included) must contain the partitioning column.
+    for foreign_key in sa.inspect(op.get_bind()).get_foreign_keys("votes"):
+        op.drop_constraint(foreign_key["name"], "votes", type_="foreignkey")
+    # uniq_vote_per_poll already starts with poll_id; one (poll_id, option_id)
+    # index replaces the two single-column ones for the per-poll recounts.
+    op.drop_index("idx_votes_poll", table_name="votes")
+    op.drop_index("idx_votes_option", table_name="votes")
+    op.create_index("idx_votes_poll_option", "votes", ["poll_id", "option_id"])
+    op.execute("ALTER TABLE votes DROP PRIMARY KEY, ADD PRIMARY KEY (id, poll_id)")
+    op.execute(f"ALTER TABLE votes PARTITION BY HASH (poll_id) PARTITIONS {VOTE_PARTITIONS}")
+
+
+def downgrade() -> None:
+    op.execute("ALTER TABLE votes REMOVE PARTITIONING")
+    op.execute("ALTER TABLE votes DROP PRIMARY KEY, ADD PRIMARY KEY (id)")
+    # Archived votes go back so the votes table is complete again.
+    op.execute(
+        "INSERT INTO votes (id, poll_id, option_id, voter_token, created_at) "
+        "SELECT id, poll_id, option_id, voter_token, created_at FROM votes_archive"
+    )
+    op.drop_index("idx_votes_poll_option", table_name="votes")
+    op.create_index("idx_votes_poll", "votes", ["poll_id"])
+    op.create_index("idx_votes_option", "votes", ["option_id"])
+    op.create_foreign_key(
+        None, "votes", "polls", ["poll_id"], ["id"], ondelete="CASCADE"
+    )
+    op.create_foreign_key(
+        None, "votes", "poll_options", ["option_id"], ["id"], ondelete="CASCADE"
+    )
+    op.drop_table("votes_archive")
+    op.drop_table("poll_archives")
@@ -0,0 +1,30 @@
+"""Add vote_writer_offsets for idempotent write-behind batches
+
+Revision ID: 0006_vote_writer_offsets
+Revises: 0005_partition_votes
+Create Date: 2026-10-18 00:00:00.000000
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "0006_vote_writer_offsets"
+down_revision = "0005_partition_votes"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "vote_writer_offsets",
+        sa.Column("stream", sa.VARCHAR(length=64), primary_key=True),
+        sa.Column("last_entry_id", sa.VARCHAR(length=32), nullable=False),
+        mysql_engine="InnoDB",
+        mysql_charset="utf8mb4",
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("vote_writer_offsets")
@@ -0,0 +1 @@
+"""Load-testing and benchmark suite."""
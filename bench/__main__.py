@@ -0,0 +1,148 @@
+import argparse
+import asyncio
+import socket
+import time
+
+import httpx
+
+from app.bench.report import print_latency
+
+
+def _parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        prog="python -m app.bench",
+        description="Drive votes, results reads and WebSocket viewers and report latency.",
+    )
+    parser.add_argument("--url", help="target server; default starts one in-process on SQLite + fakeredis")
+    parser.add_argument("--poll-id", type=int, action="append", default=[], help="existing poll to target (with --url)")
+    parser.add_argument("--polls", type=int, default=1)
+    parser.add_argument("--options", type=int, default=4)
+    parser.add_argument("--voters", type=int, default=10000)
+    parser.add_argument("--vote-concurrency", type=int, default=50)
+    parser.add_argument("--results-concurrency", type=int, default=20)
+    parser.add_argument("--subscribers", type=int, default=100)
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--etag", action="store_true", help="send If-None-Match on results reads")
+    parser.add_argument("--lag-samples", type=int, default=500)
+    return parser.parse_args()
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+async def _start_local_server():
+    import uvicorn
+
+    from app.main import app
+
+    port = _free_port()
+    server = uvicorn.Server(
+        uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning")
+    )
+    task = asyncio.create_task(server.serve())
+    while not server.started:
+        await asyncio.sleep(0.05)
+    return f"http://127.0.0.1:{port}", server, task
+
+
+async def run(args: argparse.Namespace) -> None:
+    from app.bench.workloads import delivery_lags, drive_results, drive_votes, subscribe
+
+    server = task = None
+    if args.url:
+        base_url = args.url.rstrip("/")
+    else:
+        from app.bench.seed import seed_polls
+
+        base_url, server, task = await _start_local_server()
+
+    limits = httpx.Limits(max_connections=args.vote_concurrency + args.results_concurrency)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=30) as client:
+        if args.url:
+            polls = {}
+            for poll_id in args.poll_id:
+                poll = (await client.get(f"/polls/{poll_id}")).json()
+                polls[poll_id] = [option["id"] for option in poll["options"]]
+        else:
+            polls = await seed_polls(args.polls, args.options)
+        if not polls:
+            raise SystemExit("no polls to benchmark; pass --poll-id with --url")
+
+        ws_base = base_url.replace("http", "ws", 1)
+        stop = asyncio.Event()
+        frames: dict[int, list[list[float]]] = {poll_id: [] for poll_id in polls}
+        subscribers = []
+        poll_ids = list(polls)
+        for index in range(args.subscribers):
+            poll_id = poll_ids[index % len(poll_ids)]
+            received: list[float] = []
+            frames[poll_id].append(received)
+            connected = asyncio.Event()
+            subscribers.append(
+                asyncio.create_task(
+                    subscribe(f"{ws_base}/ws/polls/{poll_id}", received, connected, stop)
+                )
+            )
+            await connected.wait()
+
+        started = time.perf_counter()
+        deadline = started + args.duration
+        (vote_latencies, vote_statuses, completed), (read_latencies, read_statuses) = (
+            await asyncio.gather(
+                drive_votes(
+                    client,
+                    polls,
+                    voters=args.voters,
+                    concurrency=args.vote_concurrency,
+                    deadline=deadline,
+                ),
+                drive_results(
+                    client,
+                    concurrency=args.results_concurrency,
+                    deadline=deadline,
+                    use_etag=args.etag,
+                ),
+            )
+        )
+        elapsed = time.perf_counter() - started
+
+        # Give the last coalesced frames time to arrive before closing viewers.
+        await asyncio.sleep(1.0)
+        stop.set()
+        await asyncio.gather(*subscribers)
+
+    lags: list[float] = []
+    missed = 0
+    for poll_id, poll_frames in frames.items():
+        poll_lags, poll_missed = delivery_lags(completed[poll_id], poll_frames, args.lag_samples)
+        lags.extend(poll_lags)
+        missed += poll_missed
+
+    print(f"target={base_url} polls={len(polls)} subscribers={args.subscribers} duration={elapsed:.1f}s")
+    print_latency("votes", vote_latencies, elapsed)
+    print(f"{'':<10} statuses={vote_statuses}")
+    print_latency("results", read_latencies, elapsed)
+    print(f"{'':<10} statuses={read_statuses}")
+    frame_count = sum(len(received) for poll_frames in frames.values() for received in poll_frames)
+    print(f"{'ws frames':<10} received={frame_count} ({frame_count / elapsed:.0f}/s)")
+    print_latency("ws lag", lags)
+    print(f"{'':<10} votes without a later frame={missed}")
+
+    if server is not None:
+        server.should_exit = True
+        await task
+
+
+def main() -> None:
+    args = _parse_args()
+    if not args.url:
+        from app.bench.stand_ins import use_local_stand_ins
+
+        use_local_stand_ins()
+    asyncio.run(run(args))
+
+
+main()
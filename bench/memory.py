@@ -0,0 +1,169 @@
+import argparse
+import asyncio
+import os
+import subprocess
+import sys
+import time
+
+import httpx
+from websockets.asyncio.client import connect
+
+from app.bench.report import print_latency
+
+TRANSPORTS = ("ws", "sse", "longpoll")
+
+
+def _parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        prog="python -m app.bench.memory",
+        description=(
+            "Compare server memory per idle viewer for WebSocket, SSE and "
+            "long-poll results on a local SQLite + fakeredis server (Linux)."
+        ),
+    )
+    parser.add_argument("--connections", type=int, default=1000)
+    parser.add_argument("--transport", choices=TRANSPORTS, action="append", default=[])
+    parser.add_argument("--port", type=int, default=8811)
+    parser.add_argument("--settle", type=float, default=2.0)
+    return parser.parse_args()
+
+
+def _rss_kib(pid: int) -> int:
+    with open(f"/proc/{pid}/status") as status:
+        for line in status:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1])
+    raise RuntimeError(f"no VmRSS for pid {pid}")
+
+
+async def _start_server(port: int) -> subprocess.Popen:
+    # A separate process per transport so the client side and the memory
+    # kept by earlier runs do not show up in the measurement.
+    import app
+
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.path.dirname(os.path.dirname(app.__file__))
+    env["RESULTS_LONG_POLL_TIMEOUT"] = "3600"
+    env["METRICS_ENABLED"] = "false"
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port), "--log-level", "warning"],
+        env=env,
+    )
+    async with httpx.AsyncClient() as client:
+        while True:
+            try:
+                await client.get(f"http://127.0.0.1:{port}/stats/poll-cache")
+                return process
+            except httpx.TransportError:
+                await asyncio.sleep(0.1)
+
+
+async def _ws_viewer(url: str, ready: asyncio.Event, updated: asyncio.Event) -> None:
+    async with connect(url) as websocket:
+        ready.set()
+        await websocket.recv()
+        updated.set()
+
+
+async def _sse_viewer(client: httpx.AsyncClient, url: str, ready: asyncio.Event, updated: asyncio.Event) -> None:
+    async with client.stream("GET", url) as response:
+        frames = 0
+        async for line in response.aiter_lines():
+            if not line.startswith("data:"):
+                continue
+            frames += 1
+            if frames == 1:
+                ready.set()
+            else:
+                updated.set()
+                return
+
+
+async def _longpoll_viewer(
+    client: httpx.AsyncClient, url: str, version: str, ready: asyncio.Event, updated: asyncio.Event
+) -> None:
+    request = asyncio.create_task(client.get(url, params={"since": version}))
+    # The server answers only after the next update, so "ready" means sent.
+    await asyncio.sleep(0)
+    ready.set()
+    await request
+    updated.set()
+
+
+async def measure(transport: str, args: argparse.Namespace, poll_id: int, option_id: int) -> None:
+    server = await _start_server(args.port)
+    base_url = f"http://127.0.0.1:{args.port}"
+    limits = httpx.Limits(max_connections=args.connections + 10)
+    try:
+        async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=None) as client:
+            response = await client.get(f"/polls/{poll_id}/results")
+            version = response.headers.get("x-results-version")
+            if version is None:
+                version = (await client.get(f"/polls/{poll_id}/results")).headers["x-results-version"]
+            await asyncio.sleep(args.settle)
+            baseline = _rss_kib(server.pid)
+
+            readies, updates, viewers = [], [], []
+            for _ in range(args.connections):
+                ready, updated = asyncio.Event(), asyncio.Event()
+                readies.append(ready)
+                updates.append(updated)
+                if transport == "ws":
+                    viewer = _ws_viewer(f"ws://127.0.0.1:{args.port}/ws/polls/{poll_id}", ready, updated)
+                elif transport == "sse":
+                    viewer = _sse_viewer(client, f"/polls/{poll_id}/results/stream", ready, updated)
+                else:
+                    viewer = _longpoll_viewer(client, f"/polls/{poll_id}/results", version, ready, updated)
+                viewers.append(asyncio.create_task(viewer))
+                await ready.wait()
+            await asyncio.sleep(args.settle)
+            loaded = _rss_kib(server.pid)
+
+            voted_at = time.perf_counter()
+            await client.post(f"/polls/{poll_id}/votes", json={"optionId": option_id})
+            lags = []
+            for updated in updates:
+                await updated.wait()
+                lags.append((time.perf_counter() - voted_at) * 1000)
+            for viewer in viewers:
+                viewer.cancel()
+            await asyncio.gather(*viewers, return_exceptions=True)
+    finally:
+        server.terminate()
+        server.wait()
+
+    per_connection = (loaded - baseline) / args.connections
+    print(
+        f"{transport:<10} connections={args.connections} "
+        f"rss_before={baseline / 1024:.1f}MiB rss_after={loaded / 1024:.1f}MiB "
+        f"per_connection={per_connection:.1f}KiB"
+    )
+    print_latency(f"{transport} fan", lags)
+
+
+async def run(args: argparse.Namespace) -> None:
+    from app.bench.seed import seed_polls
+    from app.database import engine
+
+    # Let the first server create the tables, then seed the shared SQLite file.
+    server = await _start_server(args.port)
+    server.terminate()
+    server.wait()
+    polls = await seed_polls(1, 2)
+    poll_id, option_ids = next(iter(polls.items()))
+
+    await engine.dispose()
+
+    for transport in args.transport or TRANSPORTS:
+        await measure(transport, args, poll_id, option_ids[0])
+
+
+def main() -> None:
+    from app.bench.stand_ins import use_local_stand_ins
+
+    use_local_stand_ins()
+    asyncio.run(run(_parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,24 @@
+import statistics
+
+
+def percentile(values: list[float], fraction: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, int(len(ordered) * fraction) - 1))
+    return ordered[index]
+
+
+def print_latency(name: str, latencies: list[float], elapsed: float | None = None) -> None:
+    if not latencies:
+        print(f"{name:<10} no samples")
+        return
+    throughput = f"throughput={len(latencies) / elapsed:.0f}/s " if elapsed else ""
+    print(
+        f"{name:<10} n={len(latencies)} "
+        f"{throughput}"
+        f"p50={statistics.median(latencies):.2f}ms "
+        f"p90={percentile(latencies, 0.90):.2f}ms "
+        f"p99={percentile(latencies, 0.99):.2f}ms "
+        f"max={max(latencies):.2f}ms"
+    )
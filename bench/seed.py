@@ -0,0 +1,26 @@
+from app.database import AsyncSessionLocal
+from app.models import Poll, PollOption
+from app.poll_cache import ACTIVE_POLL_KEY
+from app.redis_client import create_redis
+
+
+async def seed_polls(polls: int, options: int) -> dict[int, list[int]]:
+    seeded: dict[int, list[int]] = {}
+    async with AsyncSessionLocal() as session:
+        for poll_index in range(polls):
+            poll = Poll(title=f"bench poll {poll_index}", description=None, is_active=1)
+            poll.options = [
+                PollOption(label=f"option {option_index}", sort_order=option_index)
+                for option_index in range(options)
+            ]
+            session.add(poll)
+            await session.flush()
+            seeded[poll.id] = [option.id for option in poll.options]
+        await session.commit()
+    # New active polls; GET /polls/results switches to the newest right away.
+    redis = create_redis()
+    try:
+        await redis.delete(ACTIVE_POLL_KEY)
+    finally:
+        await redis.aclose()
+    return seeded
@@ -0,0 +1,11 @@
+import os
+import tempfile
+
+
+def use_local_stand_ins() -> str:
+    # Must run before app.config is imported: SQLite file + in-memory Redis.
+    workdir = tempfile.mkdtemp(prefix="exodus-bench-")
+    os.environ["DATABASE_URL"] = f"sqlite+aiosqlite:///{workdir}/bench.db"
+    os.environ["REDIS_URL"] = "fakeredis://"
+    os.environ["AUTO_CREATE_TABLES"] = "true"
+    return workdir
@@ -0,0 +1,97 @@
+import asyncio
+import bisect
+import random
+import time
+import uuid
+
+import httpx
+from websockets.asyncio.client import connect
+
+
+async def drive_votes(
+    client: httpx.AsyncClient,
+    polls: dict[int, list[int]],
+    *,
+    voters: int,
+    concurrency: int,
+    deadline: float,
+) -> tuple[list[float], dict[int, int], dict[int, list[float]]]:
+    tokens = [str(uuid.uuid4()) for _ in range(voters)]
+    poll_ids = list(polls)
+    latencies: list[float] = []
+    statuses: dict[int, int] = {}
+    completed: dict[int, list[float]] = {poll_id: [] for poll_id in poll_ids}
+
+    async def worker() -> None:
+        while time.perf_counter() < deadline:
+            poll_id = random.choice(poll_ids)
+            body = {
+                "optionId": random.choice(polls[poll_id]),
+                "voterToken": random.choice(tokens),
+            }
+            started = time.perf_counter()
+            response = await client.post(f"/polls/{poll_id}/votes", json=body)
+            finished = time.perf_counter()
+            latencies.append((finished - started) * 1000)
+            statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+            if response.status_code == 200:
+                completed[poll_id].append(finished)
+
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return latencies, statuses, completed
+
+
+async def drive_results(
+    client: httpx.AsyncClient,
+    *,
+    concurrency: int,
+    deadline: float,
+    use_etag: bool,
+) -> tuple[list[float], dict[int, int]]:
+    latencies: list[float] = []
+    statuses: dict[int, int] = {}
+
+    async def worker() -> None:
+        etag = None
+        while time.perf_counter() < deadline:
+            headers = {"If-None-Match": etag} if use_etag and etag else {}
+            started = time.perf_counter()
+            response = await client.get("/polls/results", headers=headers)
+            latencies.append((time.perf_counter() - started) * 1000)
+            statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+            etag = response.headers.get("etag", etag)
+
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return latencies, statuses
+
+
+async def subscribe(
+    ws_url: str, frames: list[float], connected: asyncio.Event, stop: asyncio.Event
+) -> None:
+    async with connect(ws_url) as websocket:
+        connected.set()
+        while not stop.is_set():
+            try:
+                await asyncio.wait_for(websocket.recv(), 0.2)
+            except asyncio.TimeoutError:
+                continue
+            frames.append(time.perf_counter())
+
+
+def delivery_lags(
+    completed: list[float], subscriber_frames: list[list[float]], max_samples: int
+) -> tuple[list[float], int]:
+    # Lag = time from a vote response until the next frame on each subscriber.
+    samples = completed
+    if len(samples) > max_samples:
+        samples = random.sample(samples, max_samples)
+    lags: list[float] = []
+    missed = 0
+    for frames in subscriber_frames:
+        for voted_at in samples:
+            index = bisect.bisect_left(frames, voted_at)
+            if index == len(frames):
+                missed += 1
+            else:
+                lags.append((frames[index] - voted_at) * 1000)
+    return lags, missed
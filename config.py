@@ -16,4 +16,75 @@ DATABASE_URL = _env(
     f"mysql+aiomysql://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}",
 )
 
+DB_POOL_SIZE = int(_env("DB_POOL_SIZE", "20"))
+DB_MAX_OVERFLOW = int(_env("DB_MAX_OVERFLOW", "20"))
+DB_POOL_TIMEOUT = float(_env("DB_POOL_TIMEOUT", "10"))
+DB_POOL_RECYCLE = int(_env("DB_POOL_RECYCLE", "1800"))
+DB_POOL_PRE_PING = _env("DB_POOL_PRE_PING", "false").lower() == "true"
+DB_POOL_WARMUP = int(_env("DB_POOL_WARMUP", str(DB_POOL_SIZE)))
+
+# Optional read replica for the read-only endpoints; empty means every read
+# goes to DATABASE_URL.
+DATABASE_REPLICA_URL = _env("DATABASE_REPLICA_URL", "")
+DB_REPLICA_MAX_LAG = float(_env("DB_REPLICA_MAX_LAG", "2"))
+DB_REPLICA_CHECK_INTERVAL = float(_env("DB_REPLICA_CHECK_INTERVAL", "1"))
+DB_REPLICA_READ_YOUR_WRITES = int(_env("DB_REPLICA_READ_YOUR_WRITES", "5"))
+
 REDIS_URL = _env("REDIS_URL", "redis://localhost:6379/0")
+REDIS_MAX_CONNECTIONS = int(_env("REDIS_MAX_CONNECTIONS", "200"))
+REDIS_POOL_TIMEOUT = float(_env("REDIS_POOL_TIMEOUT", "5"))
+REDIS_HEALTH_CHECK_INTERVAL = int(_env("REDIS_HEALTH_CHECK_INTERVAL", "30"))
+REDIS_HIREDIS = _env("REDIS_HIREDIS", "auto").lower()
+REDIS_POOL_WARMUP = int(_env("REDIS_POOL_WARMUP", "20"))
+
+VOTE_WRITE_BEHIND = _env("VOTE_WRITE_BEHIND", "false").lower() == "true"
+VOTE_WRITE_BATCH_SIZE = int(_env("VOTE_WRITE_BATCH_SIZE", "500"))
+VOTE_WRITE_FLUSH_INTERVAL = float(_env("VOTE_WRITE_FLUSH_INTERVAL", "0.2"))
+VOTE_WRITE_MAX_PENDING = int(_env("VOTE_WRITE_MAX_PENDING", "100000"))
+VOTE_WRITE_DRAIN_TIMEOUT = float(_env("VOTE_WRITE_DRAIN_TIMEOUT", "10"))
+VOTE_WRITE_MAX_ATTEMPTS = int(_env("VOTE_WRITE_MAX_ATTEMPTS", "3"))
+
+VOTE_IDEMPOTENCY_TTL = int(_env("VOTE_IDEMPOTENCY_TTL", "600"))
+# How long an "in progress" claim blocks retries when the request never gets
+# to release it (worker crash); longer than any vote request takes.
+VOTE_IDEMPOTENCY_CLAIM_TTL = int(_env("VOTE_IDEMPOTENCY_CLAIM_TTL", "30"))
+VOTE_RATE_LIMIT_VOTER_RATE = float(_env("VOTE_RATE_LIMIT_VOTER_RATE", "2"))
+VOTE_RATE_LIMIT_VOTER_BURST = int(_env("VOTE_RATE_LIMIT_VOTER_BURST", "5"))
+VOTE_RATE_LIMIT_IP_RATE = float(_env("VOTE_RATE_LIMIT_IP_RATE", "0"))
+VOTE_RATE_LIMIT_IP_BURST = int(_env("VOTE_RATE_LIMIT_IP_BURST", "100"))
+
+WS_BROADCAST_BACKEND = _env("WS_BROADCAST_BACKEND", "local")
+WS_BROADCAST_MAX_FPS = float(_env("WS_BROADCAST_MAX_FPS", "10"))
+WS_SEND_CONCURRENCY = int(_env("WS_SEND_CONCURRENCY", "500"))
+WS_SEND_TIMEOUT = float(_env("WS_SEND_TIMEOUT", "2.0"))
+WS_SEND_QUEUE_SIZE = int(_env("WS_SEND_QUEUE_SIZE", "16"))
+WS_PING_INTERVAL = float(_env("WS_PING_INTERVAL", "20"))
+WS_IDLE_TIMEOUT = float(_env("WS_IDLE_TIMEOUT", "60"))
+WS_MAX_CONNECTIONS = int(_env("WS_MAX_CONNECTIONS", "0"))
+
+RESULTS_LONG_POLL_TIMEOUT = float(_env("RESULTS_LONG_POLL_TIMEOUT", "25"))
+RESULTS_STREAM_KEEPALIVE = float(_env("RESULTS_STREAM_KEEPALIVE", "15"))
+RESULTS_CACHE_MAX_AGE = int(_env("RESULTS_CACHE_MAX_AGE", "1"))
+RESULTS_MAX_POLLS = int(_env("RESULTS_MAX_POLLS", "100"))
+
+POLL_CACHE_SIZE = int(_env("POLL_CACHE_SIZE", "1024"))
+POLL_CACHE_TTL = float(_env("POLL_CACHE_TTL", "60"))
+POLL_CACHE_VERSION_CHECK_INTERVAL = float(_env("POLL_CACHE_VERSION_CHECK_INTERVAL", "1.0"))
+
+ACTIVE_POLL_REFRESH_INTERVAL = float(_env("ACTIVE_POLL_REFRESH_INTERVAL", "1.0"))
+ACTIVE_POLL_REDIS_TTL = int(_env("ACTIVE_POLL_REDIS_TTL", "60"))
+# "No active poll" is kept briefly, so a poll created without invalidating the
+# pointer still shows up within seconds.
+ACTIVE_POLL_NONE_REDIS_TTL = int(_env("ACTIVE_POLL_NONE_REDIS_TTL", "1"))
+
+METRICS_ENABLED = _env("METRICS_ENABLED", "true").lower() == "true"
+
+REBUILD_LOCK_TIMEOUT = float(_env("REBUILD_LOCK_TIMEOUT", "5"))
+
+# Background Redis <-> DB counter reconciliation; see README "카운터 정합성 점검".
+RECONCILE_ENABLED = _env("RECONCILE_ENABLED", "true").lower() == "true"
+RECONCILE_INTERVAL = float(_env("RECONCILE_INTERVAL", "60"))
+RECONCILE_CHUNK_SIZE = int(_env("RECONCILE_CHUNK_SIZE", "20"))
+RECONCILE_MAX_POLLS_PER_SECOND = float(_env("RECONCILE_MAX_POLLS_PER_SECOND", "20"))
+RECONCILE_SETTLE = float(_env("RECONCILE_SETTLE", "1.0"))
+RECONCILE_MAX_POOL_USAGE = float(_env("RECONCILE_MAX_POOL_USAGE", "0.5"))
@@ -0,0 +1,181 @@
+import secrets
+import zlib
+
+from redis.asyncio import Redis
+
+# Reserved fields of a shard hash; every other field is an option id.
+TOTAL_FIELD = "_total"
+VERSION_FIELD = "_version"
+SHARDS_FIELD = "_shards"
+
+
+def redis_keys(poll_id: int) -> tuple[str, str]:
+    return f"poll:{poll_id}:total", f"poll:{poll_id}:options"
+
+
+def results_version_key(poll_id: int) -> str:
+    return f"poll:{poll_id}:results_version"
+
+
+def new_results_epoch() -> int:
+    # Rebuilds restart the results version at a random point rather than
+    # counting on from the key: after a Redis flush or restart a counter would
+    # start over at 1 and match snapshots and ETags of different counts.
+    return secrets.randbits(48)
+
+
+def shard_key(poll_id: int, shard: int) -> str:
+    # The braces are a Redis Cluster hash tag naming the poll and the shard.
+    # Counter commands of the sharded layout touch one key each, but the app
+    # as a whole is not cluster-safe: create_redis builds a standalone client
+    # and other paths (MGET of versions, the unsharded and write-behind
+    # scripts) use keys in different slots.
+    return f"poll:{{{poll_id}:{shard}}}:counts"
+
+
+def shard_for(poll_id: int, shards: int, voter_token: str) -> str:
+    return shard_key(poll_id, zlib.crc32(voter_token.encode()) % shards)
+
+
+def queue_shard_reads(pipe, poll_id: int, shards: int, generation_key: str) -> None:
+    pipe.get(generation_key)
+    for shard in range(shards):
+        pipe.hgetall(shard_key(poll_id, shard))
+
+
+def parse_shards(
+    shards: int, generation: str | None, hashes: list[dict]
+) -> tuple[str, dict[str, int], int] | None:
+    # None until every shard is built for the current shard count. The
+    # version combines the rebuild generation with the per-shard write
+    # counters, which only grow between rebuilds.
+    if (
+        generation is None
+        or not all(hashes)
+        or hashes[0].get(SHARDS_FIELD) != str(shards)
+    ):
+        return None
+
+    counts: dict[str, int] = {}
+    total = 0
+    writes = 0
+    for fields in hashes:
+        for field, value in fields.items():
+            if field == TOTAL_FIELD:
+                total += int(value)
+            elif field == VERSION_FIELD:
+                writes += int(value)
+            elif field != SHARDS_FIELD:
+                counts[field] = counts.get(field, 0) + int(value)
+    return f"{generation}.{writes}", counts, total
+
+
+async def read_shards(
+    redis: Redis, poll_id: int, shards: int, generation_key: str
+) -> tuple[str, dict[str, int], int] | None:
+    # One pipelined round trip.
+    async with redis.pipeline(transaction=False) as pipe:
+        queue_shard_reads(pipe, poll_id, shards, generation_key)
+        generation, *hashes = await pipe.execute()
+    return parse_shards(shards, generation, hashes)
+
+
+async def read_counters(
+    redis: Redis, polls: list[tuple[int, int]]
+) -> list[tuple[str | None, dict[str, int] | None, int]]:
+    # Version, per-option counts and total of each (poll_id, shards) in one
+    # pipelined round trip. Each version is queued before its counts, so a
+    # snapshot stored under it is never older than the version. counts is
+    # None until the poll's counters are built.
+    async with redis.pipeline(transaction=False) as pipe:
+        for poll_id, shards in polls:
+            if shards > 1:
+                queue_shard_reads(pipe, poll_id, shards, results_version_key(poll_id))
+            else:
+                total_key, options_key = redis_keys(poll_id)
+                pipe.get(results_version_key(poll_id))
+                pipe.hgetall(options_key)
+                pipe.get(total_key)
+        replies = await pipe.execute()
+
+    counters = []
+    position = 0
+    for _, shards in polls:
+        if shards > 1:
+            cached = parse_shards(
+                shards, replies[position], replies[position + 1 : position + 1 + shards]
+            )
+            position += 1 + shards
+            counters.append(cached if cached is not None else (None, None, 0))
+        else:
+            version, counts, total = replies[position : position + 3]
+            position += 3
+            if counts and total is not None:
+                counters.append(
+                    (version, {str(k): int(v) for k, v in counts.items()}, int(total))
+                )
+            else:
+                counters.append((version, None, 0))
+    return counters
+
+
+async def write_shards(
+    redis: Redis,
+    poll_id: int,
+    shards: int,
+    counts: dict[str, int],
+    total: int,
+    generation_key: str,
+) -> None:
+    # Shard 0 carries the shard count and is written last, so readers treat the
+    # poll as not ready until every shard exists. A plain pipeline of
+    # single-key commands, as the shards are separate hash tags.
+    previous = await redis.hget(shard_key(poll_id, 0), SHARDS_FIELD)
+    async with redis.pipeline(transaction=False) as pipe:
+        pipe.delete(shard_key(poll_id, 0))
+        pipe.set(generation_key, new_results_epoch())
+        for shard in range(1, max(shards, int(previous or 0))):
+            pipe.delete(shard_key(poll_id, shard))
+        for shard in range(1, shards):
+            pipe.hset(
+                shard_key(poll_id, shard),
+                mapping={TOTAL_FIELD: 0, VERSION_FIELD: 0},
+            )
+        pipe.hset(
+            shard_key(poll_id, 0),
+            mapping={
+                **counts,
+                TOTAL_FIELD: total,
+                VERSION_FIELD: 0,
+                SHARDS_FIELD: shards,
+            },
+        )
+        await pipe.execute()
+
+
+async def write_counters(
+    redis: Redis, poll_id: int, shards: int, counts: dict[str, int], total: int
+) -> None:
+    total_key, options_key = redis_keys(poll_id)
+    if shards > 1:
+        # Drop the unsharded keys so switching back rebuilds them; one key per
+        # command like the rest of the sharded layout.
+        async with redis.pipeline(transaction=False) as pipe:
+            pipe.delete(total_key)
+            pipe.delete(options_key)
+            await pipe.execute()
+        await write_shards(
+            redis, poll_id, shards, counts, total, results_version_key(poll_id)
+        )
+        return
+
+    # MULTI/EXEC so readers never see the hash without the total. Dropping
+    # shard 0 marks any sharded layout stale for a later switch back.
+    async with redis.pipeline(transaction=True) as pipe:
+        pipe.delete(options_key)
+        if counts:
+            pipe.hset(options_key, mapping=counts)
+        pipe.set(total_key, total)
+        pipe.set(results_version_key(poll_id), new_results_epoch())
+        pipe.delete(shard_key(poll_id, 0))
+        await pipe.execute()
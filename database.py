@@ -1,10 +1,64 @@
+import asyncio
+
 from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+
+from app.config import (
+    DATABASE_REPLICA_URL,
+    DATABASE_URL,
+    DB_MAX_OVERFLOW,
+    DB_POOL_PRE_PING,
+    DB_POOL_RECYCLE,
+    DB_POOL_SIZE,
+    DB_POOL_TIMEOUT,
+)
+
 
-from app.config import DATABASE_URL
+def _engine_options(url: str) -> dict:
+    # SQLite (the local benchmark stand-in) allows a single writer, so sessions
+    # queue for one shared connection instead of failing with "database is
+    # locked". Elsewhere pool_recycle stays below MariaDB's wait_timeout, which
+    # keeps idle connections fresh without paying a pre-ping round trip on
+    # every checkout.
+    if url.startswith("sqlite"):
+        return {
+            "poolclass": AsyncAdaptedQueuePool,
+            "pool_size": 1,
+            "max_overflow": 0,
+            "pool_timeout": 60,
+        }
+    return {
+        "pool_size": DB_POOL_SIZE,
+        "max_overflow": DB_MAX_OVERFLOW,
+        "pool_timeout": DB_POOL_TIMEOUT,
+        "pool_recycle": DB_POOL_RECYCLE,
+        "pool_pre_ping": DB_POOL_PRE_PING,
+    }
 
-engine = create_async_engine(DATABASE_URL, pool_pre_ping=True)
+
+_primary_options = _engine_options(DATABASE_URL)
+engine = create_async_engine(DATABASE_URL, **_primary_options)
 AsyncSessionLocal = async_sessionmaker(engine, expire_on_commit=False)
 
+replica_engine = (
+    create_async_engine(DATABASE_REPLICA_URL, **_engine_options(DATABASE_REPLICA_URL))
+    if DATABASE_REPLICA_URL
+    else None
+)
+
+
+def pool_capacity() -> int:
+    return _primary_options["pool_size"] + _primary_options["max_overflow"]
+
+
+async def warm_up_pool(connections: int) -> int:
+    # Only pool_size connections are kept after check-in, so opening more
+    # would just be thrown away.
+    connections = min(connections, _primary_options["pool_size"])
+    opened = await asyncio.gather(*(engine.connect() for _ in range(connections)))
+    await asyncio.gather(*(connection.close() for connection in opened))
+    return connections
+
 
 async def get_session() -> AsyncSession:
     async with AsyncSessionLocal() as session:
@@ -1,17 +1,119 @@
+import asyncio
+import json
+import logging
+import math
 import os
 import uuid
 from contextlib import asynccontextmanager
 
-from fastapi import Depends, FastAPI, HTTPException, WebSocket, WebSocketDisconnect
+from fastapi import (
+    Depends,
+    FastAPI,
+    HTTPException,
+    Query,
+    Request,
+    Response,
+    WebSocket,
+    WebSocketDisconnect,
+)
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import ORJSONResponse, PlainTextResponse, StreamingResponse
+from fastapi.websockets import WebSocketState
+from pydantic import BaseModel
 from redis.asyncio import Redis
-from sqlalchemy import func, select
+from redis.exceptions import LockError
+from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.database import engine, get_session
-from app.models import Base, Poll, PollOption, Vote
-from app.redis_client import create_redis
+from app.config import (
+    ACTIVE_POLL_NONE_REDIS_TTL,
+    ACTIVE_POLL_REDIS_TTL,
+    ACTIVE_POLL_REFRESH_INTERVAL,
+    DB_POOL_WARMUP,
+    DB_REPLICA_CHECK_INTERVAL,
+    DB_REPLICA_MAX_LAG,
+    DB_REPLICA_READ_YOUR_WRITES,
+    METRICS_ENABLED,
+    POLL_CACHE_SIZE,
+    POLL_CACHE_TTL,
+    POLL_CACHE_VERSION_CHECK_INTERVAL,
+    REBUILD_LOCK_TIMEOUT,
+    RECONCILE_CHUNK_SIZE,
+    RECONCILE_ENABLED,
+    RECONCILE_INTERVAL,
+    RECONCILE_MAX_POLLS_PER_SECOND,
+    RECONCILE_MAX_POOL_USAGE,
+    RECONCILE_SETTLE,
+    REDIS_POOL_WARMUP,
+    RESULTS_CACHE_MAX_AGE,
+    RESULTS_LONG_POLL_TIMEOUT,
+    RESULTS_MAX_POLLS,
+    RESULTS_STREAM_KEEPALIVE,
+    VOTE_WRITE_BATCH_SIZE,
+    VOTE_IDEMPOTENCY_CLAIM_TTL,
+    VOTE_IDEMPOTENCY_TTL,
+    VOTE_RATE_LIMIT_IP_BURST,
+    VOTE_RATE_LIMIT_IP_RATE,
+    VOTE_RATE_LIMIT_VOTER_BURST,
+    VOTE_RATE_LIMIT_VOTER_RATE,
+    VOTE_WRITE_BEHIND,
+    VOTE_WRITE_DRAIN_TIMEOUT,
+    VOTE_WRITE_FLUSH_INTERVAL,
+    VOTE_WRITE_MAX_ATTEMPTS,
+    VOTE_WRITE_MAX_PENDING,
+    WS_BROADCAST_BACKEND,
+    WS_BROADCAST_MAX_FPS,
+    WS_IDLE_TIMEOUT,
+    WS_MAX_CONNECTIONS,
+    WS_PING_INTERVAL,
+    WS_SEND_CONCURRENCY,
+    WS_SEND_QUEUE_SIZE,
+    WS_SEND_TIMEOUT,
+)
+from app.counters import (
+    read_counters,
+    read_shards,
+    redis_keys,
+    results_version_key,
+    shard_for,
+    write_counters,
+)
+from app.database import (
+    AsyncSessionLocal,
+    engine,
+    get_session,
+    pool_capacity,
+    replica_engine,
+    warm_up_pool,
+)
+from app.metrics import (
+    PROMETHEUS_CONTENT_TYPE,
+    Gauge,
+    MetricsMiddleware,
+    count_results_cache,
+    pool_saturation,
+    pool_stats,
+    redis_pool_stats,
+    registry,
+    timed,
+)
+from app.models import Base, Poll, PollOptionCount
+from app.poll_cache import ActivePollPointer, PollCache, PollMeta
+from app.reconciler import CounterReconciler
+from app.redis_client import (
+    ADJUST_COUNTS_LUA,
+    ADJUST_SHARD_COUNTS_LUA,
+    RECORD_VOTE_LUA,
+    UPDATE_COUNTS_LUA,
+    UPDATE_SHARD_COUNTS_LUA,
+    VOTE_GUARD_LUA,
+    create_redis,
+    register_script,
+    warm_up_redis,
+)
+from app.replica import ReplicaRouter
 from app.schemas import (
+    MultiResultsResponse,
     PollOut,
     PollOptionOut,
     ResultsResponse,
@@ -19,29 +121,133 @@ from app.schemas import (
     VoteRequest,
     VoteResponse,
 )
-from app.ws import ConnectionManager
-
-manager = ConnectionManager()
+from app.singleflight import SingleFlight
+from app.snapshots import ResultsSnapshots, etag_for, etag_for_many, etag_matches
+from app.vote_guard import IdempotencyConflict, RateLimited, VoteGuard
+from app.vote_writer import VoteQueueFull, VoteWriter
+from app.votes import apply_vote
+from app.ws import (
+    DELTA_PROTOCOL,
+    ConnectionManager,
+    LocalBroadcastBackend,
+    RedisBroadcastBackend,
+    encode_frame,
+)
 
+logger = logging.getLogger(__name__)
 
-def _redis_keys(poll_id: int) -> tuple[str, str]:
-    return f"poll:{poll_id}:total", f"poll:{poll_id}:options"
+poll_cache = PollCache(
+    max_size=POLL_CACHE_SIZE,
+    ttl=POLL_CACHE_TTL,
+    version_check_interval=POLL_CACHE_VERSION_CHECK_INTERVAL,
+)
+active_poll = ActivePollPointer(
+    refresh_interval=ACTIVE_POLL_REFRESH_INTERVAL,
+    redis_ttl=ACTIVE_POLL_REDIS_TTL,
+    none_redis_ttl=ACTIVE_POLL_NONE_REDIS_TTL,
+)
+results_snapshots = ResultsSnapshots(max_size=POLL_CACHE_SIZE)
+count_rebuilds = SingleFlight()
+read_router = ReplicaRouter(
+    AsyncSessionLocal,
+    replica_engine,
+    max_lag=DB_REPLICA_MAX_LAG,
+    check_interval=DB_REPLICA_CHECK_INTERVAL,
+    read_your_writes=DB_REPLICA_READ_YOUR_WRITES,
+)
+manager = ConnectionManager(
+    max_fps=WS_BROADCAST_MAX_FPS,
+    send_concurrency=WS_SEND_CONCURRENCY,
+    send_timeout=WS_SEND_TIMEOUT,
+    queue_size=WS_SEND_QUEUE_SIZE,
+    ping_interval=WS_PING_INTERVAL,
+    idle_timeout=WS_IDLE_TIMEOUT,
+    max_connections=WS_MAX_CONNECTIONS,
+)
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     redis = create_redis()
     app.state.redis = redis
+    app.state.update_counts_script = await register_script(redis, UPDATE_COUNTS_LUA)
+    app.state.update_shard_counts_script = await register_script(
+        redis, UPDATE_SHARD_COUNTS_LUA
+    )
+    app.state.vote_guard = VoteGuard(
+        await register_script(redis, VOTE_GUARD_LUA),
+        idempotency_ttl=VOTE_IDEMPOTENCY_TTL,
+        claim_ttl=VOTE_IDEMPOTENCY_CLAIM_TTL,
+        voter_rate=VOTE_RATE_LIMIT_VOTER_RATE,
+        voter_burst=VOTE_RATE_LIMIT_VOTER_BURST,
+        ip_rate=VOTE_RATE_LIMIT_IP_RATE,
+        ip_burst=VOTE_RATE_LIMIT_IP_BURST,
+    )
+    if WS_BROADCAST_BACKEND == "redis":
+        await manager.start(RedisBroadcastBackend(redis))
+    else:
+        await manager.start(LocalBroadcastBackend())
 
     if os.getenv("AUTO_CREATE_TABLES", "false").lower() == "true":
-        async with engine.begin() as conn:
-            await conn.run_sync(Base.metadata.create_all)
+        for db in (engine, replica_engine):
+            if db is not None:
+                async with db.begin() as conn:
+                    await conn.run_sync(Base.metadata.create_all)
+
+    # Open pooled connections before traffic arrives so the first burst after
+    # a deploy does not queue behind TCP and auth handshakes.
+    try:
+        await asyncio.gather(
+            warm_up_pool(DB_POOL_WARMUP), warm_up_redis(redis, REDIS_POOL_WARMUP)
+        )
+    except Exception:
+        logger.warning("connection pool warm-up failed", exc_info=True)
+    await read_router.start()
+
+    if VOTE_WRITE_BEHIND:
+        app.state.vote_writer = VoteWriter(
+            redis,
+            AsyncSessionLocal,
+            await register_script(redis, RECORD_VOTE_LUA),
+            batch_size=VOTE_WRITE_BATCH_SIZE,
+            flush_interval=VOTE_WRITE_FLUSH_INTERVAL,
+            max_pending=VOTE_WRITE_MAX_PENDING,
+            drain_timeout=VOTE_WRITE_DRAIN_TIMEOUT,
+            max_attempts=VOTE_WRITE_MAX_ATTEMPTS,
+        )
+        app.state.vote_writer.start()
+
+    if RECONCILE_ENABLED:
+        app.state.reconciler = CounterReconciler(
+            redis,
+            AsyncSessionLocal,
+            poll_cache,
+            _reference_counts,
+            await register_script(redis, ADJUST_COUNTS_LUA),
+            await register_script(redis, ADJUST_SHARD_COUNTS_LUA),
+            interval=RECONCILE_INTERVAL,
+            chunk_size=RECONCILE_CHUNK_SIZE,
+            polls_per_second=RECONCILE_MAX_POLLS_PER_SECOND,
+            settle=RECONCILE_SETTLE,
+            lock_timeout=REBUILD_LOCK_TIMEOUT,
+            busy=_db_pool_busy,
+        )
+        app.state.reconciler.start()
 
     yield
+    if RECONCILE_ENABLED:
+        await app.state.reconciler.stop()
+    await read_router.stop()
+    await manager.close()
+    if VOTE_WRITE_BEHIND:
+        await app.state.vote_writer.stop()
     await redis.close()
+    await engine.dispose()
+    if replica_engine is not None:
+        await replica_engine.dispose()
 
 
-app = FastAPI(lifespan=lifespan)
+app = FastAPI(lifespan=lifespan, default_response_class=ORJSONResponse)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*","https://jared-undeaf-jacques.ngrok-free.dev"],
@@ -49,53 +255,244 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+if METRICS_ENABLED:
+    app.add_middleware(MetricsMiddleware)
+    registry.register(
+        Gauge(
+            "exodus_ws_connections",
+            "Open WebSocket connections on this worker per poll.",
+            ("poll_id",),
+            lambda: (
+                ((str(poll_id),), count)
+                for poll_id, count in manager.connection_counts().items()
+            ),
+        )
+    )
+    registry.register(
+        Gauge(
+            "exodus_results_watchers",
+            "Open SSE and long-poll readers on this worker per poll.",
+            ("poll_id",),
+            lambda: (
+                ((str(poll_id),), count)
+                for poll_id, count in manager.watcher_counts().items()
+            ),
+        )
+    )
+    registry.register(
+        Gauge(
+            "exodus_db_pool_connections",
+            "SQLAlchemy pool connections by state.",
+            ("state",),
+            lambda: pool_stats(engine.pool, pool_capacity()),
+        )
+    )
+    registry.register(
+        Gauge(
+            "exodus_redis_pool_connections",
+            "Redis client pool connections by state.",
+            ("state",),
+            lambda: redis_pool_stats(app.state.redis.connection_pool),
+        )
+    )
+    registry.register(
+        Gauge(
+            "exodus_pool_saturation",
+            "Checked-out share of each connection pool's capacity.",
+            ("pool",),
+            lambda: pool_saturation(
+                engine.pool, pool_capacity(), app.state.redis.connection_pool
+            ),
+        )
+    )
+    registry.register(
+        Gauge(
+            "exodus_db_replica",
+            "Read replica health (1/0) and replication lag in seconds (-1 unknown).",
+            ("state",),
+            lambda: (((state,), value) for state, value in read_router.stats().items()),
+        )
+    )
+    registry.register(
+        Gauge(
+            "exodus_poll_cache_lookups",
+            "In-process poll metadata cache lookups and size.",
+            ("kind",),
+            lambda: (((kind,), value) for kind, value in poll_cache.stats().items()),
+        )
+    )
+
+    @app.get("/metrics", include_in_schema=False)
+    async def get_metrics():
+        return PlainTextResponse(registry.render(), media_type=PROMETHEUS_CONTENT_TYPE)
 
 
 def get_redis(app: FastAPI) -> Redis:
     return app.state.redis
 
 
-@app.get("/polls/results", response_model=ResultsResponse)
+async def get_read_session(request: Request) -> AsyncSession:
+    # For routes that never write; may be served by the read replica.
+    async with read_router.session(request) as session:
+        yield session
+
+
+@app.get("/stats/poll-cache")
+async def get_poll_cache_stats():
+    return poll_cache.stats()
+
+
+@app.get("/polls/results", response_model=ResultsResponse | MultiResultsResponse)
 async def get_results(
-    session: AsyncSession = Depends(get_session),
+    request: Request,
+    ids: str | None = None,
+    all_active: bool = Query(False, alias="all"),
+    session: AsyncSession = Depends(get_read_session),
 ):
-    poll_result = await session.execute(
-        select(Poll)
-        .where(
-            Poll.is_active == 1,
-        )
-        .order_by(Poll.id.desc())
-        .limit(1)
-    )
-    poll = poll_result.scalar_one_or_none()
-    if not poll:
+    redis: Redis = get_redis(app)
+    if ids is not None or all_active:
+        return await _multi_results(request, session, redis, ids, all_active)
+
+    poll_id = await active_poll.get(session, redis)
+    if not poll_id:
         raise HTTPException(status_code=404, detail="Active poll not found")
 
-    redis: Redis = get_redis(app)
-    return await _get_results(session, redis, poll.id)
+    version, body = await _results_snapshot(session, redis, poll_id)
+    headers = {"Cache-Control": "no-cache"}
+    if version is not None:
+        etag = etag_for(poll_id, version)
+        headers["ETag"] = etag
+        if etag_matches(request.headers.get("if-none-match"), etag):
+            return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
+
+
+async def _multi_results(
+    request: Request,
+    session: AsyncSession,
+    redis: Redis,
+    ids: str | None,
+    all_active: bool,
+) -> Response:
+    if all_active:
+        with timed("db"):
+            poll_ids = list(
+                (
+                    await session.execute(
+                        select(Poll.id)
+                        .where(Poll.is_active == 1)
+                        .order_by(Poll.id)
+                        .limit(RESULTS_MAX_POLLS)
+                    )
+                ).scalars()
+            )
+    else:
+        try:
+            poll_ids = list(
+                dict.fromkeys(int(value) for value in ids.split(",") if value.strip())
+            )
+        except ValueError:
+            raise HTTPException(status_code=400, detail="ids must be comma-separated poll ids")
+        if len(poll_ids) > RESULTS_MAX_POLLS:
+            raise HTTPException(
+                status_code=400, detail=f"at most {RESULTS_MAX_POLLS} polls per request"
+            )
+
+    found = await poll_cache.get_many(session, redis, poll_ids)
+    polls = [found[poll_id] for poll_id in poll_ids if poll_id in found]
+    snapshots = await _results_snapshots(session, redis, polls)
+
+    headers = {"Cache-Control": "no-cache"}
+    if all(version is not None for version, _ in snapshots):
+        etag = etag_for_many(
+            [(poll.id, version) for poll, (version, _) in zip(polls, snapshots)]
+        )
+        headers["ETag"] = etag
+        if etag_matches(request.headers.get("if-none-match"), etag):
+            return Response(status_code=304, headers=headers)
+    # Each poll's body is the cached single-poll snapshot; only the wrapper
+    # is serialized here. Unknown ids are left out.
+    body = b'{"polls":[' + b",".join(body for _, body in snapshots) + b"]}"
+    return Response(content=body, media_type="application/json", headers=headers)
 
 
 @app.get("/polls/{poll_id}", response_model=PollOut)
 async def get_poll(
     poll_id: int,
-    session: AsyncSession = Depends(get_session),
+    session: AsyncSession = Depends(get_read_session),
 ):
-    poll = await session.get(Poll, poll_id)
+    poll = await poll_cache.get(session, get_redis(app), poll_id)
     if not poll:
         raise HTTPException(status_code=404, detail="Poll not found")
 
-    options_result = await session.execute(
-        select(PollOption)
-        .where(PollOption.poll_id == poll_id)
-        .order_by(PollOption.sort_order, PollOption.id)
+    return _model_response(
+        PollOut(
+            id=poll.id,
+            title=poll.title,
+            description=poll.description,
+            options=[PollOptionOut(id=o.id, label=o.label) for o in poll.options],
+        )
     )
-    options = options_result.scalars().all()
 
-    return PollOut(
-        id=poll.id,
-        title=poll.title,
-        description=poll.description,
-        options=[PollOptionOut(id=o.id, label=o.label) for o in options],
+
+@app.get("/polls/{poll_id}/results", response_model=ResultsResponse)
+async def get_poll_results(
+    poll_id: int,
+    request: Request,
+    since: str | None = None,
+    session: AsyncSession = Depends(get_read_session),
+):
+    # Long-poll: with ?since=<X-Results-Version> the request waits for the
+    # next frame of the poll instead of answering with unchanged results.
+    redis: Redis = get_redis(app)
+    if not await poll_cache.get(session, redis, poll_id):
+        raise HTTPException(status_code=404, detail="Poll not found")
+
+    with manager.watch(poll_id) as feed:
+        seq = feed.seq
+        version, body = await _results_snapshot(session, redis, poll_id)
+        if since is not None and version == since:
+            # Hand the DB connection back while waiting.
+            await session.close()
+            if await feed.wait(seq, RESULTS_LONG_POLL_TIMEOUT):
+                version, body = await _results_snapshot(session, redis, poll_id)
+
+    headers = {"Cache-Control": f"public, max-age={RESULTS_CACHE_MAX_AGE}"}
+    if version is not None:
+        etag = etag_for(poll_id, version)
+        headers["ETag"] = etag
+        headers["X-Results-Version"] = version
+        if version == since or etag_matches(request.headers.get("if-none-match"), etag):
+            return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
+
+
+@app.get("/polls/{poll_id}/results/stream")
+async def stream_poll_results(
+    poll_id: int,
+    session: AsyncSession = Depends(get_read_session),
+):
+    if not await poll_cache.get(session, get_redis(app), poll_id):
+        raise HTTPException(status_code=404, detail="Poll not found")
+    await session.close()
+
+    async def events():
+        # Frames are the same JSON the WebSocket route pushes.
+        with manager.watch(poll_id) as feed:
+            seq = feed.seq
+            payload = await _results_payload(poll_id)
+            yield f"data: {encode_frame(payload)}\n\n"
+            while True:
+                if await feed.wait(seq, RESULTS_STREAM_KEEPALIVE):
+                    seq = feed.seq
+                    yield f"data: {feed.text}\n\n"
+                else:
+                    yield ": keepalive\n\n"
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
     )
 
 
@@ -103,72 +500,113 @@ async def get_poll(
 async def vote(
     poll_id: int,
     payload: VoteRequest,
+    request: Request,
     session: AsyncSession = Depends(get_session),
 ):
-    poll = await session.get(Poll, poll_id)
+    redis: Redis = get_redis(app)
+    guard: VoteGuard = app.state.vote_guard
+    idempotency_key = request.headers.get("idempotency-key")
+    try:
+        with timed("redis"):
+            replay = await guard.admit(
+                redis,
+                poll_id=poll_id,
+                client_ip=request.client.host if request.client else None,
+                voter_token=payload.voterToken,
+                idempotency_key=idempotency_key,
+                fingerprint=f"{payload.optionId}:{payload.voterToken or ''}",
+            )
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+    except RateLimited as exc:
+        raise HTTPException(
+            status_code=429,
+            detail="Too many votes",
+            headers={"Retry-After": str(max(1, math.ceil(exc.retry_after)))},
+        )
+    except IdempotencyConflict as exc:
+        raise HTTPException(status_code=409, detail=str(exc))
+    if replay is not None:
+        return Response(
+            content=replay,
+            media_type="application/json",
+            headers={"Idempotent-Replayed": "true"},
+        )
+    if not guard.uses_idempotency(idempotency_key):
+        response = _model_response(await _record_vote(session, redis, poll_id, payload))
+    else:
+        try:
+            recorded = await _record_vote(session, redis, poll_id, payload)
+        except BaseException:
+            # Let the client retry with the same key, also when the request
+            # is cancelled; only a crashed worker leaves the claim to expire.
+            await guard.forget(redis, poll_id, idempotency_key)
+            raise
+        body = recorded.model_dump_json()
+        await guard.remember(redis, poll_id, idempotency_key, body)
+        response = Response(content=body, media_type="application/json")
+    # Read-your-writes: this client's next reads skip the replica.
+    read_router.pin(response)
+    return response
+
+
+def _model_response(model: BaseModel) -> Response:
+    # Models built here are already valid. Returning a Response skips
+    # FastAPI's response_model revalidation and jsonable_encoder pass, and
+    # pydantic-core writes the JSON directly.
+    return Response(content=model.model_dump_json(), media_type="application/json")
+
+
+async def _record_vote(
+    session: AsyncSession, redis: Redis, poll_id: int, payload: VoteRequest
+) -> VoteResponse:
+    poll = await poll_cache.get(session, redis, poll_id)
     if not poll:
         raise HTTPException(status_code=404, detail="Poll not found")
 
     if not poll.is_active:
         raise HTTPException(status_code=400, detail="Poll is not active")
 
-    option = await session.get(PollOption, payload.optionId)
-    if not option or option.poll_id != poll_id:
+    if not poll.has_option(payload.optionId):
         raise HTTPException(status_code=404, detail="Option not found")
 
     voter_token = payload.voterToken or str(uuid.uuid4())
-    existing_vote_result = await session.execute(
-        select(Vote).where(Vote.poll_id == poll_id, Vote.voter_token == voter_token)
-    )
-    existing_vote = existing_vote_result.scalar_one_or_none()
-
-    action = "created"
-    vote_id = None
-    previous_option_id = None
 
-    if existing_vote is None:
-        new_vote = Vote(
-            poll_id=poll_id, option_id=payload.optionId, voter_token=voter_token
-        )
-        session.add(new_vote)
-        await session.commit()
-        await session.refresh(new_vote)
-        vote_id = new_vote.id
-        action = "created"
+    sharded = poll.counter_shards > 1
+    if VOTE_WRITE_BEHIND:
+        # Unsharded counters are applied by the record script; the DB write
+        # happens later in the VoteWriter batch.
+        vote_id = None
+        counter_keys = [] if sharded else [*redis_keys(poll_id), results_version_key(poll_id)]
+        try:
+            with timed("redis"):
+                action, previous_option_id = await app.state.vote_writer.record(
+                    session,
+                    poll_id=poll_id,
+                    option_id=payload.optionId,
+                    voter_token=voter_token,
+                    counter_keys=counter_keys,
+                )
+        except VoteQueueFull:
+            raise HTTPException(status_code=503, detail="Vote queue is full")
     else:
-        previous_option_id = existing_vote.option_id
-        if existing_vote.option_id == payload.optionId:
-            await session.delete(existing_vote)
-            await session.commit()
-            action = "canceled"
-        else:
-            existing_vote.option_id = payload.optionId
-            await session.commit()
-            vote_id = existing_vote.id
-            action = "updated"
-
-    redis: Redis = get_redis(app)
-    total_key, options_key = _redis_keys(poll_id)
-    cache_ready = await redis.exists(options_key, total_key) == 2
-    if cache_ready:
-        await _update_redis_counts(
-            redis=redis,
-            poll_id=poll_id,
-            action=action,
-            option_id=payload.optionId,
-            previous_option_id=previous_option_id,
-        )
-
-    results = await _get_results(session, redis, poll_id)
-    await manager.broadcast(
-        poll_id,
-        {
-            "type": "poll_results_updated",
-            "pollId": poll_id,
-            "totalVotes": results.totalVotes,
-            "results": [item.model_dump() for item in results.results],
-        },
-    )
+        with timed("db"):
+            action, vote_id, previous_option_id = await apply_vote(
+                session, poll_id, payload.optionId, voter_token
+            )
+
+    if sharded or not VOTE_WRITE_BEHIND:
+        with timed("redis"):
+            await _update_redis_counts(
+                redis=redis,
+                poll=poll,
+                voter_token=voter_token,
+                action=action,
+                option_id=payload.optionId,
+                previous_option_id=previous_option_id,
+            )
+
+    manager.schedule(poll_id, lambda: _results_payload(poll_id))
 
     return VoteResponse(
         voteId=vote_id,
@@ -179,83 +617,279 @@ async def vote(
     )
 
 
+async def _results_payload(poll_id: int) -> dict:
+    async with read_router.session() as session:
+        results = await _get_results(session, get_redis(app), poll_id)
+    return {
+        "type": "poll_results_updated",
+        "pollId": poll_id,
+        "totalVotes": results.totalVotes,
+        "results": [item.model_dump() for item in results.results],
+    }
 
 
 @app.websocket("/ws/polls/{poll_id}")
-async def poll_ws(websocket: WebSocket, poll_id: int):
-    await manager.connect(poll_id, websocket)
+async def poll_ws(websocket: WebSocket, poll_id: int, protocol: int = 1):
+    delta = protocol >= DELTA_PROTOCOL
+    if delta:
+        accepted = await manager.connect_delta(
+            poll_id, websocket, lambda: _results_payload(poll_id)
+        )
+    else:
+        accepted = await manager.connect(poll_id, websocket)
+    if not accepted:
+        return
+    # Outbound frames go through the manager's per-socket queue; this loop
+    # only notices disconnects and client messages (pong, resync).
     try:
-        while True:
-            await websocket.receive_text()
+        # The manager may close the socket (eviction) while we wait here.
+        while websocket.application_state is WebSocketState.CONNECTED:
+            message = await websocket.receive_text()
+            manager.touch(poll_id, websocket)
+            if delta and _is_resync(message):
+                manager.resync(poll_id, websocket)
     except WebSocketDisconnect:
+        pass
+    finally:
         manager.disconnect(poll_id, websocket)
 
 
-async def _update_redis_counts(
-    *,
-    redis: Redis,
-    poll_id: int,
-    action: str,
-    option_id: int,
-    previous_option_id: int | None,
-) -> None:
-    total_key, options_key = _redis_keys(poll_id)
+def _is_resync(message: str) -> bool:
+    try:
+        return json.loads(message).get("type") == "resync"
+    except (ValueError, AttributeError):
+        return False
 
-    if action == "created":
-        await redis.hincrby(options_key, str(option_id), 1)
-        await redis.incr(total_key)
-        return
 
-    if action == "updated" and previous_option_id is not None:
-        await redis.hincrby(options_key, str(previous_option_id), -1)
-        await redis.hincrby(options_key, str(option_id), 1)
-        return
+async def _results_snapshot(
+    session: AsyncSession, redis: Redis, poll_id: int
+) -> tuple[str | None, bytes]:
+    poll = await poll_cache.get(session, redis, poll_id)
+    if poll is None:
+        with timed("serialize"):
+            return None, _results_from_counts(poll_id, (), {}, 0).model_dump_json().encode()
+    return (await _results_snapshots(session, redis, [poll]))[0]
+
+
+async def _results_snapshots(
+    session: AsyncSession, redis: Redis, polls: list[PollMeta]
+) -> list[tuple[str | None, bytes]]:
+    snapshots = []
+    for poll, (version, counts, total_votes) in zip(
+        polls, await _read_counters(redis, polls)
+    ):
+        body = (
+            results_snapshots.get(poll.id, version, poll.options)
+            if version is not None
+            else None
+        )
+        if body is None:
+            if counts is None:
+                # Counters not built yet. The rebuild replaces the version, so
+                # this body is not stored under the one read above.
+                version = None
+                results = await _rebuild_results(session, redis, poll)
+            else:
+                results = _results_from_counts(poll.id, poll.options, counts, total_votes)
+            with timed("serialize"):
+                body = results.model_dump_json().encode()
+            if version is not None:
+                results_snapshots.put(poll.id, version, poll.options, body)
+        snapshots.append((version, body))
+    return snapshots
+
+
+async def _read_counters(
+    redis: Redis, polls: list[PollMeta]
+) -> list[tuple[str | None, dict[str, int] | None, int]]:
+    with timed("redis"):
+        counters = await read_counters(
+            redis, [(poll.id, poll.counter_shards) for poll in polls]
+        )
+    for _, counts, _ in counters:
+        count_results_cache(counts is not None)
+    return counters
 
-    if action == "canceled" and previous_option_id is not None:
-        await redis.hincrby(options_key, str(previous_option_id), -1)
-        await redis.decr(total_key)
+
+async def _rebuild_results(
+    session: AsyncSession, redis: Redis, poll: PollMeta
+) -> ResultsResponse:
+    # Hand the caller's connection back before waiting: the single-flight
+    # leader (often the broadcast flusher) needs one from the same pool, and
+    # every waiter holding its own would starve it. The session reconnects
+    # if the caller uses it again.
+    await session.close()
+    counts, total_votes = await count_rebuilds.do(
+        poll.id,
+        lambda: _rebuild_counts(redis, poll.id, poll.options, poll.counter_shards),
+    )
+    return _results_from_counts(poll.id, poll.options, counts, total_votes)
 
 
-async def _get_results(
-    session: AsyncSession, redis: Redis, poll_id: int
+def _results_from_counts(
+    poll_id: int, options, counts: dict[str, int], total_votes: int
 ) -> ResultsResponse:
-    options_result = await session.execute(
-        select(PollOption)
-        .where(PollOption.poll_id == poll_id)
-        .order_by(PollOption.sort_order, PollOption.id)
+    return ResultsResponse(
+        pollId=poll_id,
+        totalVotes=total_votes,
+        results=[
+            ResultItem(
+                optionId=option.id,
+                label=option.label,
+                count=counts.get(str(option.id), 0),
+            )
+            for option in options
+        ],
     )
-    options = options_result.scalars().all()
 
-    total_key, options_key = _redis_keys(poll_id)
-    cache_ready = await redis.exists(options_key, total_key) == 2
 
-    if not cache_ready:
-        counts_result = await session.execute(
-            select(Vote.option_id, func.count(Vote.id))
-            .where(Vote.poll_id == poll_id)
-            .group_by(Vote.option_id)
+async def _update_redis_counts(
+    *,
+    redis: Redis,
+    poll: PollMeta,
+    voter_token: str,
+    action: str,
+    option_id: int,
+    previous_option_id: int | None,
+) -> bool:
+    # Single EVALSHA round trip; the script skips the update when the cache
+    # has not been built yet so _get_results rebuilds it from the DB.
+    args = [
+        action,
+        option_id,
+        previous_option_id if previous_option_id is not None else "",
+    ]
+    if poll.counter_shards > 1:
+        applied = await app.state.update_shard_counts_script(
+            keys=[shard_for(poll.id, poll.counter_shards, voter_token)],
+            args=args,
+            client=redis,
         )
-        counts = {str(row[0]): int(row[1]) for row in counts_result.all()}
-        total_votes = sum(counts.values())
-
+    else:
+        total_key, options_key = redis_keys(poll.id)
+        applied = await app.state.update_counts_script(
+            keys=[total_key, options_key, results_version_key(poll.id)],
+            args=args,
+            client=redis,
+        )
+    return bool(applied)
+
+
+async def _rebuild_counts(
+    redis: Redis, poll_id: int, options, shards: int = 1
+) -> tuple[dict[str, int], int]:
+    # Callers in this worker share one rebuild through count_rebuilds; the
+    # Redis lock keeps other workers from running the same GROUP BY at once.
+    # No DB connection is held while waiting for the lock.
+    total_key, options_key = redis_keys(poll_id)
+    lock = redis.lock(
+        f"poll:{poll_id}:rebuild_lock",
+        timeout=REBUILD_LOCK_TIMEOUT,
+        blocking_timeout=REBUILD_LOCK_TIMEOUT,
+    )
+    with timed("redis"):
+        acquired = await lock.acquire()
+    try:
+        if acquired and shards > 1:
+            with timed("redis"):
+                cached = await read_shards(
+                    redis, poll_id, shards, results_version_key(poll_id)
+                )
+            if cached is not None:
+                return cached[1], cached[2]
+        elif acquired:
+            with timed("redis"):
+                async with redis.pipeline(transaction=True) as pipe:
+                    cached_counts, cached_total = await (
+                        pipe.hgetall(options_key).get(total_key).execute()
+                    )
+            if cached_total is not None:
+                counts = {str(k): int(v) for k, v in cached_counts.items()}
+                return counts, int(cached_total)
+
+        counts = None
+        if VOTE_WRITE_BEHIND:
+            with timed("redis"):
+                counts = await app.state.vote_writer.count_votes(poll_id)
+        if counts is None:
+            # Always from the primary: later votes are applied on top of what
+            # is written to Redis, so replica lag here would stay in the
+            # counters. A short-lived session keeps the connection only for
+            # this query.
+            with timed("db"):
+                async with AsyncSessionLocal() as primary:
+                    counts = (await _stored_counts(primary, [poll_id])).get(poll_id, {})
         full_counts = {
             str(option.id): counts.get(str(option.id), 0) for option in options
         }
-        await redis.hset(options_key, mapping=full_counts)
-        await redis.set(total_key, total_votes)
-    else:
-        cached_counts = await redis.hgetall(options_key)
-        cached_total = await redis.get(total_key)
-        counts = {str(k): int(v) for k, v in cached_counts.items()}
-        total_votes = int(cached_total) if cached_total is not None else 0
-
-    results = [
-        ResultItem(
-            optionId=option.id,
-            label=option.label,
-            count=counts.get(str(option.id), 0),
-        )
-        for option in options
-    ]
+        total_votes = sum(full_counts.values())
+        if not acquired:
+            # Another worker is still rebuilding; answer without writing.
+            return full_counts, total_votes
+
+        with timed("redis"):
+            await write_counters(redis, poll_id, shards, full_counts, total_votes)
+        return full_counts, total_votes
+    finally:
+        if acquired:
+            try:
+                await lock.release()
+            except LockError:
+                pass
+
+
+async def _stored_counts(
+    session: AsyncSession, poll_ids: list[int]
+) -> dict[int, dict[str, int]]:
+    # O(options) read of the maintained counters instead of a COUNT(*) over
+    # every vote of the polls.
+    rows = await session.execute(
+        select(
+            PollOptionCount.poll_id,
+            PollOptionCount.option_id,
+            PollOptionCount.vote_count,
+        ).where(PollOptionCount.poll_id.in_(poll_ids))
+    )
+    counts: dict[int, dict[str, int]] = {poll_id: {} for poll_id in poll_ids}
+    for poll_id, option_id, vote_count in rows.all():
+        counts[poll_id][str(option_id)] = int(vote_count)
+    return counts
+
+
+async def _reference_counts(
+    session: AsyncSession, poll_ids: list[int]
+) -> dict[int, dict[str, int]]:
+    # What the Redis counters should match. In write-behind mode the voters
+    # hash is ahead of the DB, so its tally is the reference; polls whose
+    # voters are not loaded, or were loaded without a tally, are left out
+    # rather than scanned.
+    if not VOTE_WRITE_BEHIND:
+        return await _stored_counts(session, poll_ids)
+    counts = {}
+    for poll_id in poll_ids:
+        voters = await app.state.vote_writer.count_votes(poll_id, scan=False)
+        if voters is not None:
+            counts[poll_id] = voters
+    return counts
+
+
+def _db_pool_busy() -> bool:
+    # Background work yields to requests once this share of the primary pool
+    # is checked out.
+    checkedout = getattr(engine.pool, "checkedout", None)
+    return (
+        checkedout is not None
+        and checkedout() >= RECONCILE_MAX_POOL_USAGE * pool_capacity()
+    )
+
 
-    return ResultsResponse(pollId=poll_id, totalVotes=total_votes, results=results)
+async def _get_results(
+    session: AsyncSession, redis: Redis, poll_id: int
+) -> ResultsResponse:
+    poll = await poll_cache.get(session, redis, poll_id)
+    if poll is None:
+        return _results_from_counts(poll_id, (), {}, 0)
+    ((_, counts, total_votes),) = await _read_counters(redis, [poll])
+    if counts is None:
+        return await _rebuild_results(session, redis, poll)
+    return _results_from_counts(poll.id, poll.options, counts, total_votes)
@@ -0,0 +1,288 @@
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Callable, Iterable, Iterator
+
+from app.config import METRICS_ENABLED
+
+LATENCY_BUCKETS = (
+    0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0,
+)
+
+ROUND_TRIP_BUCKETS = (0, 1, 2, 3, 4, 5, 6, 8, 10, 15, 20)
+
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+LabelValues = tuple[str, ...]
+
+
+def _format_labels(names: tuple[str, ...], values: LabelValues, extra: str = "") -> str:
+    pairs = [f'{name}="{value}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class Counter:
+    def __init__(self, name: str, help_text: str, labels: tuple[str, ...] = ()) -> None:
+        self.name = name
+        self.help_text = help_text
+        self.labels = labels
+        self._values: dict[LabelValues, float] = {}
+
+    def inc(self, *label_values: str, amount: float = 1) -> None:
+        self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def render(self) -> Iterator[str]:
+        yield f"# HELP {self.name} {self.help_text}"
+        yield f"# TYPE {self.name} counter"
+        for label_values, value in self._values.items():
+            yield f"{self.name}{_format_labels(self.labels, label_values)} {value}"
+
+
+class Histogram:
+    def __init__(
+        self,
+        name: str,
+        help_text: str,
+        labels: tuple[str, ...] = (),
+        buckets: tuple[float, ...] = LATENCY_BUCKETS,
+    ) -> None:
+        self.name = name
+        self.help_text = help_text
+        self.labels = labels
+        self.buckets = buckets
+        # label values -> [per-bucket counts..., +Inf count, sum]
+        self._series: dict[LabelValues, list[float]] = {}
+
+    def observe(self, value: float, *label_values: str) -> None:
+        series = self._series.get(label_values)
+        if series is None:
+            series = self._series[label_values] = [0] * (len(self.buckets) + 2)
+        series[bisect_left(self.buckets, value)] += 1
+        series[-1] += value
+
+    def render(self) -> Iterator[str]:
+        yield f"# HELP {self.name} {self.help_text}"
+        yield f"# TYPE {self.name} histogram"
+        for label_values, series in self._series.items():
+            cumulative = 0
+            for bound, count in zip(self.buckets, series):
+                cumulative += count
+                labels = _format_labels(self.labels, label_values, f'le="{bound}"')
+                yield f"{self.name}_bucket{labels} {cumulative}"
+            cumulative += series[len(self.buckets)]
+            labels = _format_labels(self.labels, label_values, 'le="+Inf"')
+            yield f"{self.name}_bucket{labels} {cumulative}"
+            plain = _format_labels(self.labels, label_values)
+            yield f"{self.name}_sum{plain} {series[-1]}"
+            yield f"{self.name}_count{plain} {cumulative}"
+
+
+class Gauge:
+    # Sampled at scrape time so the hot path pays nothing.
+    def __init__(
+        self,
+        name: str,
+        help_text: str,
+        labels: tuple[str, ...],
+        collect: Callable[[], Iterable[tuple[LabelValues, float]]],
+    ) -> None:
+        self.name = name
+        self.help_text = help_text
+        self.labels = labels
+        self._collect = collect
+
+    def render(self) -> Iterator[str]:
+        yield f"# HELP {self.name} {self.help_text}"
+        yield f"# TYPE {self.name} gauge"
+        for label_values, value in self._collect():
+            yield f"{self.name}{_format_labels(self.labels, label_values)} {value}"
+
+
+class Registry:
+    def __init__(self) -> None:
+        self._metrics: list[Counter | Histogram | Gauge] = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        lines: list[str] = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+stage_latency = registry.register(
+    Histogram(
+        "exodus_stage_latency_seconds",
+        "Latency of hot-path stages (db, redis, serialize, broadcast).",
+        labels=("stage",),
+    )
+)
+request_latency = registry.register(
+    Histogram(
+        "exodus_http_request_duration_seconds",
+        "HTTP request latency by route template.",
+        labels=("method", "route", "status"),
+    )
+)
+redis_round_trips = registry.register(
+    Histogram(
+        "exodus_redis_round_trips_per_request",
+        "Redis round trips (single commands, pipelines, scripts) per HTTP request.",
+        labels=("method", "route"),
+        buckets=ROUND_TRIP_BUCKETS,
+    )
+)
+results_cache = registry.register(
+    Counter(
+        "exodus_results_cache_total",
+        "Redis results counters found ready (hit) or rebuilt from the DB (miss).",
+        labels=("result",),
+    )
+)
+ws_evictions = registry.register(
+    Counter(
+        "exodus_ws_evictions_total",
+        "WebSockets closed by the server: stalled, gone, idle or over capacity.",
+        labels=("reason",),
+    )
+)
+ws_dropped_frames = registry.register(
+    Counter(
+        "exodus_ws_dropped_frames_total",
+        "Queued frames dropped for slow consumers in favour of the newest one.",
+    )
+)
+db_reads = registry.register(
+    Counter(
+        "exodus_db_read_sessions_total",
+        "Read-only request sessions by the database they were routed to.",
+        labels=("target",),
+    )
+)
+reconciled_polls = registry.register(
+    Counter(
+        "exodus_reconcile_polls_total",
+        "Polls checked by the counter reconciler: ok, repaired, busy, skipped or deferred.",
+        labels=("result",),
+    )
+)
+counter_drift = registry.register(
+    Counter(
+        "exodus_counter_drift_votes_total",
+        "Absolute vote difference between Redis and the DB repaired by the reconciler.",
+    )
+)
+
+
+# Round trips of the HTTP request being handled; None outside requests.
+_round_trips: ContextVar[list[int] | None] = ContextVar("redis_round_trips", default=None)
+
+
+def count_redis_round_trip() -> None:
+    trips = _round_trips.get()
+    if trips is not None:
+        trips[0] += 1
+
+
+@contextmanager
+def timed(stage: str) -> Iterator[None]:
+    if not METRICS_ENABLED:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        stage_latency.observe(time.perf_counter() - started, stage)
+
+
+def count_results_cache(hit: bool) -> None:
+    if METRICS_ENABLED:
+        results_cache.inc("hit" if hit else "miss")
+
+
+def count_ws_eviction(reason: str) -> None:
+    if METRICS_ENABLED:
+        ws_evictions.inc(reason)
+
+
+def count_ws_dropped_frames(frames: int) -> None:
+    if METRICS_ENABLED:
+        ws_dropped_frames.inc(amount=frames)
+
+
+def count_db_read(target: str) -> None:
+    if METRICS_ENABLED:
+        db_reads.inc(target)
+
+
+def count_reconcile(result: str, drift: int = 0) -> None:
+    if METRICS_ENABLED:
+        reconciled_polls.inc(result)
+        if drift:
+            counter_drift.inc(amount=drift)
+
+
+def pool_stats(pool, capacity: int) -> Iterator[tuple[LabelValues, float]]:
+    # QueuePool-style pools only; NullPool/StaticPool expose no counters.
+    for state in ("size", "checkedin", "checkedout", "overflow"):
+        stat = getattr(pool, state, None)
+        if stat is not None:
+            yield (state,), stat()
+    yield ("capacity",), capacity
+
+
+def redis_pool_stats(pool) -> Iterator[tuple[LabelValues, float]]:
+    yield ("in_use",), len(pool._in_use_connections)
+    yield ("available",), len(pool._available_connections)
+    yield ("capacity",), pool.max_connections
+
+
+def pool_saturation(db_pool, db_capacity: int, redis_pool) -> Iterator[tuple[LabelValues, float]]:
+    # Share of the pool's capacity checked out right now; 1.0 means callers
+    # are queueing for a connection.
+    checkedout = getattr(db_pool, "checkedout", None)
+    if checkedout is not None and db_capacity:
+        yield ("db",), checkedout() / db_capacity
+    if redis_pool.max_connections:
+        yield ("redis",), len(redis_pool._in_use_connections) / redis_pool.max_connections
+
+
+class MetricsMiddleware:
+    def __init__(self, app) -> None:
+        self.app = app
+
+    async def __call__(self, scope, receive, send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        status = "500"
+        trips = [0]
+        token = _round_trips.set(trips)
+
+        async def send_wrapper(message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = str(message["status"])
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _round_trips.reset(token)
+            route = scope.get("route")
+            path = route.path if route is not None else "unmatched"
+            request_latency.observe(
+                time.perf_counter() - started, scope["method"], path, status
+            )
+            redis_round_trips.observe(trips[0], scope["method"], path)
@@ -1,10 +1,15 @@
 from datetime import datetime
 
-from sqlalchemy import ForeignKey, Index, UniqueConstraint, func
+from sqlalchemy import ForeignKey, Index, Integer, UniqueConstraint, func
 from sqlalchemy.dialects.mysql import BIGINT, DATETIME, INTEGER, SMALLINT, TEXT, VARCHAR
 from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column, relationship
 
 
+# SQLite only auto-increments INTEGER PRIMARY KEY columns; the variant lets
+# the models run against the local SQLite stand-in used by app.bench.
+PrimaryKey = BIGINT(unsigned=True).with_variant(Integer(), "sqlite")
+
+
 class Base(DeclarativeBase):
     pass
 
@@ -12,10 +17,14 @@ class Base(DeclarativeBase):
 class Poll(Base):
     __tablename__ = "polls"
 
-    id: Mapped[int] = mapped_column(BIGINT(unsigned=True), primary_key=True)
+    id: Mapped[int] = mapped_column(PrimaryKey, primary_key=True)
     title: Mapped[str] = mapped_column(VARCHAR(200))
     description: Mapped[str | None] = mapped_column(TEXT, nullable=True)
     is_active: Mapped[int] = mapped_column(SMALLINT, default=1, nullable=False)
+    # Number of Redis counter shards; 1 keeps the single total/options keys.
+    counter_shards: Mapped[int] = mapped_column(
+        SMALLINT, default=1, server_default="1", nullable=False
+    )
     created_at: Mapped[datetime] = mapped_column(
         DATETIME, server_default=func.current_timestamp()
     )
@@ -30,14 +39,14 @@ class Poll(Base):
     )
 
     __table_args__ = (
-        Index("idx_polls_active", "is_active"),
+        Index("idx_polls_active_id", "is_active", "id"),
     )
 
 
 class PollOption(Base):
     __tablename__ = "poll_options"
 
-    id: Mapped[int] = mapped_column(BIGINT(unsigned=True), primary_key=True)
+    id: Mapped[int] = mapped_column(PrimaryKey, primary_key=True)
     poll_id: Mapped[int] = mapped_column(
         BIGINT(unsigned=True), ForeignKey("polls.id", ondelete="CASCADE")
     )
@@ -57,13 +66,13 @@ class PollOption(Base):
 class Vote(Base):
     __tablename__ = "votes"
 
-    id: Mapped[int] = mapped_column(BIGINT(unsigned=True), primary_key=True)
-    poll_id: Mapped[int] = mapped_column(
-        BIGINT(unsigned=True), ForeignKey("polls.id", ondelete="CASCADE")
-    )
-    option_id: Mapped[int] = mapped_column(
-        BIGINT(unsigned=True), ForeignKey("poll_options.id", ondelete="CASCADE")
-    )
+    # In MariaDB the table is partitioned by HASH(poll_id) (migration
+    # 0005_partition_votes): the primary key is (id, poll_id) and there are no
+    # foreign keys, so deleting a poll no longer deletes its votes. The model
+    # keeps the single-column key so the SQLite stand-in still auto-increments.
+    id: Mapped[int] = mapped_column(PrimaryKey, primary_key=True)
+    poll_id: Mapped[int] = mapped_column(BIGINT(unsigned=True))
+    option_id: Mapped[int] = mapped_column(BIGINT(unsigned=True))
     voter_token: Mapped[str] = mapped_column(VARCHAR(36), nullable=False)
     created_at: Mapped[datetime] = mapped_column(
         DATETIME, server_default=func.current_timestamp()
@@ -71,6 +80,64 @@ class Vote(Base):
 
     __table_args__ = (
         UniqueConstraint("poll_id", "voter_token", name="uniq_vote_per_poll"),
-        Index("idx_votes_poll", "poll_id"),
-        Index("idx_votes_option", "option_id"),
+        Index("idx_votes_poll_option", "poll_id", "option_id"),
+    )
+
+
+class PollOptionCount(Base):
+    __tablename__ = "poll_option_counts"
+
+    option_id: Mapped[int] = mapped_column(
+        BIGINT(unsigned=True),
+        ForeignKey("poll_options.id", ondelete="CASCADE"),
+        primary_key=True,
+    )
+    poll_id: Mapped[int] = mapped_column(
+        BIGINT(unsigned=True), ForeignKey("polls.id", ondelete="CASCADE")
+    )
+    vote_count: Mapped[int] = mapped_column(BIGINT, default=0, nullable=False)
+
+    __table_args__ = (
+        Index("idx_poll_option_counts_poll", "poll_id"),
     )
+
+
+class VoteWriterOffset(Base):
+    # Last stream entry the write-behind VoteWriter applied, written in the
+    # same transaction as the batch so a replayed batch is skipped.
+    __tablename__ = "vote_writer_offsets"
+
+    stream: Mapped[str] = mapped_column(VARCHAR(64), primary_key=True)
+    last_entry_id: Mapped[str] = mapped_column(VARCHAR(32), nullable=False)
+
+
+class PollArchive(Base):
+    # Closed polls whose votes were moved to votes_archive; their per-option
+    # counts stay in poll_option_counts.
+    __tablename__ = "poll_archives"
+
+    poll_id: Mapped[int] = mapped_column(
+        BIGINT(unsigned=True),
+        ForeignKey("polls.id", ondelete="CASCADE"),
+        primary_key=True,
+    )
+    total_votes: Mapped[int] = mapped_column(BIGINT, default=0, nullable=False)
+    archived_at: Mapped[datetime] = mapped_column(
+        DATETIME, server_default=func.current_timestamp()
+    )
+
+
+class VoteArchive(Base):
+    __tablename__ = "votes_archive"
+
+    poll_id: Mapped[int] = mapped_column(
+        BIGINT(unsigned=True), primary_key=True, autoincrement=False
+    )
+    id: Mapped[int] = mapped_column(
+        BIGINT(unsigned=True), primary_key=True, autoincrement=False
+    )
+    option_id: Mapped[int] = mapped_column(BIGINT(unsigned=True))
+    voter_token: Mapped[str] = mapped_column(VARCHAR(36), nullable=False)
+    created_at: Mapped[datetime] = mapped_column(DATETIME)
+
+    __table_args__ = ({"mysql_row_format": "COMPRESSED"},)
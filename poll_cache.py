@@ -0,0 +1,230 @@
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+
+from redis.asyncio import Redis
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.counters import results_version_key
+from app.metrics import timed
+from app.models import Poll, PollOption
+
+ACTIVE_POLL_KEY = "polls:active"
+
+
+@dataclass(frozen=True)
+class OptionMeta:
+    id: int
+    label: str
+
+
+@dataclass(frozen=True)
+class PollMeta:
+    id: int
+    title: str
+    description: str | None
+    is_active: bool
+    counter_shards: int
+    options: tuple[OptionMeta, ...]
+
+    def has_option(self, option_id: int) -> bool:
+        return any(option.id == option_id for option in self.options)
+
+
+@dataclass
+class _Entry:
+    meta: PollMeta
+    version: str | None
+    expires_at: float
+    checked_at: float
+
+
+def _version_key(poll_id: int) -> str:
+    return f"poll:{poll_id}:meta_version"
+
+
+class PollCache:
+    def __init__(self, max_size: int, ttl: float, version_check_interval: float) -> None:
+        self._entries: OrderedDict[int, _Entry] = OrderedDict()
+        self._max_size = max_size
+        self._ttl = ttl
+        self._version_check_interval = version_check_interval
+        self.hits = 0
+        self.misses = 0
+
+    async def get(
+        self, session: AsyncSession, redis: Redis, poll_id: int
+    ) -> PollMeta | None:
+        now = time.monotonic()
+        entry = self._entries.get(poll_id)
+        if entry is not None and entry.expires_at > now:
+            if now - entry.checked_at < self._version_check_interval:
+                return self._hit(poll_id, entry)
+            # Other workers bump the version key when they invalidate a poll.
+            if await redis.get(_version_key(poll_id)) == entry.version:
+                entry.checked_at = now
+                return self._hit(poll_id, entry)
+
+        self.misses += 1
+        version = await redis.get(_version_key(poll_id))
+        meta = (await self._load(session, [poll_id])).get(poll_id)
+        self._store(poll_id, meta, version, now)
+        return meta
+
+    async def get_many(
+        self, session: AsyncSession, redis: Redis, poll_ids: list[int]
+    ) -> dict[int, PollMeta]:
+        # Same rules as get(), batched: one MGET for the version keys and one
+        # SQL query for every poll that is not cached.
+        now = time.monotonic()
+        found: dict[int, PollMeta] = {}
+        unchecked: list[int] = []
+        for poll_id in dict.fromkeys(poll_ids):
+            entry = self._entries.get(poll_id)
+            if entry is not None and entry.expires_at > now and (
+                now - entry.checked_at < self._version_check_interval
+            ):
+                found[poll_id] = self._hit(poll_id, entry)
+            else:
+                unchecked.append(poll_id)
+        if not unchecked:
+            return found
+
+        versions = dict(
+            zip(unchecked, await redis.mget([_version_key(poll_id) for poll_id in unchecked]))
+        )
+        missing = []
+        for poll_id in unchecked:
+            entry = self._entries.get(poll_id)
+            if (
+                entry is not None
+                and entry.expires_at > now
+                and entry.version == versions[poll_id]
+            ):
+                entry.checked_at = now
+                found[poll_id] = self._hit(poll_id, entry)
+            else:
+                missing.append(poll_id)
+        if not missing:
+            return found
+
+        self.misses += len(missing)
+        loaded = await self._load(session, missing)
+        for poll_id in missing:
+            meta = loaded.get(poll_id)
+            self._store(poll_id, meta, versions[poll_id], now)
+            if meta is not None:
+                found[poll_id] = meta
+        return found
+
+    def _store(
+        self, poll_id: int, meta: PollMeta | None, version: str | None, now: float
+    ) -> None:
+        if meta is None:
+            self._entries.pop(poll_id, None)
+            return
+        self._entries[poll_id] = _Entry(meta, version, now + self._ttl, now)
+        self._entries.move_to_end(poll_id)
+        while len(self._entries) > self._max_size:
+            self._entries.popitem(last=False)
+
+    def _hit(self, poll_id: int, entry: _Entry) -> PollMeta:
+        self.hits += 1
+        self._entries.move_to_end(poll_id)
+        return entry.meta
+
+    async def _load(
+        self, session: AsyncSession, poll_ids: list[int]
+    ) -> dict[int, PollMeta]:
+        # One round trip: the poll rows joined with their options.
+        with timed("db"):
+            rows = (
+                await session.execute(
+                    select(
+                        Poll.id,
+                        Poll.title,
+                        Poll.description,
+                        Poll.is_active,
+                        Poll.counter_shards,
+                        PollOption.id.label("option_id"),
+                        PollOption.label,
+                    )
+                    .outerjoin(PollOption, PollOption.poll_id == Poll.id)
+                    .where(Poll.id.in_(poll_ids))
+                    .order_by(Poll.id, PollOption.sort_order, PollOption.id)
+                )
+            ).all()
+        grouped: dict[int, list] = {}
+        for row in rows:
+            grouped.setdefault(row.id, []).append(row)
+        return {
+            poll_id: PollMeta(
+                id=poll_id,
+                title=poll_rows[0].title,
+                description=poll_rows[0].description,
+                is_active=bool(poll_rows[0].is_active),
+                counter_shards=max(1, poll_rows[0].counter_shards),
+                options=tuple(
+                    OptionMeta(id=row.option_id, label=row.label)
+                    for row in poll_rows
+                    if row.option_id is not None
+                ),
+            )
+            for poll_id, poll_rows in grouped.items()
+        }
+
+    def discard(self, poll_id: int) -> None:
+        self._entries.pop(poll_id, None)
+
+    async def invalidate(self, redis: Redis, poll_id: int) -> None:
+        # Titles and labels are part of the serialized results, so the
+        # results version moves too and snapshots and ETags built from the
+        # old metadata stop matching. Other workers may rebuild a snapshot
+        # from their cached metadata until their next version check.
+        self.discard(poll_id)
+        async with redis.pipeline(transaction=False) as pipe:
+            pipe.incr(_version_key(poll_id))
+            pipe.incr(results_version_key(poll_id))
+            await pipe.execute()
+
+    def stats(self) -> dict[str, int]:
+        return {"hits": self.hits, "misses": self.misses, "size": len(self._entries)}
+
+
+class ActivePollPointer:
+    # Newest active poll id, cached in Redis for all workers and in process
+    # memory between refreshes. "0" in Redis means no active poll and expires
+    # after none_redis_ttl. Paths that create or activate polls invalidate it.
+    def __init__(self, refresh_interval: float, redis_ttl: int, none_redis_ttl: int) -> None:
+        self._refresh_interval = refresh_interval
+        self._redis_ttl = redis_ttl
+        self._none_redis_ttl = none_redis_ttl
+        self._poll_id: int | None = None
+        self._checked_at = float("-inf")
+
+    async def get(self, session: AsyncSession, redis: Redis) -> int | None:
+        now = time.monotonic()
+        if now - self._checked_at < self._refresh_interval:
+            return self._poll_id
+
+        value = await redis.get(ACTIVE_POLL_KEY)
+        if value is None:
+            poll_result = await session.execute(
+                select(Poll.id)
+                .where(Poll.is_active == 1)
+                .order_by(Poll.id.desc())
+                .limit(1)
+            )
+            poll_id = poll_result.scalar_one_or_none()
+            value = str(poll_id or 0)
+            ttl = self._redis_ttl if poll_id else self._none_redis_ttl
+            await redis.set(ACTIVE_POLL_KEY, value, ex=ttl)
+
+        self._poll_id = int(value) or None
+        self._checked_at = now
+        return self._poll_id
+
+    async def invalidate(self, redis: Redis) -> None:
+        self._checked_at = float("-inf")
+        await redis.delete(ACTIVE_POLL_KEY)
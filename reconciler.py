@@ -0,0 +1,214 @@
+import asyncio
+import logging
+from typing import Awaitable, Callable
+
+from redis.asyncio import Redis
+from redis.commands.core import AsyncScript
+from redis.exceptions import LockError
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from app.counters import read_counters, redis_keys, results_version_key, shard_key
+from app.metrics import count_reconcile
+from app.models import Poll
+from app.poll_cache import PollCache, PollMeta
+
+logger = logging.getLogger(__name__)
+
+LEASE_KEY = "counters:reconcile:lease"
+
+ReferenceCounts = Callable[[AsyncSession, list[int]], Awaitable[dict[int, dict[str, int]]]]
+
+
+class CounterReconciler:
+    # Compares the Redis counters of active polls with their reference counts
+    # (poll_option_counts, or the voters hash in write-behind mode) and repairs
+    # drift a chunk of polls at a time. One worker runs a pass per interval.
+    #
+    # Votes commit to the DB before they touch Redis, so a difference can just
+    # be a vote in flight. A poll is only repaired when its results version
+    # did not move from before the DB read until settle seconds after it,
+    # which is far longer than that gap.
+    def __init__(
+        self,
+        redis: Redis,
+        sessions: async_sessionmaker,
+        poll_cache: PollCache,
+        reference_counts: ReferenceCounts,
+        adjust_script: AsyncScript,
+        adjust_shard_script: AsyncScript,
+        *,
+        interval: float,
+        chunk_size: int,
+        polls_per_second: float,
+        settle: float,
+        lock_timeout: float,
+        busy: Callable[[], bool],
+    ) -> None:
+        self._redis = redis
+        self._sessions = sessions
+        self._poll_cache = poll_cache
+        self._reference_counts = reference_counts
+        self._adjust_script = adjust_script
+        self._adjust_shard_script = adjust_shard_script
+        self._interval = interval
+        self._chunk_size = chunk_size
+        self._polls_per_second = polls_per_second
+        self._settle = settle
+        self._lock_timeout = lock_timeout
+        self._busy = busy
+        self._stopping = asyncio.Event()
+        self._task: asyncio.Task | None = None
+
+    def start(self) -> None:
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        self._stopping.set()
+        if self._task is not None:
+            await self._task
+
+    async def _run(self) -> None:
+        while not await self._sleep(self._interval):
+            try:
+                await self.run_pass()
+            except Exception:
+                logger.exception("counter reconciliation pass failed")
+
+    async def _sleep(self, seconds: float) -> bool:
+        # True once stop() was called.
+        try:
+            await asyncio.wait_for(self._stopping.wait(), seconds)
+        except asyncio.TimeoutError:
+            return False
+        return True
+
+    async def run_pass(self) -> None:
+        # The lease is kept (and extended while the pass runs) until it
+        # expires, so the other workers skip this interval.
+        lease = self._redis.lock(LEASE_KEY, timeout=max(self._interval, 1))
+        if not await lease.acquire(blocking=False):
+            return
+        last_id = 0
+        while not self._stopping.is_set():
+            if self._busy():
+                # Foreground traffic is using the DB pool; try next pass.
+                count_reconcile("deferred")
+                return
+            async with self._sessions() as session:
+                poll_ids = list(
+                    (
+                        await session.execute(
+                            select(Poll.id)
+                            .where(Poll.is_active == 1, Poll.id > last_id)
+                            .order_by(Poll.id)
+                            .limit(self._chunk_size)
+                        )
+                    ).scalars()
+                )
+                if not poll_ids:
+                    return
+                last_id = poll_ids[-1]
+                polls = await self._poll_cache.get_many(session, self._redis, poll_ids)
+            await self._reconcile_chunk([polls[poll_id] for poll_id in poll_ids if poll_id in polls])
+            try:
+                await lease.extend(max(self._interval, 1), replace_ttl=True)
+            except LockError:
+                return
+            if self._polls_per_second > 0 and await self._sleep(
+                len(poll_ids) / self._polls_per_second
+            ):
+                return
+
+    async def _reconcile_chunk(self, polls: list[PollMeta]) -> None:
+        keys = [(poll.id, poll.counter_shards) for poll in polls]
+        before = await read_counters(self._redis, keys)
+        # The session is closed before settling so it does not hold a pooled
+        # connection while waiting.
+        async with self._sessions() as session:
+            reference = await self._reference_counts(session, [poll.id for poll in polls])
+
+        drifted = []
+        for poll, (version, counts, total) in zip(polls, before):
+            if counts is None or poll.id not in reference:
+                # Not built (the next read rebuilds it) or no reference yet.
+                count_reconcile("skipped")
+                continue
+            if _drift(poll, reference[poll.id], counts, total) is None:
+                count_reconcile("ok")
+            else:
+                drifted.append((poll, version))
+        if not drifted:
+            return
+
+        await asyncio.sleep(self._settle)
+        for poll, version in drifted:
+            await self._repair(poll, version, reference[poll.id])
+
+    async def _repair(
+        self, poll: PollMeta, version: str | None, reference: dict[str, int]
+    ) -> None:
+        # The rebuild lock keeps a concurrent rebuild from rewriting the
+        # counters between the check and the adjustment.
+        lock = self._redis.lock(f"poll:{poll.id}:rebuild_lock", timeout=self._lock_timeout)
+        if not await lock.acquire(blocking=False):
+            count_reconcile("busy")
+            return
+        try:
+            ((current, counts, total),) = await read_counters(
+                self._redis, [(poll.id, poll.counter_shards)]
+            )
+            if counts is None or current != version:
+                count_reconcile("busy")
+                return
+            drift = _drift(poll, reference, counts, total)
+            if drift is None:
+                count_reconcile("ok")
+                return
+            deltas, total_delta = drift
+            pairs = [value for item in deltas.items() for value in item]
+            if poll.counter_shards > 1:
+                applied = await self._adjust_shard_script(
+                    keys=[shard_key(poll.id, 0)],
+                    args=[total_delta, *pairs],
+                    client=self._redis,
+                )
+            else:
+                applied = await self._adjust_script(
+                    keys=[*redis_keys(poll.id), results_version_key(poll.id)],
+                    args=[version or "", total_delta, *pairs],
+                    client=self._redis,
+                )
+            if not applied:
+                count_reconcile("busy")
+                return
+            count_reconcile(
+                "repaired", sum(map(abs, deltas.values())) + abs(total_delta)
+            )
+            logger.warning(
+                "repaired counter drift of poll %s: options %s, total %+d",
+                poll.id, deltas, total_delta,
+            )
+        finally:
+            try:
+                await lock.release()
+            except LockError:
+                pass
+
+
+def _drift(
+    poll: PollMeta, reference: dict[str, int], counts: dict[str, int], total: int
+) -> tuple[dict[str, int], int] | None:
+    # Reference minus Redis per option and for the total; None when equal.
+    deltas = {}
+    expected_total = 0
+    for option in poll.options:
+        option_id = str(option.id)
+        expected = reference.get(option_id, 0)
+        expected_total += expected
+        if expected != counts.get(option_id, 0):
+            deltas[option_id] = expected - counts.get(option_id, 0)
+    total_delta = expected_total - total
+    if not deltas and not total_delta:
+        return None
+    return deltas, total_delta
@@ -1,7 +1,277 @@
-from redis.asyncio import Redis
+import asyncio
+from functools import lru_cache
 
-from app.config import REDIS_URL
+from redis._parsers import _AsyncHiredisParser, _AsyncRESP2Parser
+from redis.asyncio import BlockingConnectionPool, Redis
+from redis.commands.core import AsyncScript
+from redis.utils import HIREDIS_AVAILABLE
+
+from app.config import (
+    METRICS_ENABLED,
+    REDIS_HEALTH_CHECK_INTERVAL,
+    REDIS_HIREDIS,
+    REDIS_MAX_CONNECTIONS,
+    REDIS_POOL_TIMEOUT,
+    REDIS_URL,
+)
+from app.metrics import count_redis_round_trip
+
+_APPLY_COUNTS_LUA = """
+local function apply_counts(total_key, options_key, version_key, action, option_id, previous_option_id)
+  if redis.call("EXISTS", total_key, options_key) ~= 2 then
+    return 0
+  end
+  if action == "created" then
+    redis.call("HINCRBY", options_key, option_id, 1)
+    redis.call("INCR", total_key)
+  elseif action == "updated" and previous_option_id ~= "" then
+    redis.call("HINCRBY", options_key, previous_option_id, -1)
+    redis.call("HINCRBY", options_key, option_id, 1)
+  elseif action == "canceled" and previous_option_id ~= "" then
+    redis.call("HINCRBY", options_key, previous_option_id, -1)
+    redis.call("DECR", total_key)
+  end
+  redis.call("INCR", version_key)
+  return 1
+end
+"""
+
+# KEYS: total_key, options_key, results_version_key
+# ARGV: action, option_id, previous_option_id ("" when none)
+# Returns 0 when the cache is not built yet, 1 after the counters were applied.
+UPDATE_COUNTS_LUA = _APPLY_COUNTS_LUA + """
+return apply_counts(KEYS[1], KEYS[2], KEYS[3], ARGV[1], ARGV[2], ARGV[3])
+"""
+
+# KEYS: shard_key
+# ARGV: action, option_id, previous_option_id ("" when none)
+# A voter always maps to the same shard, so the previous option is decremented
+# where it was counted. _total and _version live next to the option fields so
+# the script touches a single key (and a single cluster slot).
+UPDATE_SHARD_COUNTS_LUA = """
+local key = KEYS[1]
+if redis.call("HEXISTS", key, "_version") == 0 then
+  return 0
+end
+local action, option_id, previous_option_id = ARGV[1], ARGV[2], ARGV[3]
+if action == "created" then
+  redis.call("HINCRBY", key, option_id, 1)
+  redis.call("HINCRBY", key, "_total", 1)
+elseif action == "updated" and previous_option_id ~= "" then
+  redis.call("HINCRBY", key, previous_option_id, -1)
+  redis.call("HINCRBY", key, option_id, 1)
+elseif action == "canceled" and previous_option_id ~= "" then
+  redis.call("HINCRBY", key, previous_option_id, -1)
+  redis.call("HINCRBY", key, "_total", -1)
+end
+redis.call("HINCRBY", key, "_version", 1)
+return 1
+"""
+
+# KEYS: total_key, options_key, results_version_key
+# ARGV: expected results version, total delta, then option_id/delta pairs
+# Drift repair: the deltas are only applied if nothing touched the counters
+# since they were read. Returns 1 when applied, 0 otherwise.
+ADJUST_COUNTS_LUA = """
+if redis.call("EXISTS", KEYS[1], KEYS[2]) ~= 2 then
+  return 0
+end
+if (redis.call("GET", KEYS[3]) or "") ~= ARGV[1] then
+  return 0
+end
+for i = 3, #ARGV, 2 do
+  redis.call("HINCRBY", KEYS[2], ARGV[i], ARGV[i + 1])
+end
+redis.call("INCRBY", KEYS[1], ARGV[2])
+redis.call("INCR", KEYS[3])
+return 1
+"""
+
+# KEYS: shard 0 key
+# ARGV: total delta, then option_id/delta pairs
+# Sharded drift repair. The version spans several cluster slots, so it cannot
+# be checked here; callers hold the poll's rebuild lock instead, and the
+# deltas commute with concurrent votes.
+ADJUST_SHARD_COUNTS_LUA = """
+local key = KEYS[1]
+if redis.call("HEXISTS", key, "_version") == 0 then
+  return 0
+end
+for i = 2, #ARGV, 2 do
+  redis.call("HINCRBY", key, ARGV[i], ARGV[i + 1])
+end
+redis.call("HINCRBY", key, "_total", ARGV[1])
+redis.call("HINCRBY", key, "_version", 1)
+return 1
+"""
+
+# KEYS: voters_key, voters_ready_key, stream_key, voters_counts_key[,
+#       total_key, options_key, results_version_key]
+# ARGV: poll_id, voter_token, option_id, max_pending
+# The counter keys are omitted for sharded polls, whose counters are updated
+# separately with UPDATE_SHARD_COUNTS_LUA. voters_counts_key tallies the
+# voters hash per option; it is kept only once the load has created it.
+# Returns {action, previous_option_id}; action is "not_ready" until the voters
+# hash was loaded from the DB and "busy" when the pending stream is full.
+RECORD_VOTE_LUA = _APPLY_COUNTS_LUA + """
+if redis.call("EXISTS", KEYS[2]) == 0 then
+  return {"not_ready", ""}
+end
+if redis.call("XLEN", KEYS[3]) >= tonumber(ARGV[4]) then
+  return {"busy", ""}
+end
+local tallied = redis.call("EXISTS", KEYS[4]) == 1
+local previous = redis.call("HGET", KEYS[1], ARGV[2])
+local action
+if not previous then
+  previous = ""
+  action = "created"
+  redis.call("HSET", KEYS[1], ARGV[2], ARGV[3])
+elseif previous == ARGV[3] then
+  action = "canceled"
+  redis.call("HDEL", KEYS[1], ARGV[2])
+else
+  action = "updated"
+  redis.call("HSET", KEYS[1], ARGV[2], ARGV[3])
+end
+if tallied then
+  if previous ~= "" then
+    redis.call("HINCRBY", KEYS[4], previous, -1)
+  end
+  if action ~= "canceled" then
+    redis.call("HINCRBY", KEYS[4], ARGV[3], 1)
+  end
+end
+redis.call(
+  "XADD", KEYS[3], "*",
+  "poll_id", ARGV[1], "voter_token", ARGV[2], "option_id", ARGV[3], "action", action,
+  "previous_option_id", previous
+)
+if #KEYS == 7 then
+  apply_counts(KEYS[5], KEYS[6], KEYS[7], action, ARGV[3], previous)
+end
+return {action, previous}
+"""
+
+
+# KEYS: bucket keys...[, idempotency_key]
+# ARGV: bucket_count, idempotency_ttl, fingerprint, then rate, burst per bucket
+# Returns {"replay", body}, {"in_progress", ""}, {"mismatch", ""},
+# {"limited", retry_after_ms} or {"ok", ""}. Buckets are only charged when
+# every one of them has a token, and an admitted request claims its
+# idempotency key in the same call.
+VOTE_GUARD_LUA = """
+local bucket_count = tonumber(ARGV[1])
+local idempotency_key = KEYS[bucket_count + 1]
+if idempotency_key then
+  local stored = redis.call("HMGET", idempotency_key, "fp", "body")
+  if stored[1] then
+    if stored[1] ~= ARGV[3] then
+      return {"mismatch", ""}
+    end
+    if stored[2] then
+      return {"replay", stored[2]}
+    end
+    return {"in_progress", ""}
+  end
+end
+
+local clock = redis.call("TIME")
+local now = tonumber(clock[1]) + tonumber(clock[2]) / 1000000
+local levels = {}
+for i = 1, bucket_count do
+  local rate = tonumber(ARGV[2 + i * 2])
+  local burst = tonumber(ARGV[3 + i * 2])
+  local state = redis.call("HMGET", KEYS[i], "tokens", "ts")
+  local tokens = tonumber(state[1]) or burst
+  local updated_at = tonumber(state[2]) or now
+  tokens = math.min(burst, tokens + math.max(0, now - updated_at) * rate)
+  if tokens < 1 then
+    return {"limited", tostring(math.ceil((1 - tokens) / rate * 1000))}
+  end
+  levels[i] = tokens
+end
+for i = 1, bucket_count do
+  local rate = tonumber(ARGV[2 + i * 2])
+  local burst = tonumber(ARGV[3 + i * 2])
+  redis.call("HSET", KEYS[i], "tokens", levels[i] - 1, "ts", now)
+  redis.call("PEXPIRE", KEYS[i], math.ceil(burst / rate * 1000) + 1000)
+end
+
+if idempotency_key then
+  redis.call("HSET", idempotency_key, "fp", ARGV[3])
+  redis.call("EXPIRE", idempotency_key, tonumber(ARGV[2]))
+end
+return {"ok", ""}
+"""
 
 
 def create_redis() -> Redis:
-    return Redis.from_url(REDIS_URL, decode_responses=True)
+    if REDIS_URL.startswith("fakeredis://"):
+        # In-memory stand-in for local benchmarks; needs fakeredis[lua].
+        import fakeredis
+
+        redis = fakeredis.FakeAsyncRedis(server=_fake_server(), decode_responses=True)
+        _count_round_trips(redis.connection_pool)
+        return redis
+    # A blocking pool makes bursts wait briefly for a free connection instead
+    # of failing with "Too many connections".
+    pool = BlockingConnectionPool.from_url(
+        REDIS_URL,
+        max_connections=REDIS_MAX_CONNECTIONS,
+        timeout=REDIS_POOL_TIMEOUT,
+        health_check_interval=REDIS_HEALTH_CHECK_INTERVAL,
+        parser_class=_parser_class(),
+        decode_responses=True,
+    )
+    _count_round_trips(pool)
+    return Redis.from_pool(pool)
+
+
+def _count_round_trips(pool) -> None:
+    # Single commands, scripts and whole pipelines each go out through one
+    # send_packed_command call, so counting those counts round trips.
+    if not METRICS_ENABLED:
+        return
+
+    class CountingConnection(pool.connection_class):
+        async def send_packed_command(self, command, check_health: bool = True) -> None:
+            count_redis_round_trip()
+            await super().send_packed_command(command, check_health)
+
+    pool.connection_class = CountingConnection
+
+
+def _parser_class():
+    # "auto" lets redis-py pick hiredis when the package is installed.
+    if REDIS_HIREDIS == "true":
+        if not HIREDIS_AVAILABLE:
+            raise RuntimeError("REDIS_HIREDIS=true but the hiredis package is not installed")
+        return _AsyncHiredisParser
+    if REDIS_HIREDIS == "false":
+        return _AsyncRESP2Parser
+    return _AsyncHiredisParser if HIREDIS_AVAILABLE else _AsyncRESP2Parser
+
+
+async def warm_up_redis(redis: Redis, connections: int) -> int:
+    pool = redis.connection_pool
+    connections = min(connections, pool.max_connections)
+    opened = await asyncio.gather(
+        *(pool.get_connection("PING") for _ in range(connections))
+    )
+    for connection in opened:
+        await pool.release(connection)
+    return connections
+
+
+@lru_cache(maxsize=1)
+def _fake_server():
+    import fakeredis
+
+    return fakeredis.FakeServer()
+
+
+async def register_script(redis: Redis, source: str) -> AsyncScript:
+    script = redis.register_script(source)
+    script.sha = await redis.script_load(source)
+    return script
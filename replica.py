@@ -0,0 +1,135 @@
+import asyncio
+import logging
+import time
+from contextlib import asynccontextmanager
+from typing import AsyncIterator
+
+from fastapi import Request, Response
+from sqlalchemy import text
+from sqlalchemy.exc import InterfaceError, OperationalError
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker
+
+from app.metrics import count_db_read
+
+logger = logging.getLogger(__name__)
+
+# Epoch second until which this client's reads go to the primary.
+PRIMARY_COOKIE = "read_primary_until"
+
+
+async def replication_lag(engine: AsyncEngine) -> float | None:
+    # Seconds the replica is behind the primary; None while replication is
+    # stopped. SQLite stand-ins have no replication and count as caught up.
+    async with engine.connect() as connection:
+        if engine.dialect.name not in ("mysql", "mariadb"):
+            await connection.execute(text("SELECT 1"))
+            return 0.0
+        status = (
+            await connection.execute(text("SHOW REPLICA STATUS"))
+        ).mappings().first()
+    if status is None:
+        # Not a replica itself, e.g. a proxy in front of a synchronous cluster.
+        return 0.0
+    lag = status.get("Seconds_Behind_Master", status.get("Seconds_Behind_Source"))
+    return None if lag is None else float(lag)
+
+
+class ReplicaRouter:
+    # Chooses the database for read-only requests: the replica while its last
+    # health check passed within max_lag, otherwise the primary. Clients that
+    # voted in the last read_your_writes seconds also read from the primary.
+    def __init__(
+        self,
+        primary: async_sessionmaker,
+        replica: AsyncEngine | None,
+        *,
+        max_lag: float,
+        check_interval: float,
+        read_your_writes: int,
+    ) -> None:
+        self._primary = primary
+        self._replica_engine = replica
+        self._replica = (
+            async_sessionmaker(replica, expire_on_commit=False)
+            if replica is not None
+            else None
+        )
+        self._max_lag = max_lag
+        self._check_interval = check_interval
+        self._read_your_writes = read_your_writes
+        self._stopping = asyncio.Event()
+        self._task: asyncio.Task | None = None
+        self.healthy = False
+        self.lag: float | None = None
+
+    @property
+    def enabled(self) -> bool:
+        return self._replica is not None
+
+    def _pinned(self, request: Request | None) -> bool:
+        if request is None:
+            return False
+        try:
+            return float(request.cookies.get(PRIMARY_COOKIE, 0)) > time.time()
+        except ValueError:
+            return False
+
+    @asynccontextmanager
+    async def session(self, request: Request | None = None) -> AsyncIterator[AsyncSession]:
+        use_replica = self.healthy and not self._pinned(request)
+        count_db_read("replica" if use_replica else "primary")
+        maker = self._replica if use_replica else self._primary
+        async with maker() as session:
+            try:
+                yield session
+            except (OperationalError, InterfaceError):
+                # Connection-level failure: stop routing to the replica until
+                # the next successful health check. This request still fails.
+                if use_replica and self.healthy:
+                    self.healthy = False
+                    logger.warning("replica failed; reading from the primary", exc_info=True)
+                raise
+
+    def pin(self, response: Response) -> None:
+        if self.enabled and self._read_your_writes > 0:
+            response.set_cookie(
+                PRIMARY_COOKIE,
+                str(int(time.time()) + self._read_your_writes),
+                max_age=self._read_your_writes,
+                httponly=True,
+            )
+
+    async def check(self) -> None:
+        try:
+            self.lag = await asyncio.wait_for(
+                replication_lag(self._replica_engine), max(self._check_interval, 1.0)
+            )
+        except Exception:
+            self.lag = None
+            if self.healthy:
+                logger.warning("replica health check failed", exc_info=True)
+        healthy = self.lag is not None and self.lag <= self._max_lag
+        if healthy != self.healthy:
+            logger.info("replica %s (lag=%s)", "in use" if healthy else "bypassed", self.lag)
+        self.healthy = healthy
+
+    async def start(self) -> None:
+        if not self.enabled:
+            return
+        await self.check()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        self._stopping.set()
+        if self._task is not None:
+            await self._task
+
+    async def _run(self) -> None:
+        while not self._stopping.is_set():
+            try:
+                await asyncio.wait_for(self._stopping.wait(), self._check_interval)
+            except asyncio.TimeoutError:
+                await self.check()
+
+    def stats(self) -> dict[str, float]:
+        return {"healthy": int(self.healthy), "lag_seconds": self.lag if self.lag is not None else -1}
@@ -1,6 +1,6 @@
 from typing import Literal
 
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 
 
 class PollOptionOut(BaseModel):
@@ -17,7 +17,8 @@ class PollOut(BaseModel):
 
 class VoteRequest(BaseModel):
     optionId: int
-    voterToken: str | None = None
+    # votes.voter_token is VARCHAR(36).
+    voterToken: str | None = Field(default=None, max_length=36)
 
 
 class VoteResponse(BaseModel):
@@ -38,3 +39,7 @@ class ResultsResponse(BaseModel):
     pollId: int
     totalVotes: int
     results: list[ResultItem]
+
+
+class MultiResultsResponse(BaseModel):
+    polls: list[ResultsResponse]
@@ -0,0 +1,146 @@
+import argparse
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import delete, exists, func, insert, or_, select
+
+from app.database import AsyncSessionLocal, engine
+from app.models import Poll, PollArchive, PollOption, Vote, VoteArchive
+from app.redis_client import create_redis
+from app.vote_writer import voter_keys
+from app.votes import set_option_counts
+
+ARCHIVED_COLUMNS = ("id", "poll_id", "option_id", "voter_token", "created_at")
+
+
+async def closed_polls(poll_ids: list[int], closed_for: float) -> list[int]:
+    # Only polls closed at least closed_for seconds ago, so votes accepted
+    # from a stale poll cache or still pending in the write-behind stream have
+    # landed. Polls whose archival was interrupted still have votes and are
+    # picked up again. updated_at holds the DB's CURRENT_TIMESTAMP, which is
+    # UTC on the MariaDB container and on SQLite, hence the naive UTC cutoff.
+    cutoff = datetime.now(timezone.utc).replace(tzinfo=None) - timedelta(seconds=closed_for)
+    async with AsyncSessionLocal() as session:
+        query = (
+            select(Poll.id)
+            .where(
+                Poll.is_active == 0,
+                Poll.updated_at <= cutoff,
+                or_(
+                    ~exists().where(PollArchive.poll_id == Poll.id),
+                    exists().where(Vote.poll_id == Poll.id),
+                ),
+            )
+            .order_by(Poll.id)
+        )
+        if poll_ids:
+            query = query.where(Poll.id.in_(poll_ids))
+        return list((await session.execute(query)).scalars())
+
+
+async def summarize(poll_id: int) -> int:
+    # Settles poll_option_counts from the votes (zeros included) before any
+    # vote moves; results are served from these counts from now on.
+    async with AsyncSessionLocal() as session:
+        total = (
+            await session.execute(
+                select(PollArchive.total_votes).where(PollArchive.poll_id == poll_id)
+            )
+        ).scalar_one_or_none()
+        if total is not None:
+            return total
+
+        option_ids = (
+            await session.execute(
+                select(PollOption.id).where(PollOption.poll_id == poll_id)
+            )
+        ).scalars().all()
+        counts = {option_id: 0 for option_id in option_ids}
+        result = await session.execute(
+            select(Vote.option_id, func.count())
+            .where(Vote.poll_id == poll_id)
+            .group_by(Vote.option_id)
+        )
+        for option_id, count in result.all():
+            counts[option_id] = count
+        if counts:
+            await session.execute(
+                set_option_counts(
+                    session.bind.dialect.name,
+                    [
+                        {"option_id": option_id, "poll_id": poll_id, "vote_count": count}
+                        for option_id, count in counts.items()
+                    ],
+                )
+            )
+        total = sum(counts.values())
+        session.add(PollArchive(poll_id=poll_id, total_votes=total))
+        await session.commit()
+    return total
+
+
+async def move_votes(poll_id: int, chunk_size: int) -> int:
+    # Each chunk is copied and deleted in one transaction, so a vote is in
+    # exactly one of the two tables; IGNORE makes a rerun after a crash safe.
+    moved = 0
+    while True:
+        async with AsyncSessionLocal() as session:
+            ids = (
+                await session.execute(
+                    select(Vote.id)
+                    .where(Vote.poll_id == poll_id)
+                    .order_by(Vote.id)
+                    .limit(chunk_size)
+                )
+            ).scalars().all()
+            if not ids:
+                return moved
+            chunk = (Vote.poll_id == poll_id, Vote.id <= ids[-1])
+            await session.execute(
+                insert(VoteArchive)
+                .from_select(
+                    ARCHIVED_COLUMNS,
+                    select(
+                        Vote.id, Vote.poll_id, Vote.option_id, Vote.voter_token, Vote.created_at
+                    ).where(*chunk),
+                )
+                .prefix_with("IGNORE", dialect="mysql")
+                .prefix_with("OR IGNORE", dialect="sqlite")
+            )
+            await session.execute(delete(Vote).where(*chunk))
+            await session.commit()
+        moved += len(ids)
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(
+        description=(
+            "Move the votes of closed polls (is_active = 0) to votes_archive and "
+            "keep only their per-option counts. Archived polls must not be reopened."
+        )
+    )
+    parser.add_argument("--poll-id", type=int, action="append", default=[])
+    parser.add_argument("--chunk-size", type=int, default=5000)
+    parser.add_argument(
+        "--closed-for",
+        type=float,
+        default=3600,
+        help="only polls closed at least this many seconds ago",
+    )
+    args = parser.parse_args()
+
+    redis = create_redis()
+    try:
+        for poll_id in await closed_polls(args.poll_id, args.closed_for):
+            total = await summarize(poll_id)
+            moved = await move_votes(poll_id, args.chunk_size)
+            # The write-behind voters hash is only needed while voting is open.
+            await redis.delete(*voter_keys(poll_id))
+            print(f"poll {poll_id}: {total} votes summarized, {moved} moved to votes_archive")
+    finally:
+        await redis.aclose()
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
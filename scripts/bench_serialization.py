@@ -0,0 +1,103 @@
+import asyncio
+import json
+import os
+import time
+
+import httpx
+import orjson
+from fastapi import FastAPI
+from fastapi.responses import Response
+
+from app.schemas import ResultItem, ResultsResponse, VoteResponse
+from app.ws import encode_frame
+
+REQUESTS = int(os.getenv("BENCH_REQUESTS", "5000"))
+OPTIONS = int(os.getenv("BENCH_OPTIONS", "20"))
+SOCKETS = int(os.getenv("BENCH_SOCKETS", "1000"))
+FRAMES = int(os.getenv("BENCH_FRAMES", "200"))
+
+VOTE = VoteResponse(
+    voteId=1,
+    pollId=1,
+    optionId=10,
+    voterToken="550e8400-e29b-41d4-a716-446655440000",
+    action="created",
+)
+RESULTS = ResultsResponse(
+    pollId=1,
+    totalVotes=OPTIONS * 1000,
+    results=[
+        ResultItem(optionId=index, label=f"선택지 {index}", count=1000)
+        for index in range(OPTIONS)
+    ],
+)
+
+# Same route bodies, served the old way (response_model revalidation +
+# stdlib JSON) and the new way (pre-serialized Response).
+before = FastAPI()
+after = FastAPI()
+
+
+@before.get("/vote", response_model=VoteResponse)
+async def vote_before():
+    return VOTE
+
+
+@before.get("/results", response_model=ResultsResponse)
+async def results_before():
+    return RESULTS
+
+
+@after.get("/vote", response_model=VoteResponse)
+async def vote_after():
+    return Response(content=VOTE.model_dump_json(), media_type="application/json")
+
+
+@after.get("/results", response_model=ResultsResponse)
+async def results_after():
+    return Response(content=RESULTS.model_dump_json(), media_type="application/json")
+
+
+async def cpu_per_request(app: FastAPI, path: str) -> float:
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        for _ in range(100):
+            await client.get(path)
+        started = time.process_time()
+        for _ in range(REQUESTS):
+            await client.get(path)
+        return (time.process_time() - started) / REQUESTS * 1_000_000
+
+
+def cpu_per_frame(encode) -> float:
+    payload = {"type": "poll_results_updated", **RESULTS.model_dump()}
+    started = time.process_time()
+    for _ in range(FRAMES):
+        encode(payload)
+    return (time.process_time() - started) / FRAMES * 1_000_000
+
+
+async def main() -> None:
+    for path in ("/vote", "/results"):
+        old = await cpu_per_request(before, path)
+        new = await cpu_per_request(after, path)
+        print(
+            f"{path:<10} before={old:.1f}us/request after={new:.1f}us/request "
+            f"saved={old - new:.1f}us ({(old - new) / old:.0%})"
+        )
+
+    # send_json re-encoded the frame for every socket; now it is encoded once.
+    per_socket = cpu_per_frame(
+        lambda payload: [json.dumps(payload, separators=(",", ":")) for _ in range(SOCKETS)]
+    )
+    once = cpu_per_frame(encode_frame)
+    print(
+        f"{'broadcast':<10} sockets={SOCKETS} options={OPTIONS} "
+        f"per-socket json={per_socket:.1f}us/frame once orjson={once:.1f}us/frame"
+    )
+    stdlib_once = cpu_per_frame(lambda payload: json.dumps(payload, separators=(",", ":")))
+    print(f"{'encode':<10} stdlib json={stdlib_once:.1f}us orjson={once:.1f}us per frame")
+    assert orjson.loads(encode_frame({"label": "선택지"})) == {"label": "선택지"}
+
+
+asyncio.run(main())
@@ -0,0 +1,83 @@
+import asyncio
+import os
+import statistics
+import time
+
+from redis.asyncio import Redis
+
+from app.redis_client import UPDATE_COUNTS_LUA, register_script
+
+REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+ITERATIONS = int(os.getenv("BENCH_ITERATIONS", "5000"))
+CONCURRENCY = int(os.getenv("BENCH_CONCURRENCY", "50"))
+POLL_ID = int(os.getenv("BENCH_POLL_ID", "999999"))
+
+TOTAL_KEY = f"poll:{POLL_ID}:total"
+OPTIONS_KEY = f"poll:{POLL_ID}:options"
+VERSION_KEY = f"poll:{POLL_ID}:results_version"
+ACTIONS = [("created", 1, None), ("updated", 2, 1), ("canceled", 2, 2)]
+
+
+async def legacy_update(redis: Redis, action: str, option_id: int, previous: int | None):
+    if await redis.exists(OPTIONS_KEY, TOTAL_KEY) != 2:
+        return
+    if action == "created":
+        await redis.hincrby(OPTIONS_KEY, str(option_id), 1)
+        await redis.incr(TOTAL_KEY)
+    elif action == "updated":
+        await redis.hincrby(OPTIONS_KEY, str(previous), -1)
+        await redis.hincrby(OPTIONS_KEY, str(option_id), 1)
+    elif action == "canceled":
+        await redis.hincrby(OPTIONS_KEY, str(previous), -1)
+        await redis.decr(TOTAL_KEY)
+
+
+async def run(name: str, update) -> None:
+    latencies: list[float] = []
+    semaphore = asyncio.Semaphore(CONCURRENCY)
+
+    async def one(i: int) -> None:
+        action, option_id, previous = ACTIONS[i % len(ACTIONS)]
+        async with semaphore:
+            started = time.perf_counter()
+            await update(action, option_id, previous)
+            latencies.append((time.perf_counter() - started) * 1000)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(ITERATIONS)))
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    p50 = statistics.median(latencies)
+    p99 = latencies[int(len(latencies) * 0.99) - 1]
+    print(
+        f"{name:<8} p50={p50:.3f}ms p99={p99:.3f}ms "
+        f"throughput={ITERATIONS / elapsed:.0f} ops/s"
+    )
+
+
+async def main() -> None:
+    redis = Redis.from_url(REDIS_URL, decode_responses=True)
+    script = await register_script(redis, UPDATE_COUNTS_LUA)
+
+    async def reset() -> None:
+        await redis.delete(TOTAL_KEY, OPTIONS_KEY)
+        await redis.hset(OPTIONS_KEY, mapping={"1": 0, "2": 0})
+        await redis.set(TOTAL_KEY, 0)
+
+    async def scripted_update(action: str, option_id: int, previous: int | None):
+        await script(
+            keys=[TOTAL_KEY, OPTIONS_KEY, VERSION_KEY],
+            args=[action, option_id, previous if previous is not None else ""],
+        )
+
+    await reset()
+    await run("before", lambda *a: legacy_update(redis, *a))
+    await reset()
+    await run("after", scripted_update)
+
+    await redis.delete(TOTAL_KEY, OPTIONS_KEY, VERSION_KEY)
+    await redis.close()
+
+
+asyncio.run(main())
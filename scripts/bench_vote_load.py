@@ -0,0 +1,52 @@
+import asyncio
+import os
+import random
+import statistics
+import time
+import uuid
+
+import httpx
+
+BASE_URL = os.getenv("BENCH_BASE_URL", "http://localhost:8000")
+POLL_ID = int(os.getenv("BENCH_POLL_ID", "1"))
+DURATION = float(os.getenv("BENCH_DURATION", "30"))
+CONCURRENCY = int(os.getenv("BENCH_CONCURRENCY", "100"))
+VOTERS = int(os.getenv("BENCH_VOTERS", "10000"))
+
+
+async def main() -> None:
+    limits = httpx.Limits(max_connections=CONCURRENCY)
+    async with httpx.AsyncClient(base_url=BASE_URL, limits=limits) as client:
+        poll = (await client.get(f"/polls/{POLL_ID}")).json()
+        option_ids = [option["id"] for option in poll["options"]]
+        tokens = [str(uuid.uuid4()) for _ in range(VOTERS)]
+
+        latencies: list[float] = []
+        statuses: dict[int, int] = {}
+        deadline = time.perf_counter() + DURATION
+
+        async def worker() -> None:
+            while time.perf_counter() < deadline:
+                body = {
+                    "optionId": random.choice(option_ids),
+                    "voterToken": random.choice(tokens),
+                }
+                started = time.perf_counter()
+                response = await client.post(f"/polls/{POLL_ID}/votes", json=body)
+                latencies.append((time.perf_counter() - started) * 1000)
+                statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(CONCURRENCY)))
+        elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    print(f"requests={len(latencies)} statuses={statuses}")
+    print(f"throughput={statuses.get(200, 0) / elapsed:.0f} votes/s")
+    print(
+        f"p50={statistics.median(latencies):.2f}ms "
+        f"p99={latencies[int(len(latencies) * 0.99) - 1]:.2f}ms"
+    )
+
+
+asyncio.run(main())
@@ -0,0 +1,102 @@
+import asyncio
+import os
+import statistics
+import time
+import uuid
+from collections import defaultdict
+
+from sqlalchemy import event, select
+
+from app.database import AsyncSessionLocal, engine
+from app.models import Poll, PollOption, Vote
+from app.votes import apply_vote
+
+POLL_ID = int(os.getenv("BENCH_POLL_ID", "1"))
+VOTERS = int(os.getenv("BENCH_VOTERS", "500"))
+
+round_trips = 0
+
+
+@event.listens_for(engine.sync_engine, "before_cursor_execute")
+def _count_statement(*args):
+    global round_trips
+    round_trips += 1
+
+
+@event.listens_for(engine.sync_engine, "commit")
+def _count_commit(*args):
+    global round_trips
+    round_trips += 1
+
+
+async def legacy_vote(session, poll_id: int, option_id: int, voter_token: str) -> str:
+    poll = await session.get(Poll, poll_id)
+    option = await session.get(PollOption, option_id)
+    assert poll and option
+    existing_vote = (
+        await session.execute(
+            select(Vote).where(Vote.poll_id == poll_id, Vote.voter_token == voter_token)
+        )
+    ).scalar_one_or_none()
+    if existing_vote is None:
+        new_vote = Vote(poll_id=poll_id, option_id=option_id, voter_token=voter_token)
+        session.add(new_vote)
+        await session.commit()
+        await session.refresh(new_vote)
+        return "created"
+    if existing_vote.option_id == option_id:
+        await session.delete(existing_vote)
+        await session.commit()
+        return "canceled"
+    existing_vote.option_id = option_id
+    await session.commit()
+    return "updated"
+
+
+async def upsert_vote(session, poll_id: int, option_id: int, voter_token: str) -> str:
+    action, _, _ = await apply_vote(session, poll_id, option_id, voter_token)
+    return action
+
+
+async def run(name: str, vote, option_ids: list[int]) -> None:
+    global round_trips
+    trips: dict[str, list[int]] = defaultdict(list)
+    latencies: list[float] = []
+    tokens = [str(uuid.uuid4()) for _ in range(VOTERS)]
+    # created -> updated -> canceled for every voter
+    plan = [(token, option_ids[0]) for token in tokens]
+    plan += [(token, option_ids[1]) for token in tokens]
+    plan += [(token, option_ids[1]) for token in tokens]
+
+    for token, option_id in plan:
+        async with AsyncSessionLocal() as session:
+            round_trips = 0
+            started = time.perf_counter()
+            action = await vote(session, POLL_ID, option_id, token)
+            latencies.append((time.perf_counter() - started) * 1000)
+            trips[action].append(round_trips)
+
+    latencies.sort()
+    summary = " ".join(
+        f"{action}={statistics.mean(values):.1f}" for action, values in sorted(trips.items())
+    )
+    print(
+        f"{name:<8} round_trips/vote {summary} "
+        f"p50={statistics.median(latencies):.2f}ms "
+        f"p99={latencies[int(len(latencies) * 0.99) - 1]:.2f}ms"
+    )
+
+
+async def main() -> None:
+    async with AsyncSessionLocal() as session:
+        option_ids = (
+            await session.execute(
+                select(PollOption.id).where(PollOption.poll_id == POLL_ID).limit(2)
+            )
+        ).scalars().all()
+    await run("before", legacy_vote, option_ids)
+    await run("after", upsert_vote, option_ids)
+    await engine.dispose()
+
+
+asyncio.run(main())
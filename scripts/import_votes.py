@@ -0,0 +1,215 @@
+import argparse
+import asyncio
+import csv
+import json
+import time
+import zlib
+from typing import Iterator
+
+from sqlalchemy import delete, func, select, tuple_
+from sqlalchemy.exc import OperationalError
+
+from app.counters import write_counters
+from app.database import AsyncSessionLocal, engine
+from app.models import Poll, PollArchive, PollOption, Vote
+from app.redis_client import create_redis
+from app.vote_writer import voter_keys
+from app.votes import is_lock_conflict, set_option_counts, upsert_votes
+
+MAX_TOKEN_LENGTH = 36
+MAX_CHUNK_ATTEMPTS = 5
+
+
+def read_rows(path: str, file_format: str) -> Iterator[dict]:
+    # Streams the file; nothing but the current line is kept in memory.
+    with open(path, newline="", encoding="utf-8") as source:
+        if file_format == "csv":
+            yield from csv.DictReader(source)
+        else:
+            for line in source:
+                if line.strip():
+                    yield json.loads(line)
+
+
+async def write_chunk(rows: dict[tuple[int, str], tuple[int, bool]]) -> None:
+    # rows: (poll_id, voter_token) -> (option_id, canceled); the last line for
+    # a voter wins, matching uniq_vote_per_poll.
+    upserts = [
+        {"poll_id": poll_id, "voter_token": token, "option_id": option_id}
+        for (poll_id, token), (option_id, canceled) in rows.items()
+        if not canceled
+    ]
+    cancels = [key for key, (_, canceled) in rows.items() if canceled]
+    # Parallel chunks lock overlapping ranges of uniq_vote_per_poll, so
+    # deadlocks and lock wait timeouts are expected; the chunk is rolled back
+    # and simply runs again.
+    for attempt in range(1, MAX_CHUNK_ATTEMPTS + 1):
+        try:
+            async with AsyncSessionLocal() as session:
+                if upserts:
+                    await session.execute(upsert_votes(session.bind.dialect.name, upserts))
+                if cancels:
+                    await session.execute(
+                        delete(Vote).where(tuple_(Vote.poll_id, Vote.voter_token).in_(cancels))
+                    )
+                await session.commit()
+            return
+        except OperationalError as exc:
+            if attempt == MAX_CHUNK_ATTEMPTS or not is_lock_conflict(exc):
+                raise
+            await asyncio.sleep(0.1 * attempt)
+
+
+async def worker(queue: asyncio.Queue, chunk_size: int) -> None:
+    rows: dict[tuple[int, str], tuple[int, bool]] = {}
+    while True:
+        item = await queue.get()
+        if item is None:
+            break
+        key, value = item
+        rows[key] = value
+        if len(rows) >= chunk_size:
+            await write_chunk(rows)
+            rows = {}
+    if rows:
+        await write_chunk(rows)
+
+
+async def feed(queue: asyncio.Queue, item, workers: list[asyncio.Task]) -> None:
+    # A failed worker never drains its queue again, so the put also waits on
+    # the workers and re-raises the first failure instead of blocking forever.
+    for task in workers:
+        if task.done():
+            task.result()
+    if not queue.full():
+        queue.put_nowait(item)
+        return
+    put = asyncio.ensure_future(queue.put(item))
+    done, _ = await asyncio.wait([put, *workers], return_when=asyncio.FIRST_COMPLETED)
+    if put not in done:
+        put.cancel()
+        for task in done:
+            task.result()
+
+
+async def recount(poll_ids: set[int]) -> dict[int, tuple[int, dict[str, int]]]:
+    # Absolute per-option counts (zeros included) for poll_option_counts and
+    # the Redis counters; returns poll_id -> (counter_shards, counts).
+    recounted = {}
+    async with AsyncSessionLocal() as session:
+        for poll_id in sorted(poll_ids):
+            shards = (
+                await session.execute(select(Poll.counter_shards).where(Poll.id == poll_id))
+            ).scalar_one()
+            option_ids = (
+                await session.execute(
+                    select(PollOption.id).where(PollOption.poll_id == poll_id)
+                )
+            ).scalars().all()
+            counts = {str(option_id): 0 for option_id in option_ids}
+            result = await session.execute(
+                select(Vote.option_id, func.count())
+                .where(Vote.poll_id == poll_id)
+                .group_by(Vote.option_id)
+            )
+            for option_id, count in result.all():
+                counts[str(option_id)] = count
+            if counts:
+                await session.execute(
+                    set_option_counts(
+                        session.bind.dialect.name,
+                        [
+                            {"option_id": int(option_id), "poll_id": poll_id, "vote_count": count}
+                            for option_id, count in counts.items()
+                        ],
+                    )
+                )
+            recounted[poll_id] = (max(1, shards), counts)
+        await session.commit()
+    return recounted
+
+
+async def rebuild_redis(recounted: dict[int, tuple[int, dict[str, int]]]) -> None:
+    redis = create_redis()
+    try:
+        for poll_id, (shards, counts) in recounted.items():
+            # The write-behind voters hash no longer matches the table.
+            await redis.delete(*voter_keys(poll_id))
+            await write_counters(redis, poll_id, shards, counts, sum(counts.values()))
+    finally:
+        await redis.aclose()
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(
+        description=(
+            "Import votes from JSONL or CSV (poll_id, option_id, voter_token and "
+            "an optional action=canceled) and rebuild counters. Stop voting on "
+            "the affected polls while it runs."
+        )
+    )
+    parser.add_argument("path")
+    parser.add_argument("--format", choices=("jsonl", "csv"))
+    parser.add_argument("--chunk-size", type=int, default=5000)
+    parser.add_argument("--workers", type=int, default=4)
+    args = parser.parse_args()
+    file_format = args.format or ("csv" if args.path.endswith(".csv") else "jsonl")
+
+    async with AsyncSessionLocal() as session:
+        option_polls = dict(
+            (await session.execute(select(PollOption.id, PollOption.poll_id))).all()
+        )
+        # Votes of archived polls live in votes_archive and are not recounted.
+        archived = set((await session.execute(select(PollArchive.poll_id))).scalars())
+
+    # A voter always goes to the same worker, so lines for one voter are
+    # applied in file order even though workers run in parallel.
+    queues = [asyncio.Queue(maxsize=args.chunk_size) for _ in range(args.workers)]
+    workers = [asyncio.create_task(worker(queue, args.chunk_size)) for queue in queues]
+    started = time.perf_counter()
+    imported = skipped = 0
+    poll_ids: set[int] = set()
+    try:
+        for row in read_rows(args.path, file_format):
+            try:
+                poll_id = int(row["poll_id"])
+                option_id = int(row["option_id"])
+                token = str(row["voter_token"])
+            except (KeyError, TypeError, ValueError):
+                skipped += 1
+                continue
+            if (
+                option_polls.get(option_id) != poll_id
+                or poll_id in archived
+                or not 0 < len(token) <= MAX_TOKEN_LENGTH
+            ):
+                skipped += 1
+                continue
+            canceled = row.get("action") == "canceled"
+            queue = queues[zlib.crc32(f"{poll_id}:{token}".encode()) % len(queues)]
+            await feed(queue, ((poll_id, token), (option_id, canceled)), workers)
+            poll_ids.add(poll_id)
+            imported += 1
+        for queue in queues:
+            await feed(queue, None, workers)
+        await asyncio.gather(*workers)
+    except BaseException:
+        # Chunks already written stay; the import can be rerun, as the last
+        # line for a voter wins either way.
+        for task in workers:
+            task.cancel()
+        await asyncio.gather(*workers, return_exceptions=True)
+        await engine.dispose()
+        raise
+    print(f"imported {imported} rows ({skipped} skipped) in {time.perf_counter() - started:.1f}s")
+
+    recounted = await recount(poll_ids)
+    await rebuild_redis(recounted)
+    for poll_id, (_, counts) in recounted.items():
+        print(f"poll {poll_id}: {sum(counts.values())} votes, counters rebuilt")
+
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,92 @@
+import argparse
+import asyncio
+
+from sqlalchemy import select
+
+from app.database import AsyncSessionLocal, engine
+from app.models import Poll, PollArchive, PollOption, PollOptionCount, Vote
+from app.votes import add_option_counts
+
+
+async def repair_poll(poll_id: int, chunk_size: int) -> tuple[int, int]:
+    # The recount and the stored counts come from one REPEATABLE READ
+    # transaction, i.e. the same snapshot. poll_option_counts changes in the
+    # same transaction as each vote, so their difference is the exact drift,
+    # and adding it as a delta keeps every vote committed meanwhile.
+    async with AsyncSessionLocal() as session:
+        dialect_name = session.bind.dialect.name
+        if dialect_name != "sqlite":
+            await session.connection(
+                execution_options={"isolation_level": "REPEATABLE READ"}
+            )
+        current = dict(
+            (
+                await session.execute(
+                    select(PollOptionCount.option_id, PollOptionCount.vote_count).where(
+                        PollOptionCount.poll_id == poll_id
+                    )
+                )
+            ).all()
+        )
+        option_ids = (
+            await session.execute(
+                select(PollOption.id).where(PollOption.poll_id == poll_id)
+            )
+        ).scalars().all()
+        counts = {option_id: 0 for option_id in option_ids}
+
+        # Walk the poll's votes by primary key so each query reads one chunk.
+        last_id = 0
+        while True:
+            rows = (
+                await session.execute(
+                    select(Vote.id, Vote.option_id)
+                    .where(Vote.poll_id == poll_id, Vote.id > last_id)
+                    .order_by(Vote.id)
+                    .limit(chunk_size)
+                )
+            ).all()
+            if not rows:
+                break
+            for _, option_id in rows:
+                counts[option_id] = counts.get(option_id, 0) + 1
+            last_id = rows[-1][0]
+
+        rows = [
+            {"option_id": option_id, "poll_id": poll_id, "vote_count": count - current.get(option_id, 0)}
+            for option_id, count in counts.items()
+            if count != current.get(option_id, 0) or option_id not in current
+        ]
+        if rows:
+            await session.execute(add_option_counts(dialect_name, rows))
+        await session.commit()
+    return sum(counts.values()), len(rows)
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Recompute poll_option_counts from the votes table."
+    )
+    parser.add_argument("--poll-id", type=int, action="append", default=[])
+    parser.add_argument("--chunk-size", type=int, default=10000)
+    args = parser.parse_args()
+
+    poll_ids = args.poll_id
+    async with AsyncSessionLocal() as session:
+        if not poll_ids:
+            poll_ids = (await session.execute(select(Poll.id).order_by(Poll.id))).scalars().all()
+        archived = set((await session.execute(select(PollArchive.poll_id))).scalars())
+
+    for poll_id in poll_ids:
+        if poll_id in archived:
+            # Its votes are in votes_archive; the counts were settled then.
+            print(f"poll {poll_id}: archived, skipped")
+            continue
+        total, fixed = await repair_poll(poll_id, args.chunk_size)
+        print(f"poll {poll_id}: {total} votes, {fixed} option counts corrected")
+
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -1,11 +1,13 @@
 import os
 import pymysql
+import redis
 
 DB_HOST = os.getenv("DB_HOST", "localhost")
 DB_PORT = int(os.getenv("DB_PORT", "3306"))
 DB_NAME = os.getenv("DB_NAME", "food")
 DB_USER = os.getenv("DB_USER", "test")
 DB_PASSWORD = os.getenv("DB_PASSWORD", "test1234")
+REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
 
 conn = pymysql.connect(
     host=DB_HOST,
@@ -32,4 +34,10 @@ with conn.cursor() as cur:
     )
 
 conn.close()
+
+# The API caches the newest active poll id under polls:active; drop it so the
+# new poll is served right away.
+client = redis.Redis.from_url(REDIS_URL)
+client.delete("polls:active")
+client.close()
 print("seed 완료")
@@ -0,0 +1,39 @@
+import hashlib
+from collections import OrderedDict
+
+
+class ResultsSnapshots:
+    # Serialized results per poll, valid while the poll's results version
+    # in Redis and its options (labels are in the body) are unchanged.
+    def __init__(self, max_size: int) -> None:
+        self._entries: OrderedDict[int, tuple[str, tuple, bytes]] = OrderedDict()
+        self._max_size = max_size
+
+    def get(self, poll_id: int, version: str, options: tuple) -> bytes | None:
+        entry = self._entries.get(poll_id)
+        if entry is None or entry[0] != version or entry[1] != options:
+            return None
+        self._entries.move_to_end(poll_id)
+        return entry[2]
+
+    def put(self, poll_id: int, version: str, options: tuple, body: bytes) -> None:
+        self._entries[poll_id] = (version, options, body)
+        self._entries.move_to_end(poll_id)
+        while len(self._entries) > self._max_size:
+            self._entries.popitem(last=False)
+
+
+def etag_for(poll_id: int, version: str) -> str:
+    return f'"{poll_id}-{version}"'
+
+
+def etag_for_many(versions: list[tuple[int, str]]) -> str:
+    joined = ",".join(f"{poll_id}-{version}" for poll_id, version in versions)
+    return f'"m-{hashlib.sha1(joined.encode()).hexdigest()[:20]}"'
+
+
+def etag_matches(if_none_match: str | None, etag: str) -> bool:
+    if not if_none_match:
+        return False
+    candidates = [value.strip().removeprefix("W/") for value in if_none_match.split(",")]
+    return etag in candidates or "*" in candidates
@@ -0,0 +1,62 @@
+import importlib.util
+from pathlib import Path
+
+import httpx
+import pytest
+
+from app.bench.stand_ins import use_local_stand_ins
+
+# app.config is read on import, so the SQLite + fakeredis stand-ins are set
+# up before any other app module is loaded.
+use_local_stand_ins()
+
+
+@pytest.fixture(scope="session")
+def anyio_backend():
+    return "asyncio"
+
+
+@pytest.fixture(scope="session")
+async def application():
+    # One lifespan (Redis client, scripts, broadcast backend) for the session.
+    from app.main import app
+
+    async with app.router.lifespan_context(app):
+        yield app
+
+
+@pytest.fixture
+async def client(application):
+    transport = httpx.ASGITransport(app=application)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        yield client
+
+
+@pytest.fixture
+async def poll(application) -> tuple[int, list[int]]:
+    # A fresh active poll with two options per test.
+    from app.database import AsyncSessionLocal
+    from app.models import Poll, PollOption
+
+    async with AsyncSessionLocal() as session:
+        new_poll = Poll(title="test poll", description=None, is_active=1)
+        new_poll.options = [
+            PollOption(label="a", sort_order=1),
+            PollOption(label="b", sort_order=2),
+        ]
+        session.add(new_poll)
+        await session.commit()
+        return new_poll.id, [option.id for option in new_poll.options]
+
+
+@pytest.fixture
+def load_script(application):
+    # scripts/ is not a package; their main() only runs under __main__.
+    def load(name: str):
+        path = Path(__file__).parents[1] / "scripts" / f"{name}.py"
+        spec = importlib.util.spec_from_file_location(name, path)
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+        return module
+
+    return load
@@ -0,0 +1,40 @@
+import pytest
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from app.bench.seed import seed_polls
+from app.database import AsyncSessionLocal
+from app.models import Base
+from app.poll_cache import ACTIVE_POLL_KEY, ActivePollPointer
+
+pytestmark = pytest.mark.anyio
+
+
+def _pointer() -> ActivePollPointer:
+    return ActivePollPointer(refresh_interval=0, redis_ttl=60, none_redis_ttl=1)
+
+
+async def test_no_active_poll_is_cached_briefly(application, tmp_path):
+    redis = application.state.redis
+    await redis.delete(ACTIVE_POLL_KEY)
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path}/empty.db")
+    async with engine.begin() as connection:
+        await connection.run_sync(Base.metadata.create_all)
+    try:
+        async with async_sessionmaker(engine)() as session:
+            assert await _pointer().get(session, redis) is None
+        assert await redis.get(ACTIVE_POLL_KEY) == "0"
+        assert 0 < await redis.ttl(ACTIVE_POLL_KEY) <= 1
+    finally:
+        await redis.delete(ACTIVE_POLL_KEY)
+        await engine.dispose()
+
+
+async def test_seeding_a_poll_invalidates_the_pointer(application):
+    redis = application.state.redis
+    await redis.set(ACTIVE_POLL_KEY, "0", ex=60)
+
+    polls = await seed_polls(1, 2)
+
+    async with AsyncSessionLocal() as session:
+        assert await _pointer().get(session, redis) == next(iter(polls))
+    assert 1 < await redis.ttl(ACTIVE_POLL_KEY) <= 60
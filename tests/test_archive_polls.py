@@ -0,0 +1,24 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from app.database import AsyncSessionLocal
+from app.models import Poll
+
+pytestmark = pytest.mark.anyio
+
+
+async def test_closed_polls_uses_a_utc_cutoff(load_script):
+    hour_ago = datetime.now(timezone.utc).replace(tzinfo=None) - timedelta(hours=1)
+    async with AsyncSessionLocal() as session:
+        old_closed = Poll(title="old closed", is_active=0, updated_at=hour_ago)
+        old_active = Poll(title="old active", is_active=1, updated_at=hour_ago)
+        # updated_at from the DB's CURRENT_TIMESTAMP.
+        just_closed = Poll(title="just closed", is_active=0)
+        session.add_all([old_closed, old_active, just_closed])
+        await session.commit()
+        poll_ids = [old_closed.id, old_active.id, just_closed.id]
+
+    closed_polls = load_script("archive_polls").closed_polls
+    assert await closed_polls(poll_ids, 1800) == [old_closed.id]
+    assert await closed_polls(poll_ids, 7200) == []
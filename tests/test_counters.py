@@ -0,0 +1,95 @@
+import zlib
+
+import pytest
+
+from app.counters import (
+    SHARDS_FIELD,
+    read_counters,
+    redis_keys,
+    results_version_key,
+    shard_for,
+    shard_key,
+    write_counters,
+)
+
+pytestmark = pytest.mark.anyio
+
+POLL_ID = 900001
+
+
+def _token(shards: int, shard: int) -> str:
+    # A voter token that hashes to the given shard.
+    return next(
+        token
+        for token in (f"voter-{i}" for i in range(1000))
+        if zlib.crc32(token.encode()) % shards == shard
+    )
+
+
+@pytest.fixture
+async def redis(application):
+    redis = application.state.redis
+    keys = [*redis_keys(POLL_ID), results_version_key(POLL_ID)]
+    keys += [shard_key(POLL_ID, shard) for shard in range(4)]
+    await redis.delete(*keys)
+    yield redis
+    await redis.delete(*keys)
+
+
+async def _vote(application, redis, shards: int, token: str, action: str, option, previous=""):
+    return await application.state.update_shard_counts_script(
+        keys=[shard_for(POLL_ID, shards, token)],
+        args=[action, option, previous],
+        client=redis,
+    )
+
+
+async def test_read_sums_the_shards(application, redis):
+    await write_counters(redis, POLL_ID, 3, {"1": 4, "2": 1}, 5)
+    before, _, _ = (await read_counters(redis, [(POLL_ID, 3)]))[0]
+    for shard in (1, 2):
+        assert await _vote(application, redis, 3, _token(3, shard), "created", 2)
+
+    ((version, counts, total),) = await read_counters(redis, [(POLL_ID, 3)])
+    assert counts == {"1": 4, "2": 3}
+    assert total == 7
+    assert version != before
+    assert await redis.hget(shard_key(POLL_ID, 2), "2") == "1"
+
+
+async def test_rebuild_after_a_shard_count_change(application, redis):
+    await write_counters(redis, POLL_ID, 3, {"1": 2}, 2)
+    assert await _vote(application, redis, 3, _token(3, 2), "created", 1)
+
+    await write_counters(redis, POLL_ID, 2, {"1": 3}, 3)
+    # Readers that still assume three shards see the poll as not built.
+    assert (await read_counters(redis, [(POLL_ID, 3)]))[0][1] is None
+    assert (await read_counters(redis, [(POLL_ID, 2)]))[0][1:] == ({"1": 3}, 3)
+    assert not await redis.exists(shard_key(POLL_ID, 2))
+    assert await redis.hget(shard_key(POLL_ID, 0), SHARDS_FIELD) == "2"
+
+    # Back to the unsharded layout: the shards are marked stale.
+    await write_counters(redis, POLL_ID, 1, {"1": 3}, 3)
+    assert (await read_counters(redis, [(POLL_ID, 2)]))[0][1] is None
+    assert (await read_counters(redis, [(POLL_ID, 1)]))[0][1:] == ({"1": 3}, 3)
+
+
+async def test_update_counted_in_another_shard_keeps_the_sum(application, redis):
+    # A vote counted on shard 0 of a 2-shard layout, then rebuilt with four
+    # shards: the voter's update lands on a shard that never counted it.
+    token = next(
+        token
+        for token in (f"voter-{i}" for i in range(1000))
+        if zlib.crc32(token.encode()) % 2 == 0 and zlib.crc32(token.encode()) % 4 == 2
+    )
+    await write_counters(redis, POLL_ID, 2, {}, 0)
+    assert await _vote(application, redis, 2, token, "created", 1)
+    ((_, counts, total),) = await read_counters(redis, [(POLL_ID, 2)])
+    await write_counters(redis, POLL_ID, 4, counts, total)
+
+    assert await _vote(application, redis, 4, token, "updated", 2, 1)
+
+    assert await redis.hget(shard_key(POLL_ID, 2), "1") == "-1"
+    ((_, counts, total),) = await read_counters(redis, [(POLL_ID, 4)])
+    assert counts == {"1": 0, "2": 1}
+    assert total == 1
@@ -0,0 +1,65 @@
+import asyncio
+
+import pytest
+from sqlalchemy import func, select
+from sqlalchemy.exc import OperationalError
+
+from app.database import AsyncSessionLocal
+from app.models import Vote
+
+pytestmark = pytest.mark.anyio
+
+
+async def _votes(poll_id: int) -> int:
+    async with AsyncSessionLocal() as session:
+        return (
+            await session.execute(
+                select(func.count()).select_from(Vote).where(Vote.poll_id == poll_id)
+            )
+        ).scalar_one()
+
+
+async def test_chunk_is_retried_after_a_deadlock(load_script, poll, monkeypatch):
+    poll_id, (option_id, _) = poll
+    script = load_script("import_votes")
+    upsert_votes = script.upsert_votes
+    failures = [OperationalError("INSERT", {}, Exception(1213, "Deadlock found"))]
+
+    def deadlock_once(*args):
+        if failures:
+            raise failures.pop()
+        return upsert_votes(*args)
+
+    monkeypatch.setattr(script, "upsert_votes", deadlock_once)
+    await script.write_chunk(
+        {(poll_id, "a"): (option_id, False), (poll_id, "b"): (option_id, False)}
+    )
+
+    assert not failures
+    assert await _votes(poll_id) == 2
+
+
+async def test_other_errors_are_not_retried(load_script, poll, monkeypatch):
+    poll_id, (option_id, _) = poll
+    script = load_script("import_votes")
+
+    def gone_away(*args):
+        raise OperationalError("INSERT", {}, Exception(2006, "MySQL server has gone away"))
+
+    monkeypatch.setattr(script, "upsert_votes", gone_away)
+    with pytest.raises(OperationalError):
+        await script.write_chunk({(poll_id, "a"): (option_id, False)})
+
+
+async def test_failed_worker_aborts_the_producer(load_script, monkeypatch):
+    script = load_script("import_votes")
+
+    async def db_down(rows):
+        raise RuntimeError("db down")
+
+    monkeypatch.setattr(script, "write_chunk", db_down)
+    queue = asyncio.Queue(maxsize=2)
+    workers = [asyncio.create_task(script.worker(queue, 2))]
+    with pytest.raises(RuntimeError, match="db down"):
+        for i in range(100):
+            await asyncio.wait_for(script.feed(queue, ((1, str(i)), (1, False)), workers), 5)
@@ -0,0 +1,40 @@
+import pytest
+from sqlalchemy import select, update
+
+from app.database import AsyncSessionLocal
+from app.models import PollOptionCount
+
+pytestmark = pytest.mark.anyio
+
+
+async def test_repair_poll_restores_the_counts_from_the_votes(load_script, client, poll):
+    poll_id, (first, second) = poll
+    for i in range(3):
+        response = await client.post(
+            f"/polls/{poll_id}/votes",
+            json={"optionId": first if i else second, "voterToken": f"repair-{i}"},
+        )
+        assert response.status_code == 200
+    async with AsyncSessionLocal() as session:
+        await session.execute(
+            update(PollOptionCount)
+            .where(PollOptionCount.option_id == first)
+            .values(vote_count=7)
+        )
+        await session.commit()
+
+    repair_poll = load_script("reconcile_option_counts").repair_poll
+    assert await repair_poll(poll_id, chunk_size=2) == (3, 1)
+    assert await repair_poll(poll_id, chunk_size=2) == (3, 0)
+
+    async with AsyncSessionLocal() as session:
+        counts = dict(
+            (
+                await session.execute(
+                    select(PollOptionCount.option_id, PollOptionCount.vote_count).where(
+                        PollOptionCount.poll_id == poll_id
+                    )
+                )
+            ).all()
+        )
+    assert counts == {first: 2, second: 1}
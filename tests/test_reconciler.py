@@ -0,0 +1,94 @@
+import asyncio
+
+import pytest
+
+from app import main
+from app.counters import read_counters, redis_keys
+from app.database import AsyncSessionLocal
+from app.reconciler import CounterReconciler
+from app.redis_client import ADJUST_COUNTS_LUA, ADJUST_SHARD_COUNTS_LUA, register_script
+from app.votes import add_option_counts
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture
+async def built(application, client, poll):
+    # A poll with one vote on each option and its counters built.
+    poll_id, option_ids = poll
+    for i, option_id in enumerate(option_ids):
+        response = await client.post(
+            f"/polls/{poll_id}/votes",
+            json={"optionId": option_id, "voterToken": f"reconcile-{i}"},
+        )
+        assert response.status_code == 200
+    assert (await client.get(f"/polls/{poll_id}/results")).json()["totalVotes"] == 2
+    async with AsyncSessionLocal() as session:
+        meta = await main.poll_cache.get(session, application.state.redis, poll_id)
+    return meta
+
+
+async def _reconciler(redis, settle: float) -> CounterReconciler:
+    return CounterReconciler(
+        redis,
+        AsyncSessionLocal,
+        main.poll_cache,
+        main._reference_counts,
+        await register_script(redis, ADJUST_COUNTS_LUA),
+        await register_script(redis, ADJUST_SHARD_COUNTS_LUA),
+        interval=60,
+        chunk_size=20,
+        polls_per_second=0,
+        settle=settle,
+        lock_timeout=5,
+        busy=lambda: False,
+    )
+
+
+async def _counts(redis, poll_id: int) -> tuple[dict[str, int], int]:
+    ((_, counts, total),) = await read_counters(redis, [(poll_id, 1)])
+    return counts, total
+
+
+async def test_drift_is_repaired(application, built):
+    redis = application.state.redis
+    first, second = (str(option.id) for option in built.options)
+    total_key, options_key = redis_keys(built.id)
+    # A vote that reached Redis twice and a lost cancel.
+    await redis.hincrby(options_key, first, 3)
+    await redis.incrby(total_key, 2)
+
+    await (await _reconciler(redis, settle=0.01))._reconcile_chunk([built])
+
+    assert await _counts(redis, built.id) == ({first: 1, second: 1}, 2)
+
+
+async def test_concurrent_vote_is_not_corrected(application, client, built):
+    redis = application.state.redis
+    first, second = (str(option.id) for option in built.options)
+    # A vote committed to the DB whose Redis update has not landed yet.
+    async with AsyncSessionLocal() as session:
+        await session.execute(
+            add_option_counts(
+                session.bind.dialect.name,
+                [{"option_id": int(second), "poll_id": built.id, "vote_count": 1}],
+            )
+        )
+        await session.commit()
+
+    reconciler = await _reconciler(redis, settle=0.3)
+    reconciling = asyncio.create_task(reconciler._reconcile_chunk([built]))
+    await asyncio.sleep(0.1)
+    # Another vote lands while the reconciler settles; it is not in the
+    # reference read before it.
+    response = await client.post(
+        f"/polls/{built.id}/votes", json={"optionId": int(first), "voterToken": "late"}
+    )
+    assert response.status_code == 200
+    await reconciling
+
+    assert await _counts(redis, built.id) == ({first: 2, second: 1}, 3)
+
+    # The next pass picks up the vote that was still in flight.
+    await reconciler._reconcile_chunk([built])
+    assert await _counts(redis, built.id) == ({first: 2, second: 2}, 4)
@@ -0,0 +1,151 @@
+import time
+
+import pytest
+from sqlalchemy import insert, text
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from starlette.requests import Request
+from starlette.responses import Response
+
+from app import main, metrics, replica
+from app.counters import redis_keys, results_version_key
+from app.database import AsyncSessionLocal
+from app.models import Base, Poll, PollOption, PollOptionCount
+from app.replica import PRIMARY_COOKIE, ReplicaRouter
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture
+async def stand_ins(tmp_path):
+    # Two SQLite files that say which one answered.
+    engines = {}
+    for name in ("primary", "replica"):
+        engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path}/{name}.db")
+        async with engine.begin() as connection:
+            await connection.execute(text("CREATE TABLE source (name TEXT)"))
+            await connection.execute(text(f"INSERT INTO source VALUES ('{name}')"))
+        engines[name] = engine
+    yield engines
+    for engine in engines.values():
+        await engine.dispose()
+
+
+def _router(engines) -> ReplicaRouter:
+    return ReplicaRouter(
+        async_sessionmaker(engines["primary"]),
+        engines["replica"],
+        max_lag=2,
+        check_interval=1,
+        read_your_writes=5,
+    )
+
+
+async def _source(router: ReplicaRouter, request: Request | None = None) -> str:
+    async with router.session(request) as session:
+        return (await session.execute(text("SELECT name FROM source"))).scalar_one()
+
+
+def _request(cookie: str | None = None) -> Request:
+    headers = [(b"cookie", cookie.encode())] if cookie else []
+    return Request({"type": "http", "headers": headers})
+
+
+async def test_pinned_request_reads_the_primary(stand_ins):
+    router = _router(stand_ins)
+    await router.check()
+    assert await _source(router, _request()) == "replica"
+
+    response = Response()
+    router.pin(response)
+    assert PRIMARY_COOKIE in response.headers["set-cookie"]
+
+    pinned = f"{PRIMARY_COOKIE}={int(time.time()) + 5}"
+    assert await _source(router, _request(pinned)) == "primary"
+    expired = f"{PRIMARY_COOKIE}={int(time.time()) - 1}"
+    assert await _source(router, _request(expired)) == "replica"
+    assert await _source(router, _request(f"{PRIMARY_COOKIE}=garbage")) == "replica"
+
+
+async def test_lagging_or_failing_replica_falls_back_and_recovers(stand_ins, monkeypatch):
+    router = _router(stand_ins)
+    lag = {"value": 10.0}
+
+    async def replication_lag(engine):
+        if isinstance(lag["value"], Exception):
+            raise lag["value"]
+        return lag["value"]
+
+    monkeypatch.setattr(replica, "replication_lag", replication_lag)
+
+    await router.check()
+    assert not router.healthy and await _source(router) == "primary"
+
+    lag["value"] = None  # replication stopped
+    await router.check()
+    assert await _source(router) == "primary"
+
+    lag["value"] = OSError("replica unreachable")
+    await router.check()
+    assert router.stats() == {"healthy": 0, "lag_seconds": -1}
+    assert await _source(router) == "primary"
+
+    lag["value"] = 0.5
+    await router.check()
+    assert router.healthy and await _source(router) == "replica"
+
+
+async def test_replica_error_marks_it_down(stand_ins):
+    router = _router(stand_ins)
+    await router.check()
+    with pytest.raises(OperationalError):
+        async with router.session():
+            raise OperationalError("SELECT 1", {}, Exception(2013, "Lost connection"))
+    assert not router.healthy
+    assert await _source(router) == "primary"
+
+    await router.check()
+    assert await _source(router) == "replica"
+
+
+async def test_results_rebuild_reads_the_primary(application, client, poll, tmp_path, monkeypatch):
+    # The replica has the poll but stale counts; a cold rebuild must still
+    # write the primary's counts to Redis.
+    poll_id, option_ids = poll
+    replica_engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path}/replica.db")
+    async with replica_engine.begin() as connection:
+        await connection.run_sync(Base.metadata.create_all)
+        await connection.execute(insert(Poll).values(id=poll_id, title="test poll", is_active=1))
+        await connection.execute(
+            insert(PollOption),
+            [
+                {"id": option_id, "poll_id": poll_id, "label": label, "sort_order": order}
+                for order, (option_id, label) in enumerate(zip(option_ids, "ab"))
+            ],
+        )
+        await connection.execute(
+            insert(PollOptionCount),
+            [{"option_id": option_id, "poll_id": poll_id, "vote_count": 100} for option_id in option_ids],
+        )
+
+    vote = await client.post(
+        f"/polls/{poll_id}/votes", json={"optionId": option_ids[0], "voterToken": "voter"}
+    )
+    assert vote.status_code == 200
+    redis = application.state.redis
+    await redis.delete(*redis_keys(poll_id), results_version_key(poll_id))
+
+    router = ReplicaRouter(
+        AsyncSessionLocal, replica_engine, max_lag=2, check_interval=1, read_your_writes=5
+    )
+    await router.check()
+    monkeypatch.setattr(main, "read_router", router)
+    replica_reads = metrics.db_reads._values.get(("replica",), 0)
+    try:
+        results = (await client.get(f"/polls/{poll_id}/results")).json()
+    finally:
+        await replica_engine.dispose()
+
+    assert metrics.db_reads._values[("replica",)] == replica_reads + 1
+    assert results["totalVotes"] == 1
+    assert [item["count"] for item in results["results"]] == [1, 0]
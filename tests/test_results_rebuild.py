@@ -0,0 +1,73 @@
+import asyncio
+
+import pytest
+from sqlalchemy import select
+
+from app import main
+from app.database import AsyncSessionLocal, pool_capacity
+from app.singleflight import SingleFlight
+
+pytestmark = pytest.mark.anyio
+
+
+async def test_rebuild_waiter_releases_its_connection(application, poll):
+    # The SQLite stand-in has a pool of one connection. A request waiting on
+    # the single-flight rebuild must not keep it from the leader.
+    assert pool_capacity() == 1
+    poll_id, _ = poll
+    redis = application.state.redis
+    async with AsyncSessionLocal() as session:
+        meta = await main.poll_cache.get(session, redis, poll_id)
+
+    async with AsyncSessionLocal() as holder:
+        await holder.execute(select(1))
+        leader = asyncio.create_task(main._results_payload(poll_id))
+        await asyncio.sleep(0.1)
+        assert poll_id in main.count_rebuilds._inflight
+
+        results, payload = await asyncio.wait_for(
+            asyncio.gather(main._rebuild_results(holder, redis, meta), leader), 10
+        )
+    assert results.totalVotes == payload["totalVotes"] == 0
+
+
+async def test_cold_reads_and_votes_finish_with_one_connection(client, poll):
+    poll_id, option_ids = poll
+    votes = [
+        client.post(
+            f"/polls/{poll_id}/votes",
+            json={"optionId": option_ids[i % 2], "voterToken": f"voter-{i}"},
+        )
+        for i in range(10)
+    ]
+    reads = [client.get(f"/polls/{poll_id}/results") for _ in range(10)]
+    reads += [client.get(f"/polls/results?ids={poll_id}") for _ in range(10)]
+
+    responses = await asyncio.wait_for(asyncio.gather(*votes, *reads), 20)
+    assert all(response.status_code == 200 for response in responses)
+
+    results = (await client.get(f"/polls/{poll_id}/results")).json()
+    assert results["totalVotes"] == 10
+
+
+async def test_cancelled_leader_hands_the_call_to_a_waiter():
+    flight = SingleFlight()
+    started = asyncio.Event()
+    calls = 0
+
+    async def call():
+        nonlocal calls
+        calls += 1
+        started.set()
+        await asyncio.sleep(0.1)
+        return calls
+
+    leader = asyncio.create_task(flight.do("poll", call))
+    await started.wait()
+    waiters = [asyncio.create_task(flight.do("poll", call)) for _ in range(3)]
+    await asyncio.sleep(0)
+    # A disconnected SSE client cancels the request that leads the rebuild.
+    leader.cancel()
+
+    assert await asyncio.wait_for(asyncio.gather(*waiters), 5) == [2, 2, 2]
+    assert leader.cancelled()
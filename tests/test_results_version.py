@@ -0,0 +1,53 @@
+import pytest
+from sqlalchemy import update
+
+from app import main
+from app.counters import redis_keys, results_version_key
+from app.database import AsyncSessionLocal
+from app.models import PollOption
+
+pytestmark = pytest.mark.anyio
+
+
+async def _etag(client, poll_id: int) -> str:
+    # The first read after a rebuild has no version yet.
+    await client.get(f"/polls/{poll_id}/results")
+    response = await client.get(f"/polls/{poll_id}/results")
+    return response.headers["ETag"]
+
+
+async def test_rebuild_after_a_redis_flush_gets_a_new_version(application, client, poll):
+    poll_id, (option_id, _) = poll
+    redis = application.state.redis
+    before = await _etag(client, poll_id)
+
+    # Redis loses the counters, and a vote lands before the next read.
+    await redis.delete(*redis_keys(poll_id), results_version_key(poll_id))
+    vote = await client.post(
+        f"/polls/{poll_id}/votes", json={"optionId": option_id, "voterToken": "flush-voter"}
+    )
+    assert vote.status_code == 200
+
+    after = await _etag(client, poll_id)
+    assert after != before
+    response = await client.get(
+        f"/polls/{poll_id}/results", headers={"If-None-Match": before}
+    )
+    assert response.status_code == 200
+    assert response.json()["totalVotes"] == 1
+
+
+async def test_invalidate_drops_snapshots_built_from_old_labels(application, client, poll):
+    poll_id, (option_id, _) = poll
+    before = await _etag(client, poll_id)
+
+    async with AsyncSessionLocal() as session:
+        await session.execute(
+            update(PollOption).where(PollOption.id == option_id).values(label="renamed")
+        )
+        await session.commit()
+    await main.poll_cache.invalidate(application.state.redis, poll_id)
+
+    response = await client.get(f"/polls/{poll_id}/results")
+    assert response.headers["ETag"] != before
+    assert response.json()["results"][0]["label"] == "renamed"
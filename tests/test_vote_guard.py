@@ -0,0 +1,77 @@
+import pytest
+
+pytestmark = pytest.mark.anyio
+
+
+async def _vote(client, poll_id: int, option_id: int, token: str, key: str | None = None):
+    headers = {"Idempotency-Key": key} if key else {}
+    return await client.post(
+        f"/polls/{poll_id}/votes",
+        json={"optionId": option_id, "voterToken": token},
+        headers=headers,
+    )
+
+
+async def test_same_key_replays_the_stored_response(client, poll):
+    poll_id, (option_id, _) = poll
+    first = await _vote(client, poll_id, option_id, "replay-voter", "replay-key")
+    second = await _vote(client, poll_id, option_id, "replay-voter", "replay-key")
+
+    assert first.status_code == second.status_code == 200
+    assert second.headers["Idempotent-Replayed"] == "true"
+    assert second.json() == first.json()
+    assert (await client.get(f"/polls/{poll_id}/results")).json()["totalVotes"] == 1
+
+
+async def test_same_key_with_a_different_body_is_a_conflict(client, poll):
+    poll_id, (first, second) = poll
+    response = await _vote(client, poll_id, first, "mismatch-voter", "mismatch-key")
+    assert response.status_code == 200
+
+    response = await _vote(client, poll_id, second, "mismatch-voter", "mismatch-key")
+    assert response.status_code == 409
+
+
+async def test_voter_over_the_rate_limit_gets_retry_after(client, poll):
+    poll_id, options = poll
+    statuses = []
+    for i in range(10):
+        response = await _vote(client, poll_id, options[i % 2], "busy-voter")
+        statuses.append(response.status_code)
+        if response.status_code == 429:
+            assert int(response.headers["Retry-After"]) >= 1
+            break
+    assert statuses[0] == 200
+    assert statuses[-1] == 429
+
+
+async def test_claim_expires_long_before_the_stored_response(application, poll):
+    poll_id, (option_id, _) = poll
+    redis = application.state.redis
+    guard = application.state.vote_guard
+    name = f"poll:{poll_id}:idempotency:claim-key"
+    replay = await guard.admit(
+        redis,
+        poll_id=poll_id,
+        client_ip=None,
+        voter_token=None,
+        idempotency_key="claim-key",
+        fingerprint=f"{option_id}:",
+    )
+    assert replay is None
+    assert 0 < await redis.ttl(name) <= guard._claim_ttl < guard._idempotency_ttl
+
+    await guard.remember(redis, poll_id, "claim-key", '{"ok":true}')
+    assert guard._claim_ttl < await redis.ttl(name) <= guard._idempotency_ttl
+
+
+async def test_remember_sets_a_ttl_after_the_claim_expired(application):
+    redis = application.state.redis
+    guard = application.state.vote_guard
+    # The claim made by admit() is already gone when the response is stored.
+    await redis.delete("poll:1:idempotency:expired-claim")
+
+    await guard.remember(redis, 1, "expired-claim", '{"ok":true}')
+
+    assert await redis.hget("poll:1:idempotency:expired-claim", "body") == '{"ok":true}'
+    assert 0 < await redis.ttl("poll:1:idempotency:expired-claim") <= guard._idempotency_ttl
@@ -0,0 +1,166 @@
+import pytest
+from sqlalchemy import func, select
+from sqlalchemy.exc import DataError
+
+from app.database import AsyncSessionLocal
+from app.models import PollOptionCount, Vote
+from app.redis_client import RECORD_VOTE_LUA, register_script
+from app.vote_writer import DEAD_LETTER_KEY, STREAM_KEY, VoteWriter, voter_keys
+
+pytestmark = pytest.mark.anyio
+
+
+async def _stored(poll_id: int) -> tuple[dict[int, int], int]:
+    async with AsyncSessionLocal() as session:
+        counts = dict(
+            (
+                await session.execute(
+                    select(PollOptionCount.option_id, PollOptionCount.vote_count).where(
+                        PollOptionCount.poll_id == poll_id
+                    )
+                )
+            ).all()
+        )
+        votes = (
+            await session.execute(
+                select(func.count()).select_from(Vote).where(Vote.poll_id == poll_id)
+            )
+        ).scalar_one()
+    return counts, votes
+
+
+async def test_replayed_batch_is_applied_once(application, poll, monkeypatch):
+    poll_id, (first, second) = poll
+    redis = application.state.redis
+    await redis.delete(STREAM_KEY)
+    writer = VoteWriter(
+        redis,
+        AsyncSessionLocal,
+        await register_script(redis, RECORD_VOTE_LUA),
+        batch_size=100,
+        flush_interval=0.2,
+        max_pending=1000,
+        drain_timeout=1,
+    )
+    for token, action, option_id, previous in [
+        ("x", "created", first, ""),
+        ("y", "created", first, ""),
+        ("x", "updated", second, first),
+    ]:
+        await redis.xadd(
+            STREAM_KEY,
+            {
+                "poll_id": poll_id,
+                "voter_token": token,
+                "action": action,
+                "option_id": option_id,
+                "previous_option_id": previous,
+            },
+        )
+
+    # The batch commits, then the process "dies" before XDEL.
+    xdel = redis.xdel
+
+    async def crash(*args):
+        raise ConnectionError("lost before XDEL")
+
+    monkeypatch.setattr(redis, "xdel", crash)
+    with pytest.raises(ConnectionError):
+        await writer.flush()
+    monkeypatch.setattr(redis, "xdel", xdel)
+
+    assert await writer.flush() == 3
+    assert await redis.xlen(STREAM_KEY) == 0
+    assert await _stored(poll_id) == ({first: 1, second: 1}, 2)
+
+    # Later entries still apply.
+    await redis.xadd(
+        STREAM_KEY,
+        {
+            "poll_id": poll_id,
+            "voter_token": "z",
+            "action": "created",
+            "option_id": second,
+            "previous_option_id": "",
+        },
+    )
+    assert await writer.flush() == 1
+    assert await _stored(poll_id) == ({first: 1, second: 2}, 3)
+
+
+async def test_rejected_vote_moves_to_the_dead_letter_stream(application, poll, monkeypatch):
+    poll_id, (first, second) = poll
+    redis = application.state.redis
+    await redis.delete(STREAM_KEY, DEAD_LETTER_KEY)
+    writer = VoteWriter(
+        redis,
+        AsyncSessionLocal,
+        await register_script(redis, RECORD_VOTE_LUA),
+        batch_size=100,
+        flush_interval=0.2,
+        max_pending=1000,
+        drain_timeout=1,
+        max_attempts=2,
+    )
+    bad_token = "t" * 37
+    for token, option_id in [("ok-1", first), (bad_token, first), ("ok-2", second)]:
+        await redis.xadd(
+            STREAM_KEY,
+            {
+                "poll_id": poll_id,
+                "voter_token": token,
+                "action": "created",
+                "option_id": option_id,
+                "previous_option_id": "",
+            },
+        )
+
+    # SQLite does not enforce VARCHAR(36); reject the token as strict MariaDB does.
+    apply = writer._apply
+
+    async def strict_apply(session, entries):
+        if any(len(fields["voter_token"]) > 36 for _, fields in entries):
+            raise DataError("INSERT INTO votes", {}, Exception("Data too long for column"))
+        await apply(session, entries)
+
+    monkeypatch.setattr(writer, "_apply", strict_apply)
+    for _ in range(2):
+        with pytest.raises(DataError):
+            await writer.flush()
+    assert await redis.xlen(STREAM_KEY) == 3
+
+    assert await writer.flush() == 3
+    assert await redis.xlen(STREAM_KEY) == 0
+    assert await _stored(poll_id) == ({first: 1, second: 1}, 2)
+    ((_, dead),) = await redis.xrange(DEAD_LETTER_KEY)
+    assert dead["voter_token"] == bad_token
+
+
+async def test_voters_tally_follows_recorded_votes(application, poll):
+    poll_id, (first, second) = poll
+    redis = application.state.redis
+    writer = VoteWriter(
+        redis,
+        AsyncSessionLocal,
+        await register_script(redis, RECORD_VOTE_LUA),
+        batch_size=100,
+        flush_interval=0.2,
+        max_pending=1000,
+        drain_timeout=1,
+    )
+    async with AsyncSessionLocal() as session:
+        for token, option_id in [("a", first), ("b", first), ("a", second), ("b", first)]:
+            await writer.record(
+                session,
+                poll_id=poll_id,
+                option_id=option_id,
+                voter_token=token,
+                counter_keys=[],
+            )
+    # created, created, updated, canceled
+    assert await writer.count_votes(poll_id, scan=False) == {str(second): 1}
+
+    # Voters loaded before the tally existed are only counted with a scan.
+    await redis.delete(voter_keys(poll_id)[2])
+    assert await writer.count_votes(poll_id, scan=False) is None
+    assert await writer.count_votes(poll_id) == {str(second): 1}
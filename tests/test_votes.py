@@ -0,0 +1,68 @@
+import pytest
+from sqlalchemy.dialects import mysql
+from sqlalchemy.exc import OperationalError
+
+from app.database import AsyncSessionLocal
+from app.votes import add_option_counts, apply_vote, set_option_counts
+
+pytestmark = pytest.mark.anyio
+
+
+def _option_order(statement) -> list[int]:
+    params = statement.compile(dialect=mysql.dialect()).params
+    return [value for key, value in params.items() if key.startswith("option_id")]
+
+
+@pytest.mark.parametrize("build", [add_option_counts, set_option_counts])
+def test_option_counts_are_written_in_option_order(build):
+    # An A->B vote and a B->A vote must lock the rows in the same order.
+    rows = [
+        {"option_id": 9, "poll_id": 1, "vote_count": -1},
+        {"option_id": 3, "poll_id": 1, "vote_count": 1},
+    ]
+    assert _option_order(build("mysql", rows)) == [3, 9]
+
+
+async def test_apply_vote_retries_a_deadlock(poll):
+    poll_id, option_ids = poll
+    deadlock = OperationalError(
+        "INSERT", {}, Exception(1213, "Deadlock found when trying to get lock")
+    )
+    async with AsyncSessionLocal() as session:
+        execute = session.execute
+        calls = []
+
+        async def deadlock_once(*args, **kwargs):
+            calls.append(args)
+            if len(calls) == 1:
+                raise deadlock
+            return await execute(*args, **kwargs)
+
+        session.execute = deadlock_once
+        action, vote_id, _ = await apply_vote(session, poll_id, option_ids[0], "voter")
+
+    assert action == "created" and vote_id is not None
+
+
+async def test_apply_vote_does_not_retry_other_errors(poll):
+    poll_id, option_ids = poll
+    gone = OperationalError("INSERT", {}, Exception(2013, "Lost connection"))
+    async with AsyncSessionLocal() as session:
+        calls = []
+
+        async def fail(*args, **kwargs):
+            calls.append(args)
+            raise gone
+
+        session.execute = fail
+        with pytest.raises(OperationalError):
+            await apply_vote(session, poll_id, option_ids[0], "voter")
+    assert len(calls) == 1
+
+
+async def test_voter_token_longer_than_the_column_is_rejected(client, poll):
+    poll_id, (option_id, _) = poll
+    response = await client.post(
+        f"/polls/{poll_id}/votes", json={"optionId": option_id, "voterToken": "t" * 37}
+    )
+    assert response.status_code == 422
@@ -0,0 +1,48 @@
+import asyncio
+
+import pytest
+from redis.exceptions import ConnectionError
+
+from app import ws
+from app.ws import RedisBroadcastBackend
+
+pytestmark = pytest.mark.anyio
+
+
+async def test_listener_resubscribes_after_the_connection_drops(application, monkeypatch):
+    monkeypatch.setattr(ws, "RESUBSCRIBE_MIN_DELAY", 0.01)
+    redis = application.state.redis
+    pubsubs = []
+    pubsub = redis.pubsub
+
+    def tracked_pubsub(**kwargs):
+        pubsubs.append(pubsub(**kwargs))
+        return pubsubs[-1]
+
+    monkeypatch.setattr(redis, "pubsub", tracked_pubsub)
+
+    delivered = asyncio.Queue()
+
+    async def deliver(poll_id: int, text: str) -> None:
+        await delivered.put((poll_id, text))
+
+    backend = RedisBroadcastBackend(redis, channel_prefix="test-updates")
+    await backend.start(deliver)
+
+    async def dropped(*args, **kwargs):
+        raise ConnectionError("Connection closed by server.")
+
+    # The first subscription loses its connection on the next read.
+    monkeypatch.setattr(pubsubs[0], "parse_response", dropped)
+    try:
+        for _ in range(100):
+            if len(pubsubs) > 1 and pubsubs[-1].subscribed:
+                break
+            await asyncio.sleep(0.01)
+        assert len(pubsubs) == 2
+
+        await backend.publish(7, "frame")
+        assert await asyncio.wait_for(delivered.get(), 5) == (7, "frame")
+        assert not backend._listener.done()
+    finally:
+        await backend.close()
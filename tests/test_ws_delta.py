@@ -0,0 +1,128 @@
+from contextlib import asynccontextmanager
+
+import pytest
+from fastapi import FastAPI
+from starlette.testclient import TestClient
+
+from app import main
+from app.ws import ConnectionManager, LocalBroadcastBackend
+
+POLL_ID = 900101
+
+
+def _payload(total: int, **counts: int) -> dict:
+    return {
+        "type": "poll_results_updated",
+        "pollId": POLL_ID,
+        "totalVotes": total,
+        "results": [
+            {"optionId": int(option_id[1:]), "label": option_id, "count": count}
+            for option_id, count in counts.items()
+        ],
+    }
+
+
+@pytest.fixture
+def results():
+    # What _results_payload returns; tests replace it to change the poll.
+    return {"payload": _payload(1, o1=1, o2=0)}
+
+
+@pytest.fixture
+def ws_client(monkeypatch, results):
+    # The real /ws/polls endpoint on its own app and manager, so the socket
+    # runs on the TestClient's loop instead of the session's DB and Redis.
+    manager = ConnectionManager(max_fps=1000, queue_size=2, ping_interval=0)
+
+    async def results_payload(poll_id: int) -> dict:
+        return results["payload"]
+
+    @asynccontextmanager
+    async def lifespan(app):
+        await manager.start(LocalBroadcastBackend())
+        yield
+        await manager.close()
+
+    monkeypatch.setattr(main, "manager", manager)
+    monkeypatch.setattr(main, "_results_payload", results_payload)
+    app = FastAPI(lifespan=lifespan)
+    app.add_api_websocket_route("/ws/polls/{poll_id}", main.poll_ws)
+    with TestClient(app) as client:
+        yield client, manager
+
+
+def _connect(client):
+    return client.websocket_connect(f"/ws/polls/{POLL_ID}?protocol=2")
+
+
+def test_snapshot_on_connect(ws_client):
+    client, _ = ws_client
+    with _connect(client) as ws:
+        frame = ws.receive_json()
+
+    assert frame["type"] == "poll_results_snapshot"
+    assert frame["seq"] == 0
+    assert frame["totalVotes"] == 1
+    assert [item["count"] for item in frame["results"]] == [1, 0]
+
+
+def test_deltas_carry_consecutive_seq(ws_client):
+    client, manager = ws_client
+    with _connect(client) as ws:
+        ws.receive_json()
+        client.portal.call(manager.broadcast, POLL_ID, _payload(2, o1=1, o2=1))
+        first = ws.receive_json()
+        # No change, no frame and no seq.
+        client.portal.call(manager.broadcast, POLL_ID, _payload(2, o1=1, o2=1))
+        client.portal.call(manager.broadcast, POLL_ID, _payload(3, o1=2, o2=1))
+        second = ws.receive_json()
+
+    assert first == {
+        "type": "poll_results_delta",
+        "pollId": POLL_ID,
+        "seq": 1,
+        "totalVotes": 2,
+        "counts": {"2": 1},
+    }
+    assert second["type"] == "poll_results_delta"
+    assert second["seq"] == 2
+    assert second["counts"] == {"1": 2}
+
+
+def test_resync_sends_a_snapshot_at_the_current_seq(ws_client):
+    client, manager = ws_client
+    with _connect(client) as ws:
+        ws.receive_json()
+        client.portal.call(manager.broadcast, POLL_ID, _payload(2, o1=2, o2=0))
+        assert ws.receive_json()["seq"] == 1
+
+        ws.send_json({"type": "resync"})
+        frame = ws.receive_json()
+
+    assert frame["type"] == "poll_results_snapshot"
+    assert frame["seq"] == 1
+    assert [item["count"] for item in frame["results"]] == [2, 0]
+
+
+def test_lagging_client_gets_a_snapshot(ws_client):
+    client, manager = ws_client
+
+    async def burst() -> None:
+        # Four frames without yielding: the socket's writer has not sent
+        # anything when the queue (2 frames) overflows.
+        for votes in range(2, 6):
+            await manager.broadcast(POLL_ID, _payload(votes, o1=votes, o2=0))
+
+    with _connect(client) as ws:
+        ws.receive_json()
+        client.portal.call(burst)
+        frame = ws.receive_json()
+        # Once caught up the client gets deltas again.
+        client.portal.call(manager.broadcast, POLL_ID, _payload(6, o1=5, o2=1))
+        after = ws.receive_json()
+
+    assert frame["type"] == "poll_results_snapshot"
+    assert frame["seq"] == 4
+    assert frame["totalVotes"] == 5
+    assert after["type"] == "poll_results_delta"
+    assert after["seq"] == 5
@@ -0,0 +1,100 @@
+from redis.asyncio import Redis
+from redis.commands.core import AsyncScript
+
+MAX_IDEMPOTENCY_KEY_LENGTH = 128
+
+
+class RateLimited(Exception):
+    def __init__(self, retry_after: float) -> None:
+        super().__init__(f"retry after {retry_after:.3f}s")
+        self.retry_after = retry_after
+
+
+class IdempotencyConflict(Exception):
+    pass
+
+
+def _idempotency_key(poll_id: int, key: str) -> str:
+    return f"poll:{poll_id}:idempotency:{key}"
+
+
+class VoteGuard:
+    # Rate limits and idempotency replays for POST /polls/{id}/votes, settled
+    # in one EVALSHA before the route touches the poll cache or MariaDB.
+    def __init__(
+        self,
+        script: AsyncScript,
+        *,
+        idempotency_ttl: int,
+        claim_ttl: int,
+        voter_rate: float,
+        voter_burst: int,
+        ip_rate: float,
+        ip_burst: int,
+    ) -> None:
+        self._script = script
+        self._idempotency_ttl = idempotency_ttl
+        self._claim_ttl = claim_ttl
+        self._voter_limit = (voter_rate, voter_burst)
+        self._ip_limit = (ip_rate, ip_burst)
+
+    def uses_idempotency(self, key: str | None) -> bool:
+        if key is None or self._idempotency_ttl <= 0:
+            return False
+        if not 0 < len(key) <= MAX_IDEMPOTENCY_KEY_LENGTH:
+            raise ValueError(
+                f"Idempotency-Key must be 1-{MAX_IDEMPOTENCY_KEY_LENGTH} characters"
+            )
+        return True
+
+    async def admit(
+        self,
+        redis: Redis,
+        *,
+        poll_id: int,
+        client_ip: str | None,
+        voter_token: str | None,
+        idempotency_key: str | None,
+        fingerprint: str,
+    ) -> str | None:
+        # Returns the stored response body when this is a replay.
+        keys: list[str] = []
+        limits: list[float] = []
+        if voter_token and self._voter_limit[0] > 0:
+            keys.append(f"ratelimit:voter:{voter_token}")
+            limits.extend(self._voter_limit)
+        if client_ip and self._ip_limit[0] > 0:
+            keys.append(f"ratelimit:ip:{client_ip}")
+            limits.extend(self._ip_limit)
+        bucket_count = len(keys)
+        if self.uses_idempotency(idempotency_key):
+            keys.append(_idempotency_key(poll_id, idempotency_key))
+        if not keys:
+            return None
+
+        outcome, value = await self._script(
+            keys=keys,
+            args=[bucket_count, self._claim_ttl, fingerprint, *limits],
+            client=redis,
+        )
+        if outcome == "replay":
+            return value
+        if outcome == "limited":
+            raise RateLimited(int(value) / 1000)
+        if outcome == "in_progress":
+            raise IdempotencyConflict("A request with this Idempotency-Key is in progress")
+        if outcome == "mismatch":
+            raise IdempotencyConflict("Idempotency-Key was used with a different request")
+        return None
+
+    async def remember(self, redis: Redis, poll_id: int, key: str, body: str) -> None:
+        # The claim only lives for claim_ttl; the stored response gets the full
+        # TTL. HSET and EXPIRE go in together so the key never lacks a TTL.
+        name = _idempotency_key(poll_id, key)
+        async with redis.pipeline(transaction=True) as pipe:
+            pipe.hset(name, "body", body)
+            pipe.expire(name, self._idempotency_ttl)
+            await pipe.execute()
+
+    async def forget(self, redis: Redis, poll_id: int, key: str) -> None:
+        await redis.delete(_idempotency_key(poll_id, key))
@@ -0,0 +1,279 @@
+import asyncio
+import logging
+
+from redis.asyncio import Redis
+from redis.commands.core import AsyncScript
+from sqlalchemy import delete, select, tuple_
+from sqlalchemy.exc import DataError, IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from app.models import Vote, VoteWriterOffset
+from app.votes import add_option_counts, upsert_votes, vote_count_deltas
+
+logger = logging.getLogger(__name__)
+
+STREAM_KEY = "votes:pending"
+DEAD_LETTER_KEY = "votes:dead"
+LOCK_KEY = "votes:pending:lock"
+VOTERS_LOAD_CHUNK = 5000
+# Always present in a built voters counts hash, so it exists with no votes.
+COUNTS_MARKER = "_loaded"
+
+
+class VoteQueueFull(Exception):
+    pass
+
+
+def _entry_order(entry_id: str) -> tuple[int, int]:
+    milliseconds, sequence = entry_id.split("-")
+    return int(milliseconds), int(sequence)
+
+
+def voter_keys(poll_id: int) -> tuple[str, str, str]:
+    # voters hash, ready marker and the per-option tally of the voters hash.
+    return (
+        f"poll:{poll_id}:voters",
+        f"poll:{poll_id}:voters:ready",
+        f"poll:{poll_id}:voters:counts",
+    )
+
+
+class VoteWriter:
+    def __init__(
+        self,
+        redis: Redis,
+        session_factory: async_sessionmaker[AsyncSession],
+        record_script: AsyncScript,
+        *,
+        batch_size: int,
+        flush_interval: float,
+        max_pending: int,
+        drain_timeout: float,
+        max_attempts: int = 3,
+    ) -> None:
+        self._redis = redis
+        self._session_factory = session_factory
+        self._record_script = record_script
+        self._batch_size = batch_size
+        self._flush_interval = flush_interval
+        self._max_pending = max_pending
+        self._drain_timeout = drain_timeout
+        self._max_attempts = max_attempts
+        # Head entry of the batch that last failed, and how many times.
+        self._failed_head: str | None = None
+        self._failures = 0
+        self._stopping = asyncio.Event()
+        self._task: asyncio.Task | None = None
+
+    async def record(
+        self,
+        session: AsyncSession,
+        *,
+        poll_id: int,
+        option_id: int,
+        voter_token: str,
+        counter_keys: list[str],
+    ) -> tuple[str, int | None]:
+        voters_key, ready_key, counts_key = voter_keys(poll_id)
+        for _ in range(2):
+            action, previous = await self._record_script(
+                keys=[voters_key, ready_key, STREAM_KEY, counts_key, *counter_keys],
+                args=[poll_id, voter_token, option_id, self._max_pending],
+                client=self._redis,
+            )
+            if action == "busy":
+                raise VoteQueueFull()
+            if action != "not_ready":
+                return action, int(previous) if previous else None
+            await self._load_voters(session, poll_id)
+        raise RuntimeError(f"voters of poll {poll_id} could not be loaded")
+
+    async def count_votes(self, poll_id: int, scan: bool = True) -> dict[str, int] | None:
+        # The voters hash already includes votes that are still pending, so it
+        # is the source of truth for rebuilding counters in write-behind mode.
+        # Its tally is kept by the record script, so reading it is O(options).
+        # Voters loaded before the tally existed are counted with HSCAN, which
+        # is O(voters); scan=False returns None for them instead.
+        voters_key, ready_key, counts_key = voter_keys(poll_id)
+        async with self._redis.pipeline(transaction=True) as pipe:
+            ready, tally = await pipe.exists(ready_key).hgetall(counts_key).execute()
+        if not ready:
+            return None
+        if tally:
+            return {
+                option_id: int(count)
+                for option_id, count in tally.items()
+                if option_id != COUNTS_MARKER and int(count)
+            }
+        if not scan:
+            return None
+        counts: dict[str, int] = {}
+        async for _, option_id in self._redis.hscan_iter(voters_key, count=VOTERS_LOAD_CHUNK):
+            counts[option_id] = counts.get(option_id, 0) + 1
+        return counts
+
+    async def _load_voters(self, session: AsyncSession, poll_id: int) -> None:
+        voters_key, ready_key, counts_key = voter_keys(poll_id)
+        lock = self._redis.lock(f"{ready_key}:lock", timeout=60)
+        async with lock:
+            if await self._redis.exists(ready_key):
+                return
+            counts: dict[str, int] = {}
+            result = await session.stream(
+                select(Vote.voter_token, Vote.option_id).where(Vote.poll_id == poll_id)
+            )
+            async for rows in result.partitions(VOTERS_LOAD_CHUNK):
+                await self._redis.hset(
+                    voters_key, mapping={token: option for token, option in rows}
+                )
+                for _, option_id in rows:
+                    counts[str(option_id)] = counts.get(str(option_id), 0) + 1
+            # No vote is recorded until the ready key exists, so the tally
+            # matches the hash from here on.
+            async with self._redis.pipeline(transaction=True) as pipe:
+                pipe.delete(counts_key)
+                pipe.hset(counts_key, mapping={**counts, COUNTS_MARKER: 1})
+                pipe.set(ready_key, 1)
+                await pipe.execute()
+
+    def start(self) -> None:
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        self._stopping.set()
+        if self._task is not None:
+            await self._task
+        try:
+            await asyncio.wait_for(self._drain(), self._drain_timeout)
+        except asyncio.TimeoutError:
+            logger.warning("vote writer drain timed out; pending votes stay in %s", STREAM_KEY)
+        except Exception:
+            logger.exception("vote writer drain failed; pending votes stay in %s", STREAM_KEY)
+
+    async def _drain(self) -> None:
+        while await self.flush() > 0:
+            pass
+
+    async def _run(self) -> None:
+        while not self._stopping.is_set():
+            try:
+                flushed = await self.flush()
+            except Exception:
+                logger.exception("vote writer flush failed")
+                flushed = 0
+            if flushed >= self._batch_size:
+                continue
+            try:
+                await asyncio.wait_for(self._stopping.wait(), self._flush_interval)
+            except asyncio.TimeoutError:
+                pass
+
+    async def flush(self) -> int:
+        # One writer at a time across workers so entries for the same voter
+        # are applied in stream order.
+        lock = self._redis.lock(LOCK_KEY, timeout=30)
+        if not await lock.acquire(blocking=False):
+            return 0
+        try:
+            entries = await self._redis.xrange(STREAM_KEY, count=self._batch_size)
+            if not entries:
+                return 0
+            head = entries[0][0]
+            if head == self._failed_head and self._failures >= self._max_attempts:
+                await self._write_each(entries)
+            else:
+                try:
+                    await self._write(entries)
+                except Exception:
+                    if head != self._failed_head:
+                        self._failed_head, self._failures = head, 0
+                    self._failures += 1
+                    raise
+            self._failed_head, self._failures = None, 0
+            await self._redis.xdel(STREAM_KEY, *(entry_id for entry_id, _ in entries))
+            return len(entries)
+        finally:
+            await lock.release()
+
+    async def _write_each(self, entries: list[tuple[str, dict[str, str]]]) -> None:
+        # A batch that keeps failing would block the stream for good, so its
+        # entries are applied one at a time and the ones the DB rejects move
+        # to the dead-letter stream. Any other error (the DB being down) still
+        # fails the flush and is retried.
+        for entry_id, fields in entries:
+            try:
+                await self._write([(entry_id, fields)])
+            except (DataError, IntegrityError):
+                logger.exception(
+                    "vote %s rejected by the DB; moved to %s", entry_id, DEAD_LETTER_KEY
+                )
+                await self._redis.xadd(DEAD_LETTER_KEY, {**fields, "entry_id": entry_id})
+
+    async def _write(self, entries: list[tuple[str, dict[str, str]]]) -> None:
+        # The stream is at-least-once: a crash between the commit and XDEL, or
+        # an expired flush lock, hands the same entries to the next flush. The
+        # count deltas are not idempotent, so the last applied entry id is
+        # committed with the batch and anything at or below it is skipped.
+        # FOR UPDATE makes a concurrent flush of the same entries wait for
+        # this one and then see its offset.
+        async with self._session_factory() as session:
+            applied = (
+                await session.execute(
+                    select(VoteWriterOffset)
+                    .where(VoteWriterOffset.stream == STREAM_KEY)
+                    .with_for_update()
+                )
+            ).scalar_one_or_none()
+            if applied is not None:
+                entries = [
+                    entry
+                    for entry in entries
+                    if _entry_order(entry[0]) > _entry_order(applied.last_entry_id)
+                ]
+            if not entries:
+                return
+            await self._apply(session, entries)
+            if applied is None:
+                session.add(VoteWriterOffset(stream=STREAM_KEY, last_entry_id=entries[-1][0]))
+            else:
+                applied.last_entry_id = entries[-1][0]
+            await session.commit()
+
+    async def _apply(
+        self, session: AsyncSession, entries: list[tuple[str, dict[str, str]]]
+    ) -> None:
+        latest: dict[tuple[int, str], tuple[str, int]] = {}
+        count_deltas: dict[int, list[int]] = {}
+        for _, fields in entries:
+            poll_id = int(fields["poll_id"])
+            option_id = int(fields["option_id"])
+            previous = fields.get("previous_option_id")
+            latest[(poll_id, fields["voter_token"])] = (fields["action"], option_id)
+            for changed, delta in vote_count_deltas(
+                fields["action"], option_id, int(previous) if previous else None
+            ).items():
+                count_deltas.setdefault(changed, [poll_id, 0])[1] += delta
+
+        upserts = [
+            {"poll_id": poll_id, "voter_token": token, "option_id": option_id}
+            for (poll_id, token), (action, option_id) in latest.items()
+            if action != "canceled"
+        ]
+        deletes = [
+            key for key, (action, _) in latest.items() if action == "canceled"
+        ]
+
+        count_rows = [
+            {"option_id": option_id, "poll_id": poll_id, "vote_count": delta}
+            for option_id, (poll_id, delta) in count_deltas.items()
+            if delta
+        ]
+
+        if upserts:
+            await session.execute(upsert_votes(session.bind.dialect.name, upserts))
+        if deletes:
+            await session.execute(
+                delete(Vote).where(tuple_(Vote.poll_id, Vote.voter_token).in_(deletes))
+            )
+        if count_rows:
+            await session.execute(add_option_counts(session.bind.dialect.name, count_rows))
@@ -0,0 +1,172 @@
+from sqlalchemy import delete, insert, select, update
+from sqlalchemy.dialects import mysql, sqlite
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models import PollOptionCount, Vote
+
+MAX_VOTE_ATTEMPTS = 3
+
+# InnoDB lock wait timeout and deadlock: the transaction is rolled back (or
+# has to be) and can run again unchanged.
+LOCK_CONFLICT_ERRORS = (1205, 1213)
+
+
+def _insert_ignore(poll_id: int, option_id: int, voter_token: str):
+    return (
+        insert(Vote)
+        .values(poll_id=poll_id, option_id=option_id, voter_token=voter_token)
+        .prefix_with("IGNORE", dialect="mysql")
+        .prefix_with("OR IGNORE", dialect="sqlite")
+    )
+
+
+def upsert_votes(dialect_name: str, rows: list[dict]):
+    # Bulk "insert or move to option_id" keyed by uniq_vote_per_poll.
+    if dialect_name == "sqlite":
+        stmt = sqlite.insert(Vote).values(rows)
+        return stmt.on_conflict_do_update(
+            index_elements=[Vote.poll_id, Vote.voter_token],
+            set_={"option_id": stmt.excluded.option_id},
+        )
+    stmt = mysql.insert(Vote).values(rows)
+    return stmt.on_duplicate_key_update(option_id=stmt.inserted.option_id)
+
+
+def _by_option(rows: list[dict]) -> list[dict]:
+    # Every writer locks poll_option_counts rows in option_id order, so two
+    # votes moving between the same options in opposite directions cannot
+    # deadlock.
+    return sorted(rows, key=lambda row: row["option_id"])
+
+
+def add_option_counts(dialect_name: str, rows: list[dict]):
+    # rows: {"option_id", "poll_id", "vote_count"} where vote_count is a delta.
+    rows = _by_option(rows)
+    if dialect_name == "sqlite":
+        stmt = sqlite.insert(PollOptionCount).values(rows)
+        return stmt.on_conflict_do_update(
+            index_elements=[PollOptionCount.option_id],
+            set_={"vote_count": PollOptionCount.vote_count + stmt.excluded.vote_count},
+        )
+    stmt = mysql.insert(PollOptionCount).values(rows)
+    return stmt.on_duplicate_key_update(
+        vote_count=PollOptionCount.vote_count + stmt.inserted.vote_count
+    )
+
+
+def set_option_counts(dialect_name: str, rows: list[dict]):
+    # Same shape as add_option_counts, but vote_count is the absolute value.
+    rows = _by_option(rows)
+    if dialect_name == "sqlite":
+        stmt = sqlite.insert(PollOptionCount).values(rows)
+        return stmt.on_conflict_do_update(
+            index_elements=[PollOptionCount.option_id],
+            set_={"vote_count": stmt.excluded.vote_count},
+        )
+    stmt = mysql.insert(PollOptionCount).values(rows)
+    return stmt.on_duplicate_key_update(vote_count=stmt.inserted.vote_count)
+
+
+def vote_count_deltas(
+    action: str, option_id: int, previous_option_id: int | None
+) -> dict[int, int]:
+    if action == "created":
+        return {option_id: 1}
+    if action == "canceled" and previous_option_id is not None:
+        return {previous_option_id: -1}
+    if action == "updated" and previous_option_id is not None:
+        return {previous_option_id: -1, option_id: 1}
+    return {}
+
+
+async def _add_vote_counts(
+    session: AsyncSession,
+    poll_id: int,
+    action: str,
+    option_id: int,
+    previous_option_id: int | None,
+) -> None:
+    deltas = vote_count_deltas(action, option_id, previous_option_id)
+    await session.execute(
+        add_option_counts(
+            session.bind.dialect.name,
+            [
+                {"option_id": changed, "poll_id": poll_id, "vote_count": delta}
+                for changed, delta in deltas.items()
+            ],
+        )
+    )
+
+
+def is_lock_conflict(exc: OperationalError) -> bool:
+    args = getattr(exc.orig, "args", ())
+    return bool(args) and args[0] in LOCK_CONFLICT_ERRORS
+
+
+async def apply_vote(
+    session: AsyncSession, poll_id: int, option_id: int, voter_token: str
+) -> tuple[str, int | None, int | None]:
+    # New voters (the common case) cost one INSERT plus the commit. Existing
+    # voters are toggled with guarded UPDATE/DELETE statements whose affected
+    # row count tells us whether a concurrent request changed the row first;
+    # in that case, or on a deadlock or lock wait timeout, we start over
+    # instead of failing. poll_option_counts is adjusted in the same
+    # transaction as the vote.
+    for attempt in range(1, MAX_VOTE_ATTEMPTS + 1):
+        try:
+            applied = await _apply_vote_once(session, poll_id, option_id, voter_token)
+        except OperationalError as exc:
+            await session.rollback()
+            if attempt == MAX_VOTE_ATTEMPTS or not is_lock_conflict(exc):
+                raise
+            continue
+        if applied is not None:
+            return applied
+
+    raise RuntimeError(
+        f"vote for poll {poll_id} kept conflicting after {MAX_VOTE_ATTEMPTS} attempts"
+    )
+
+
+async def _apply_vote_once(
+    session: AsyncSession, poll_id: int, option_id: int, voter_token: str
+) -> tuple[str, int | None, int | None] | None:
+    # None when a concurrent request changed the voter's row first.
+    inserted = await session.execute(_insert_ignore(poll_id, option_id, voter_token))
+    if inserted.rowcount == 1:
+        await _add_vote_counts(session, poll_id, "created", option_id, None)
+        await session.commit()
+        return "created", inserted.lastrowid, None
+
+    existing = (
+        await session.execute(
+            select(Vote.id, Vote.option_id).where(
+                Vote.poll_id == poll_id, Vote.voter_token == voter_token
+            )
+        )
+    ).one_or_none()
+    if existing is None:
+        await session.rollback()
+        return None
+
+    vote_id, previous_option_id = existing
+    if previous_option_id == option_id:
+        changed = await session.execute(
+            delete(Vote).where(Vote.id == vote_id, Vote.option_id == option_id)
+        )
+        action, vote_id = "canceled", None
+    else:
+        changed = await session.execute(
+            update(Vote)
+            .where(Vote.id == vote_id, Vote.option_id == previous_option_id)
+            .values(option_id=option_id)
+        )
+        action = "updated"
+
+    if changed.rowcount != 1:
+        await session.rollback()
+        return None
+    await _add_vote_counts(session, poll_id, action, option_id, previous_option_id)
+    await session.commit()
+    return action, vote_id, previous_option_id
@@ -1,26 +1,468 @@
+import asyncio
+import contextvars
+import logging
+import time
 from collections import defaultdict
-from typing import DefaultDict, Set
+from contextlib import contextmanager
+from typing import Awaitable, Callable, DefaultDict, Dict, Iterator, Set
 
+import orjson
 from fastapi import WebSocket
+from redis.asyncio import Redis
 
+from app.metrics import count_ws_dropped_frames, count_ws_eviction, timed
+
+logger = logging.getLogger(__name__)
+
+PayloadBuilder = Callable[[], Awaitable[dict]]
+Deliver = Callable[[int, str], Awaitable[None]]
+
+# Sockets connected with ?protocol=2 get a snapshot on connect and then only
+# the option counts that changed; everyone else keeps the full frames.
+DELTA_PROTOCOL = 2
+
+# Backoff of the Redis broadcast listener after its subscription drops.
+RESUBSCRIBE_MIN_DELAY = 0.5
+RESUBSCRIBE_MAX_DELAY = 30.0
+
+
+def encode_frame(payload: dict) -> str:
+    return orjson.dumps(payload).decode()
+
+
+def _counts(payload: dict) -> dict[str, int]:
+    return {str(item["optionId"]): item["count"] for item in payload["results"]}
+
+
+class LocalBroadcastBackend:
+    # Single-process fan-out: frames go straight to this worker's sockets.
+    local = True
+
+    async def start(self, deliver: Deliver) -> None:
+        self._deliver = deliver
+
+    async def publish(self, poll_id: int, text: str) -> None:
+        await self._deliver(poll_id, text)
+
+    async def close(self) -> None:
+        pass
+
+
+class RedisBroadcastBackend:
+    # Multi-worker fan-out: a frame is published once and every worker
+    # relays it to its own sockets.
+    local = False
+
+    def __init__(self, redis: Redis, channel_prefix: str = "poll-updates") -> None:
+        self._redis = redis
+        self._channel_prefix = channel_prefix
+        self._listener: asyncio.Task | None = None
+
+    async def start(self, deliver: Deliver) -> None:
+        self._deliver = deliver
+        await self._subscribe()
+        self._listener = asyncio.create_task(self._listen())
+
+    async def publish(self, poll_id: int, text: str) -> None:
+        await self._redis.publish(f"{self._channel_prefix}:{poll_id}", text)
+
+    async def _subscribe(self) -> None:
+        self._pubsub = self._redis.pubsub(ignore_subscribe_messages=True)
+        await self._pubsub.psubscribe(f"{self._channel_prefix}:*")
+
+    async def _listen(self) -> None:
+        # A dropped pub/sub connection must not end the listener, or this
+        # worker's sockets stop getting frames until it restarts. Frames
+        # published while resubscribing are lost; the next one carries the
+        # latest results.
+        delay = RESUBSCRIBE_MIN_DELAY
+        while True:
+            try:
+                async for message in self._pubsub.listen():
+                    delay = RESUBSCRIBE_MIN_DELAY
+                    if message["type"] != "pmessage":
+                        continue
+                    poll_id = int(message["channel"].rsplit(":", 1)[1])
+                    try:
+                        await self._deliver(poll_id, message["data"])
+                    except Exception:
+                        logger.exception("relay for poll %s failed", poll_id)
+            except Exception:
+                logger.warning(
+                    "broadcast subscription lost, resubscribing in %.1fs", delay, exc_info=True
+                )
+            else:
+                logger.warning("broadcast subscription ended, resubscribing in %.1fs", delay)
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, RESUBSCRIBE_MAX_DELAY)
+            try:
+                await self._pubsub.aclose()
+            except Exception:
+                pass
+            try:
+                await self._subscribe()
+            except Exception:
+                # listen() on the unsubscribed pub/sub returns at once, so
+                # the next round waits longer and tries again.
+                logger.warning("broadcast resubscribe failed", exc_info=True)
+
+    async def close(self) -> None:
+        if self._listener is not None:
+            self._listener.cancel()
+            await asyncio.gather(self._listener, return_exceptions=True)
+        try:
+            await self._pubsub.punsubscribe()
+        finally:
+            await self._pubsub.aclose()
+
+
+class PollFeed:
+    # Latest frame of a poll for SSE and long-poll readers. Readers share one
+    # event per update instead of holding a socket and a per-connection queue.
+    __slots__ = ("seq", "text", "watchers", "_changed")
 
-class ConnectionManager:
     def __init__(self) -> None:
-        self._channels: DefaultDict[int, Set[WebSocket]] = defaultdict(set)
+        self.seq = 0
+        self.text: str | None = None
+        self.watchers = 0
+        self._changed = asyncio.Event()
+
+    def publish(self, text: str) -> None:
+        self.seq += 1
+        self.text = text
+        self._changed.set()
+        self._changed = asyncio.Event()
+
+    async def wait(self, seq: int, timeout: float) -> bool:
+        # True once a frame newer than seq was published.
+        if self.seq > seq:
+            return True
+        try:
+            await asyncio.wait_for(self._changed.wait(), timeout)
+        except asyncio.TimeoutError:
+            return False
+        return True
+
+
+class _DeltaState:
+    # Last full frame of a poll on this worker. Sequence numbers are per
+    # worker, which is fine because a socket only ever talks to one worker.
+    __slots__ = ("seq", "payload", "counts")
 
-    async def connect(self, poll_id: int, websocket: WebSocket) -> None:
+    def __init__(self, payload: dict) -> None:
+        self.seq = 0
+        self.payload = payload
+        self.counts = _counts(payload)
+
+    def snapshot(self) -> dict:
+        return {**self.payload, "type": "poll_results_snapshot", "seq": self.seq}
+
+    def advance(self, payload: dict) -> dict | None:
+        counts = _counts(payload)
+        changed = {
+            option_id: count
+            for option_id, count in counts.items()
+            if self.counts.get(option_id) != count
+        }
+        if not changed and payload["totalVotes"] == self.payload["totalVotes"]:
+            self.payload = payload
+            return None
+        self.seq += 1
+        options_changed = counts.keys() != self.counts.keys()
+        self.payload = payload
+        self.counts = counts
+        if options_changed:
+            return self.snapshot()
+        return {
+            "type": "poll_results_delta",
+            "pollId": payload["pollId"],
+            "seq": self.seq,
+            "totalVotes": payload["totalVotes"],
+            "counts": changed,
+        }
+
+
+class _Client:
+    # One socket and its bounded outbound queue. The writer task exists only
+    # while frames are queued, so idle viewers cost no task of their own.
+    __slots__ = ("websocket", "delta", "queue", "lagging", "writer", "last_seen")
+
+    def __init__(self, websocket: WebSocket, delta: bool) -> None:
+        self.websocket = websocket
+        self.delta = delta
+        self.queue: list[str] = []
+        self.lagging = False
+        self.writer: asyncio.Task | None = None
+        self.last_seen = time.monotonic()
+
+
+class ConnectionManager:
+    def __init__(
+        self,
+        max_fps: float = 10.0,
+        send_concurrency: int = 500,
+        send_timeout: float = 2.0,
+        queue_size: int = 16,
+        ping_interval: float = 20.0,
+        idle_timeout: float = 60.0,
+        max_connections: int = 0,
+    ) -> None:
+        self._channels: DefaultDict[int, Dict[WebSocket, _Client]] = defaultdict(dict)
+        self._delta_channels: DefaultDict[int, Set[WebSocket]] = defaultdict(set)
+        self._delta_states: Dict[int, _DeltaState] = {}
+        self._frame_interval = 1.0 / max_fps
+        self._send_slots = asyncio.Semaphore(send_concurrency)
+        self._send_timeout = send_timeout
+        self._queue_size = queue_size
+        self._ping_interval = ping_interval
+        self._idle_timeout = idle_timeout
+        self._max_connections = max_connections
+        self._connections = 0
+        self._heartbeat: asyncio.Task | None = None
+        self._feeds: Dict[int, PollFeed] = {}
+        self._pending: Dict[int, PayloadBuilder] = {}
+        self._flushers: Dict[int, asyncio.Task] = {}
+        self._backend: LocalBroadcastBackend | RedisBroadcastBackend = (
+            LocalBroadcastBackend()
+        )
+
+    async def start(
+        self, backend: LocalBroadcastBackend | RedisBroadcastBackend
+    ) -> None:
+        self._backend = backend
+        await backend.start(self._deliver)
+        if self._ping_interval > 0:
+            self._heartbeat = asyncio.create_task(self._ping_loop())
+
+    async def _accept(self, poll_id: int, websocket: WebSocket, delta: bool) -> _Client | None:
         await websocket.accept()
-        self._channels[poll_id].add(websocket)
+        if self._max_connections and self._connections >= self._max_connections:
+            # 1013 (try again later) tells clients to back off and reconnect,
+            # possibly to a less busy worker.
+            count_ws_eviction("capacity")
+            await websocket.close(code=1013)
+            return None
+        client = _Client(websocket, delta)
+        self._channels[poll_id][websocket] = client
+        self._connections += 1
+        return client
 
-    def disconnect(self, poll_id: int, websocket: WebSocket) -> None:
-        self._channels[poll_id].discard(websocket)
-        if not self._channels[poll_id]:
-            self._channels.pop(poll_id, None)
+    async def connect(self, poll_id: int, websocket: WebSocket) -> bool:
+        return await self._accept(poll_id, websocket, False) is not None
 
-    async def broadcast(self, poll_id: int, payload: dict) -> None:
-        websockets = list(self._channels.get(poll_id, []))
-        for websocket in websockets:
+    async def connect_delta(
+        self, poll_id: int, websocket: WebSocket, build_payload: PayloadBuilder
+    ) -> bool:
+        if await self._accept(poll_id, websocket, True) is None:
+            return False
+        if poll_id not in self._delta_states:
             try:
-                await websocket.send_json(payload)
+                payload = await build_payload()
             except Exception:
                 self.disconnect(poll_id, websocket)
+                raise
+            self._delta_states.setdefault(poll_id, _DeltaState(payload))
+        self._delta_channels[poll_id].add(websocket)
+        self.resync(poll_id, websocket)
+        return True
+
+    def resync(self, poll_id: int, websocket: WebSocket) -> None:
+        # A snapshot supersedes anything still queued for the socket.
+        client = self._channels.get(poll_id, {}).get(websocket)
+        state = self._delta_states.get(poll_id)
+        if client is not None and state is not None:
+            client.queue.clear()
+            self._enqueue(poll_id, client, encode_frame(state.snapshot()))
+
+    def touch(self, poll_id: int, websocket: WebSocket) -> None:
+        client = self._channels.get(poll_id, {}).get(websocket)
+        if client is not None:
+            client.last_seen = time.monotonic()
+
+    def disconnect(self, poll_id: int, websocket: WebSocket) -> None:
+        clients = self._channels.get(poll_id)
+        client = clients.pop(websocket, None) if clients is not None else None
+        if client is None:
+            return
+        self._connections -= 1
+        client.queue.clear()
+        if not clients:
+            self._channels.pop(poll_id, None)
+        delta_sockets = self._delta_channels.get(poll_id)
+        if delta_sockets is not None:
+            delta_sockets.discard(websocket)
+            if not delta_sockets:
+                self._delta_channels.pop(poll_id, None)
+                self._delta_states.pop(poll_id, None)
+
+    async def _evict(self, poll_id: int, client: _Client, reason: str) -> None:
+        count_ws_eviction(reason)
+        self.disconnect(poll_id, client.websocket)
+        try:
+            await asyncio.wait_for(
+                client.websocket.close(code=1001 if reason == "idle" else 1013),
+                self._send_timeout,
+            )
+        except Exception:
+            pass
+
+    @contextmanager
+    def watch(self, poll_id: int) -> Iterator[PollFeed]:
+        feed = self._feeds.get(poll_id)
+        if feed is None:
+            feed = self._feeds[poll_id] = PollFeed()
+        feed.watchers += 1
+        try:
+            yield feed
+        finally:
+            feed.watchers -= 1
+            if not feed.watchers:
+                self._feeds.pop(poll_id, None)
+
+    def _has_listeners(self, poll_id: int) -> bool:
+        return poll_id in self._channels or poll_id in self._feeds
+
+    def schedule(self, poll_id: int, build_payload: PayloadBuilder) -> None:
+        # Coalesce updates: only the latest builder is kept and each poll
+        # sends at most one frame per frame interval, off the request path.
+        if self._backend.local and not self._has_listeners(poll_id):
+            return
+        self._pending[poll_id] = build_payload
+        if poll_id not in self._flushers:
+            # A fresh context so the flusher's Redis work is not counted
+            # against the request that scheduled it.
+            self._flushers[poll_id] = asyncio.create_task(
+                self._flush(poll_id), context=contextvars.Context()
+            )
+
+    async def _flush(self, poll_id: int) -> None:
+        try:
+            while poll_id in self._pending:
+                build_payload = self._pending.pop(poll_id)
+                if not self._backend.local or self._has_listeners(poll_id):
+                    try:
+                        await self.broadcast(poll_id, await build_payload())
+                    except Exception:
+                        logger.exception("broadcast for poll %s failed", poll_id)
+                await asyncio.sleep(self._frame_interval)
+        finally:
+            self._flushers.pop(poll_id, None)
+
+    async def broadcast(self, poll_id: int, payload: dict) -> None:
+        with timed("serialize"):
+            text = encode_frame(payload)
+        await self._backend.publish(poll_id, text)
+
+    def _delta_frame(self, poll_id: int, text: str) -> str | None:
+        # Computed once per frame per worker, not per socket.
+        with timed("serialize"):
+            payload = orjson.loads(text)
+            state = self._delta_states.get(poll_id)
+            if state is None:
+                state = self._delta_states[poll_id] = _DeltaState(payload)
+                frame = state.snapshot()
+            else:
+                frame = state.advance(payload)
+            return encode_frame(frame) if frame is not None else None
+
+    def _enqueue(
+        self, poll_id: int, client: _Client, frame: str, latest: str | None = None
+    ) -> None:
+        # latest is the frame that alone brings the client up to date; for
+        # full-frame sockets that is the frame itself, for delta sockets a
+        # snapshot, since skipped deltas cannot be recovered.
+        if client.lagging or len(client.queue) >= self._queue_size:
+            # Slow consumer: drop the backlog and keep only the newest state
+            # until the writer catches up.
+            if client.queue:
+                count_ws_dropped_frames(len(client.queue))
+            client.lagging = True
+            client.queue.clear()
+            frame = latest if latest is not None else frame
+        client.queue.append(frame)
+        if client.writer is None:
+            client.writer = asyncio.create_task(self._write(poll_id, client))
+
+    async def _write(self, poll_id: int, client: _Client) -> None:
+        try:
+            while client.queue:
+                frame = client.queue.pop(0)
+                async with self._send_slots:
+                    await asyncio.wait_for(
+                        client.websocket.send_text(frame), self._send_timeout
+                    )
+        except asyncio.TimeoutError:
+            # Stuck past send_timeout: evict instead of letting frames pile
+            # up behind it.
+            await self._evict(poll_id, client, "stalled")
+        except Exception:
+            await self._evict(poll_id, client, "gone")
+        finally:
+            client.writer = None
+            client.lagging = False
+
+    async def _deliver(self, poll_id: int, text: str) -> None:
+        feed = self._feeds.get(poll_id)
+        if feed is not None:
+            feed.publish(text)
+        clients = self._channels.get(poll_id)
+        if not clients:
+            return
+        delta_text = (
+            self._delta_frame(poll_id, text) if poll_id in self._delta_channels else None
+        )
+        snapshot = None
+        with timed("broadcast"):
+            for client in list(clients.values()):
+                if not client.delta:
+                    self._enqueue(poll_id, client, text)
+                elif delta_text is not None:
+                    if snapshot is None and (
+                        client.lagging or len(client.queue) >= self._queue_size
+                    ):
+                        snapshot = encode_frame(self._delta_states[poll_id].snapshot())
+                    self._enqueue(poll_id, client, delta_text, snapshot)
+
+    async def _ping_loop(self) -> None:
+        # Delta-protocol clients answer pings; any message counts as a sign
+        # of life. Full-frame clients rely on the server's protocol pings.
+        ping = encode_frame({"type": "ping"})
+        while True:
+            await asyncio.sleep(self._ping_interval)
+            now = time.monotonic()
+            idle = []
+            for poll_id, sockets in list(self._delta_channels.items()):
+                clients = self._channels.get(poll_id, {})
+                for websocket in sockets:
+                    client = clients.get(websocket)
+                    if client is None:
+                        continue
+                    if self._idle_timeout and now - client.last_seen > self._idle_timeout:
+                        idle.append((poll_id, client))
+                    elif not client.queue:
+                        self._enqueue(poll_id, client, ping)
+            await asyncio.gather(
+                *(self._evict(poll_id, client, "idle") for poll_id, client in idle)
+            )
+
+    def connection_counts(self) -> dict[int, int]:
+        return {poll_id: len(clients) for poll_id, clients in self._channels.items()}
+
+    def watcher_counts(self) -> dict[int, int]:
+        return {poll_id: feed.watchers for poll_id, feed in self._feeds.items()}
+
+    async def close(self) -> None:
+        self._pending.clear()
+        tasks = list(self._flushers.values())
+        if self._heartbeat is not None:
+            tasks.append(self._heartbeat)
+        tasks.extend(
+            client.writer
+            for clients in self._channels.values()
+            for client in clients.values()
+            if client.writer is not None
+        )
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        await self._backend.close()